@@ -0,0 +1,64 @@
+import unittest
+from operator import itemgetter
+
+import yamosse.externalsort as externalsort
+
+ITEMS = [(3, 'a'), (1, 'b'), (3, 'c'), (2, 'd'), (1, 'e'), (2, 'f'), (3, 'g')]
+
+
+class TestExternalSort(unittest.TestCase):
+  def _external_sort(self, run_size, reverse=False):
+    s = externalsort.ExternalSort(key=itemgetter(0), reverse=reverse, run_size=run_size)
+    
+    for item in ITEMS:
+      s.add(item)
+    
+    return s
+  
+  def test_empty(self):
+    s = externalsort.ExternalSort()
+    
+    self.assertEqual(len(s), 0)
+    self.assertEqual(list(s), [])
+  
+  def test_sorted(self):
+    for run_size in (1, 2, 3, len(ITEMS) + 1):
+      for reverse in (False, True):
+        with self.subTest(run_size=run_size, reverse=reverse):
+          s = self._external_sort(run_size, reverse=reverse)
+          
+          try:
+            self.assertEqual(len(s), len(ITEMS))
+            self.assertEqual(list(s), sorted(ITEMS, key=itemgetter(0), reverse=reverse))
+          finally:
+            s.close()
+  
+  def test_iter_twice(self):
+    s = self._external_sort(2)
+    
+    try:
+      self.assertEqual(list(s), list(s))
+    finally:
+      s.close()
+  
+  def test_no_key(self):
+    s = externalsort.ExternalSort(reverse=True, run_size=2)
+    
+    try:
+      for item in ITEMS:
+        s.add(item)
+      
+      self.assertEqual(list(s), sorted(ITEMS, reverse=True))
+    finally:
+      s.close()
+  
+  def test_close(self):
+    s = self._external_sort(2)
+    s.close()
+    
+    # only the items that weren't spilled to disk are left
+    self.assertEqual(list(s), [(3, 'g')])
+    self.assertEqual(len(s), 1)
+
+
+if __name__ == '__main__': unittest.main()
\ No newline at end of file
@@ -0,0 +1,39 @@
+import unittest
+import tempfile
+import os
+
+import yamosse.filelock as filelock
+
+
+class TestFileLock(unittest.TestCase):
+  def setUp(self):
+    self._dir = tempfile.TemporaryDirectory()
+    self.addCleanup(self._dir.cleanup)
+    
+    self._name = os.path.join(self._dir.name, '.lock')
+  
+  def test_file_lock(self):
+    a = filelock.FileLock(self._name)
+    b = filelock.FileLock(self._name)
+    
+    with a:
+      self.assertTrue(os.path.exists(self._name))
+      self.assertFalse(b.acquire(blocking=False))
+    
+    self.assertTrue(b.acquire(blocking=False))
+    self.assertFalse(a.acquire(blocking=False))
+    
+    b.release()
+    self.assertTrue(a.acquire(blocking=False))
+    a.release()
+  
+  def test_file_lock_acquired(self):
+    with filelock.FileLock(self._name) as a:
+      with self.assertRaises(RuntimeError):
+        a.acquire()
+    
+    with self.assertRaises(RuntimeError):
+      a.release()
+
+
+if __name__ == '__main__': unittest.main()
\ No newline at end of file
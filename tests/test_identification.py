@@ -0,0 +1,200 @@
+import unittest
+
+import yamosse.identification as identification
+import yamosse.options as options
+
+import numpy as np
+
+CLASS_NAMES = ['Class %d' % c for c in range(8)]
+
+CONFIDENCE_SCORE = 0
+TOP_RANKED = 1
+
+TIMESTAMP_ALL = identification.identification().TIMESTAMP_ALL
+
+
+class Shutdown:
+  def is_set(self):
+    return False
+
+
+def range_timestamp(begin, end, timespan):
+  return (begin, end) if timespan and begin + timespan < end else begin
+
+
+def confidence_score(o, predictions, scores):
+  # the scores of every class, one patch at a time, as they were before they were batched
+  # returns a dictionary of classes, each with a dictionary of timestamps and their scores
+  class_predictions = {}
+  
+  for prediction, score in zip(predictions.tolist(), scores):
+    if o.timespan_span_all:
+      prediction = TIMESTAMP_ALL
+    
+    for class_ in o.classes:
+      calibrated_score = min(score[class_] * o.calibration[class_], 1.0)
+      
+      if (calibrated_score < o.confidence_score) != o.confidence_score_minmax:
+        continue
+      
+      prediction_scores = class_predictions.setdefault(class_, {})
+      prediction_scores[prediction] = max(
+        prediction_scores.get(prediction, calibrated_score), calibrated_score)
+  
+  class_timestamps = {}
+  
+  for class_, prediction_scores in class_predictions.items():
+    # seconds that follow one after another are joined into one timestamp
+    timestamp_scores = {}
+    run = []
+    
+    for prediction in list(prediction_scores) + [None]:
+      if run and (prediction is None or prediction > run[-1] + 1):
+        timestamp_scores[range_timestamp(run[0], run[-1] + 1, o.timespan)] = float(
+          max(prediction_scores[p] for p in run))
+        
+        run = []
+      
+      run.append(prediction)
+    
+    class_timestamps[int(class_)] = timestamp_scores
+  
+  return class_timestamps
+
+
+def top_ranked(o, predictions, scores):
+  # the top ranked classes, one patch at a time, as they were before they were batched
+  # returns a dictionary of timestamps, each with a dictionary of classes and their scores
+  classes = o.classes
+  scores = np.minimum(scores.take(classes, axis=1) * np.take(o.calibration, classes), 1.0,
+    dtype=np.float32)
+  
+  def ranked(score):
+    return [(int(classes[c]), score[c]) for c in score.argsort()[::-1][:o.top_ranked]]
+  
+  if o.timespan_span_all:
+    class_scores = {}
+    
+    for score in scores:
+      for class_, class_score in ranked(score):
+        class_scores.setdefault(class_, []).append(class_score)
+    
+    class_scores = {c: float(np.mean(s, axis=0, dtype=np.float32))
+      for c, s in class_scores.items()}
+    
+    return {TIMESTAMP_ALL: dict(sorted(class_scores.items(),
+      key=lambda item: item[1], reverse=True))}
+  
+  timespan = o.timespan
+  timespans = {}
+  
+  for prediction, score in zip(predictions.tolist(), scores):
+    key = prediction // timespan * timespan if timespan else int(predictions[0])
+    timespans.setdefault(key, []).append(score)
+  
+  top = {k: ranked(np.mean(s, axis=0, dtype=np.float32)) for k, s in timespans.items()}
+  
+  # contiguous timespans with the same top ranked classes (in any order) are joined
+  # their scores averaged by position, with the classes of the last timespan
+  result = {}
+  run = []
+  
+  def classes_set(key):
+    return {c for c, s in top[key]}
+  
+  for key in list(top) + [None]:
+    if run and (key is None or key != run[-1] + timespan
+      or classes_set(key) != classes_set(run[-1])):
+      result[range_timestamp(run[0], run[-1] + timespan, timespan)] = dict(zip(
+        [c for c, s in top[run[-1]]],
+        np.mean([[s for c, s in top[k]] for k in run], axis=0, dtype=np.float32).tolist(),
+        strict=True))
+      
+      run = []
+    
+    run.append(key)
+  
+  return result
+
+
+class TestIdentification(unittest.TestCase):
+  def _identification(self, option, **kwargs):
+    o = options.Options(identification=option, classes=list(range(len(CLASS_NAMES))), **kwargs)
+    o.worker(np, CLASS_NAMES)
+    return o
+  
+  def _predict(self, o, predictions, scores, rng):
+    # predicted in batches of any size
+    identification_ = o.identification
+    begin = 0
+    
+    while begin < len(predictions):
+      end = begin + int(rng.integers(1, 9))
+      identification_.predict_batch(predictions[begin:end], scores[begin:end])
+      begin = end
+    
+    return identification_.timestamps(Shutdown())
+  
+  def _assert_reference(self, option, reference, scores_, kwargs_list, trials=50):
+    rng = np.random.default_rng(0)
+    
+    for kwargs in kwargs_list:
+      with self.subTest(**kwargs):
+        for trial in range(trials):
+          patches = int(rng.integers(1, 60))
+          predictions = np.arange(patches) * 7680 // 16000
+          scores = scores_(rng, patches)
+          
+          o = self._identification(option, **kwargs)
+          expected = reference(o, predictions, scores)
+          
+          # (the results are compared in order, which is the order the classes
+          # were first identified in for Confidence Score)
+          self.assertEqual(self._predict(o, predictions, scores, rng),
+            identification.identification(option=option).result(expected))
+  
+  def test_confidence_score(self):
+    def scores(rng, patches):
+      return rng.random((patches, len(CLASS_NAMES)), dtype=np.float32)
+    
+    # the calibration puts some of the scores over 100%
+    self._assert_reference(CONFIDENCE_SCORE, confidence_score, scores, [
+      {'timespan': timespan, 'timespan_span_all': span_all,
+        'confidence_score_minmax': minmax, 'calibration': [100, 150, 50, 100, 80]}
+      for timespan in (0, 1, 3) for span_all in (False, True) for minmax in (False, True)
+    ])
+  
+  def test_top_ranked(self):
+    def scores(rng, patches):
+      return rng.random((patches, len(CLASS_NAMES)), dtype=np.float32)
+    
+    self._assert_reference(TOP_RANKED, top_ranked, scores, [
+      {'timespan': timespan, 'timespan_span_all': span_all, 'top_ranked': top_ranked_}
+      for timespan in (0, 1, 3) for span_all in (False, True) for top_ranked_ in (3, 8, 10)
+    ])
+  
+  def test_top_ranked_ties(self):
+    # only a few different scores, so that many are tied (including at the last rank)
+    def scores(rng, patches):
+      return rng.integers(0, 4, (patches, len(CLASS_NAMES))).astype(np.float32) / 4
+    
+    self._assert_reference(TOP_RANKED, top_ranked, scores, [
+      {'timespan': timespan, 'timespan_span_all': span_all, 'top_ranked': top_ranked_,
+        'calibration': [100, 200, 400]}
+      for timespan in (1, 3) for span_all in (False, True) for top_ranked_ in (1, 3)
+    ])
+  
+  def test_top_ranked_order(self):
+    # the same top ranked classes, but in a different order from one patch to the next
+    # which are still joined into one timespan
+    def scores(rng, patches):
+      scores = rng.random((patches, len(CLASS_NAMES)), dtype=np.float32) * 0.3
+      scores[:, :3] = 0.5 + rng.random((patches, 3), dtype=np.float32) * 0.5
+      return scores
+    
+    self._assert_reference(TOP_RANKED, top_ranked, scores, [
+      {'timespan': timespan, 'top_ranked': 3} for timespan in (1, 2, 4)
+    ])
+
+
+if __name__ == '__main__': unittest.main()
\ No newline at end of file
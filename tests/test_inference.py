@@ -0,0 +1,48 @@
+import unittest
+
+import yamosse.inference as inference
+
+import numpy as np
+
+PARAMS = (16000.0, 0.96, 0.48, 0.025, 0.010)
+
+
+def yamnet(waveform):
+  # pads the waveform the same way YAMNet does, then gives every patch
+  # a score for each of its samples, so that any difference in them shows
+  sample_rate, patch_window_seconds, patch_hop_seconds, stft_window_seconds, stft_hop_seconds = (
+    PARAMS)
+  
+  min_samples = int((patch_window_seconds + stft_window_seconds - stft_hop_seconds) * sample_rate)
+  hop = int(patch_hop_seconds * sample_rate)
+  
+  samples = max(len(waveform), min_samples)
+  padded = np.zeros(min_samples + -(-(samples - min_samples) // hop) * hop, dtype=np.float32)
+  padded[:len(waveform)] = waveform
+  
+  return (np.array([padded[begin:begin + min_samples]
+    for begin in range(0, len(padded) - min_samples + 1, hop)]),)
+
+
+class TestInference(unittest.TestCase):
+  def _waveforms(self, *lens):
+    rng = np.random.default_rng(0)
+    return [rng.integers(-100, 100, len_).astype(np.float32) for len_ in lens]
+  
+  def test_predict(self):
+    waveforms = self._waveforms(1, 7680, 15600, 15601, 23040, 40000)
+    
+    for waveform, scores in zip(waveforms, inference.predict(np, yamnet, PARAMS, waveforms)):
+      np.testing.assert_array_equal(scores, yamnet(waveform)[0])
+  
+  def test_patches_len(self):
+    for waveform in self._waveforms(1, 15600, 15601, 23280, 40000):
+      self.assertEqual(inference.patches_len(PARAMS, len(waveform)), len(yamnet(waveform)[0]))
+  
+  def test_batch_samples(self):
+    # every block (of 23040 samples) is padded to 23280, then aligned to 30720
+    self.assertEqual(inference.batch_samples(PARAMS, 60), 30720 * 62)
+    self.assertEqual(inference.batch_samples(PARAMS, 0), 30720)
+
+
+if __name__ == '__main__': unittest.main()
\ No newline at end of file
@@ -0,0 +1,129 @@
+import unittest
+import tempfile
+import os
+
+import yamosse.journal as journal
+import yamosse.options as options
+import yamosse.result as result
+
+FILE_NAMES = ('File Name A.wav', 'File Name B.wav', 'File Name C.wav')
+STAT = (1, 2, 3)
+
+
+class TestJournal(unittest.TestCase):
+  def setUp(self):
+    self._dir = tempfile.TemporaryDirectory()
+    self.addCleanup(self._dir.cleanup)
+    
+    self._file_name = os.path.join(self._dir.name, ''.join(('Output.txt', journal.EXT)))
+  
+  def _journal(self, resume=False, **kwargs):
+    return journal.Journal(self._file_name, options.Options(**kwargs), resume=resume)
+  
+  def _record(self):
+    records = []
+    
+    with self._journal() as j:
+      for file_name in FILE_NAMES:
+        r = result.Result()
+        r.append(0, len(records), 0.5)
+        records.append((file_name, STAT, r, None))
+        j.record(file_name, STAT, r, None)
+      
+      j.record('Error.wav', None, None, ValueError('message'))
+      records.append(('Error.wav', None, None, 'message'))
+    
+    return records
+  
+  def test_resume(self):
+    records = self._record()
+    
+    with self._journal(resume=True) as j:
+      self.assertTrue(j.resumed)
+      self.assertEqual(list(j.replay()), records)
+  
+  def test_no_resume(self):
+    self._record()
+    
+    with self._journal() as j:
+      self.assertFalse(j.resumed)
+      self.assertEqual(list(j.replay()), [])
+  
+  def test_resume_options(self):
+    self._record()
+    
+    # options that change the results can't be resumed from
+    with self._journal(resume=True, timespan=0) as j:
+      self.assertFalse(j.resumed)
+    
+    with self._journal(resume=True) as j:
+      self.assertFalse(j.resumed)
+    
+    # but ones that only change the output can be
+    self._record()
+    
+    with self._journal(resume=True, sort_reverse=True) as j:
+      self.assertTrue(j.resumed)
+  
+  def test_resume_options_worker(self):
+    # the batch and whether the score cache is used are a part of the results
+    for kwargs in ({'batch_seconds': 0}, {'score_cache_size': 0}):
+      with self.subTest(**kwargs):
+        self._record()
+        
+        with self._journal(resume=True, **kwargs) as j:
+          self.assertFalse(j.resumed)
+    
+    # but not the size of the score cache
+    self._record()
+    
+    with self._journal(resume=True, score_cache_size=1) as j:
+      self.assertTrue(j.resumed)
+  
+  def test_resume_partial(self):
+    records = self._record()
+    
+    # as if we crashed in the middle of writing the last record
+    with open(self._file_name, 'r+b') as f:
+      f.truncate(os.path.getsize(self._file_name) - 4)
+    
+    with self._journal(resume=True) as j:
+      self.assertEqual(list(j.replay()), records[:-1])
+      j.record(*records[-1])
+    
+    with self._journal(resume=True) as j:
+      self.assertEqual(list(j.replay()), records)
+  
+  def test_resume_missing(self):
+    with self._journal(resume=True) as j:
+      self.assertFalse(j.resumed)
+  
+  def test_remove(self):
+    self._journal().remove()
+    self.assertFalse(os.path.exists(self._file_name))
+  
+  def test_keep(self):
+    records = self._record()
+    manifest_file_name = os.path.join(self._dir.name, ''.join(('Output.txt', journal.MANIFEST_EXT)))
+    
+    self._journal(resume=True).keep(manifest_file_name)
+    self.assertFalse(os.path.exists(self._file_name))
+    
+    self.assertEqual(list(journal.replay(manifest_file_name, options.Options())), records)
+    self.assertEqual(list(journal.replay(manifest_file_name, options.Options(timespan=0))), [])
+  
+  def test_replay_missing(self):
+    self.assertEqual(list(journal.replay(self._file_name, options.Options())), [])
+  
+  def test_stat_key(self):
+    self.assertIsNone(journal.stat_key(self._file_name))
+    
+    with open(self._file_name, 'wb') as f:
+      f.write(b'RIFF')
+    
+    key = journal.stat_key(self._file_name)
+    self.assertEqual(key[0], 4)
+    self.assertEqual(key, journal.stat_key(self._file_name))
+
+
+if __name__ == '__main__': unittest.main()
\ No newline at end of file
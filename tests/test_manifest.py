@@ -0,0 +1,54 @@
+import unittest
+import tempfile
+import hashlib
+import os
+
+import yamosse.manifest as manifest
+
+FILE_NAMES = ('File Name A.wav', 'File Name B.wav', 'File\nName C.wav')
+
+
+class TestManifest(unittest.TestCase):
+  def setUp(self):
+    self._dir = tempfile.TemporaryDirectory()
+    self.addCleanup(self._dir.cleanup)
+    
+    self._file_name = os.path.join(self._dir.name, 'Manifest.txt')
+  
+  def _file_names(self, data, **kwargs):
+    with open(self._file_name, 'wb') as f:
+      f.write(data)
+    
+    return list(manifest.file_names(self._file_name, **kwargs))
+  
+  def test_path(self):
+    self.assertEqual(manifest.path('@Manifest.txt'), 'Manifest.txt')
+    self.assertEqual(manifest.path('@-'), manifest.STDIN)
+    self.assertIsNone(manifest.path('File Name A.wav'))
+  
+  def test_file_names_newlines(self):
+    self.assertEqual(self._file_names(b'File Name A.wav\r\n\nFile Name B.wav\n'), [
+      'File Name A.wav', 'File Name B.wav'
+    ])
+  
+  def test_file_names_nuls(self):
+    self.assertEqual(self._file_names(b'\0'.join(os.fsencode(f) for f in FILE_NAMES)),
+      list(FILE_NAMES))
+  
+  def test_file_names_chunks(self):
+    file_names = ['%d.wav' % i for i in range(manifest.CHUNK_SIZE // 4)]
+    
+    self.assertEqual(self._file_names('\n'.join(file_names).encode()), file_names)
+  
+  def test_file_names_hash(self):
+    data = b'File Name A.wav\nFile Name B.wav'
+    hash_ = hashlib.blake2b()
+    
+    self._file_names(data, hash_=hash_)
+    self.assertEqual(hash_.digest(), hashlib.blake2b(data).digest())
+  
+  def test_file_names_empty(self):
+    self.assertEqual(self._file_names(b''), [])
+
+
+if __name__ == '__main__': unittest.main()
\ No newline at end of file
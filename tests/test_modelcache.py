@@ -0,0 +1,128 @@
+import unittest
+import tempfile
+import types
+import os
+
+import yamosse.modelcache as modelcache
+import yamosse.filelock as filelock
+
+
+class Module:
+  pass
+
+
+def function(input_signature=None):
+  return lambda f: f
+
+
+def save(module, path):
+  with open(os.path.join(path, 'saved_model.pb'), 'w') as f:
+    f.write(module.model)
+
+
+def load(path):
+  with open(os.path.join(path, 'saved_model.pb')) as f:
+    return 'Loaded %s' % f.read()
+
+
+# only the parts of TensorFlow that the model cache uses
+tf = types.SimpleNamespace(
+  Module=Module,
+  function=function,
+  TensorSpec=lambda shape, dtype: None,
+  float32=None,
+  saved_model=types.SimpleNamespace(save=save, load=load)
+)
+
+
+class TestModelCache(unittest.TestCase):
+  def setUp(self):
+    self._dir = tempfile.TemporaryDirectory()
+    self.addCleanup(self._dir.cleanup)
+    
+    self._builds = 0
+  
+  def _model_cache(self, size=4, **settings):
+    return modelcache.ModelCache(size, dir_=os.path.join(self._dir.name, 'cache'), **settings)
+  
+  def _build(self, model='Model'):
+    def build():
+      self._builds += 1
+      return model
+    
+    return build
+  
+  def _entries(self, model_cache):
+    return sorted(e for e in os.listdir(model_cache.dir) if e != modelcache.LOCK)
+  
+  def test_key(self):
+    key = self._model_cache(model='A').key
+    
+    self.assertEqual(key, self._model_cache(model='A').key)
+    self.assertNotEqual(key, self._model_cache(model='B').key)
+    self.assertNotEqual(key, self._model_cache(model='A', tensorflow='2.0').key)
+  
+  def test_load(self):
+    model_cache = self._model_cache(model='A')
+    
+    self.assertEqual(model_cache.load(tf, self._build()), 'Loaded Model')
+    self.assertEqual(model_cache.load(tf, self._build()), 'Loaded Model')
+    self.assertEqual(self._builds, 1)
+    
+    self.assertEqual(self._entries(model_cache), [model_cache.key])
+  
+  def test_load_failed(self):
+    model_cache = self._model_cache(model='A')
+    
+    # the model can't be saved, so it's used as it is every time
+    model = object()
+    
+    self.assertIs(model_cache.load(tf, self._build(model)), model)
+    self.assertIs(model_cache.load(tf, self._build(model)), model)
+    self.assertEqual(self._builds, 2)
+    
+    self.assertEqual(self._entries(model_cache), [model_cache.key + modelcache.FAILED_EXT])
+    
+    # once it's failed, the model isn't built under the lock (so every worker builds at once)
+    def build():
+      lock = filelock.FileLock(os.path.join(model_cache.dir, modelcache.LOCK))
+      self.assertTrue(lock.acquire(blocking=False))
+      lock.release()
+      return model
+    
+    self.assertIs(model_cache.load(tf, build), model)
+  
+  def test_load_failed_expired(self):
+    model_cache = self._model_cache(model='A')
+    model_cache.load(tf, self._build(object()))
+    
+    # a failure long ago is tried again
+    past = 1000000000
+    os.utime(os.path.join(model_cache.dir, model_cache.key + modelcache.FAILED_EXT), (past, past))
+    
+    self.assertEqual(model_cache.load(tf, self._build()), 'Loaded Model')
+    self.assertEqual(self._entries(model_cache), [model_cache.key])
+  
+  def test_evict(self):
+    a, b, c = (self._model_cache(2, model=m) for m in 'ABC')
+    
+    a.load(tf, self._build())
+    b.load(tf, self._build())
+    
+    # a temporary directory left behind by a crash
+    os.mkdir(os.path.join(a.dir, modelcache.HIDDEN + 'Temp'))
+    
+    # the first one is used again, so the second one is the least recently used
+    past = 1000000000
+    
+    for model_cache in (a, b):
+      os.utime(os.path.join(model_cache.dir, model_cache.key), (past, past))
+    
+    a.load(tf, self._build())
+    c.load(tf, self._build())
+    
+    self.assertEqual(self._builds, 3)
+    self.assertEqual(self._entries(a), sorted((a.key, c.key)))
+
+
+if __name__ == '__main__': unittest.main()
\ No newline at end of file
@@ -1,6 +1,8 @@
 import unittest
 import tempfile
 from os import unlink
+from io import StringIO
+from copy import copy
 
 import yamosse.options as options
 
@@ -20,6 +22,22 @@ class TestOptions(unittest.TestCase):
       o.item_delimiter = '\u2665'
       o.print(file=file)
   
+  def test_print_input_manifest_hash(self):
+    o = options.Options()
+    self.assertNotIn('input_manifest_hash', vars(o))
+    
+    # only printed for a YAMScan that had manifests in its input
+    file = StringIO()
+    o.print(file=file)
+    self.assertNotIn('Input Manifest Hash', file.getvalue())
+    
+    o = copy(o)
+    o.input_manifest_hash = 'Hash'
+    
+    file = StringIO()
+    o.print(file=file)
+    self.assertIn('Input Manifest Hash: Hash\n', file.getvalue())
+  
   def test_set_types(self):
     o = options.Options()
     
@@ -10,11 +10,13 @@ import yamosse.output as output
 import yamosse.identification as identification
 import yamosse.options as options
 import yamosse.utils as utils
+import yamosse.externalsort as externalsort
 
 MODEL_YAMNET_CLASS_NAMES = ['Class A', 'Class B', 'Class C', 'Class D', 'Class E']
 
 SUFFIX_TXT = '.txt'
 SUFFIX_JSON = '.json'
+SUFFIX_JSONL = '.jsonl'
 
 FILE_NAMES = ('File Name A.wav', 'File Name B.wav', 'File Name C.wav')
 FILE_NAME = 'File Name.wav'
@@ -998,6 +1000,117 @@ class TestJSONOutput(TestOutput, unittest.TestCase):
     
     self.assertIn('results', d)
     self.assertIn('errors', d)
+  
+  def test_output_results_external_sort(self):
+    # results sorted as they were done are dumped exactly as if they were sorted all at once
+    for indent in (0, 1):
+      for sort_by in (output.NUMBER_OF_SOUNDS, output.FILE_NAME):
+        with self.subTest(indent=indent, sort_by=sort_by):
+          options = self._set_options(indent=indent, sort_by=sort_by, sort_reverse=True)
+          dumps = []
+          
+          for external in (False, True):
+            o, f = self._output_file()
+            
+            with o:
+              o.options(options)
+              results = CONFIDENCE_SCORES_STANDARD
+              
+              if external:
+                results = externalsort.ExternalSort(
+                  key=output.sort_key(o.identification, sort_by), reverse=True, run_size=2)
+                
+                for file_name, result in CONFIDENCE_SCORES_STANDARD.items():
+                  results.add((file_name, o.identification.result(result)))
+              
+              o.results(results)
+            
+            f.seek(0)
+            dumps.append(f.read())
+          
+          self.assertEqual(dumps[0], dumps[1])
+
+
+class TestJSONLinesOutput(TestOutput, unittest.TestCase):
+  def setUp(self):
+    super().setUp(SUFFIX_JSONL)
+  
+  def _records(self, f):
+    return [json.loads(line) for line in f.read().splitlines()]
+  
+  def test_output_options(self):
+    o, f = self._output_file()
+    
+    with o:
+      self.assertTrue(o.options(self._set_options()))
+      self.assertFalse(o.options(self._set_options()))
+    
+    records = self._records(f)
+    
+    self.assertEqual(len(records), 1)
+    self.assertIn('options', records[0])
+  
+  def test_output_result(self):
+    o, f = self._output_file(0)
+    
+    with o:
+      self.assertTrue(o.stream)
+      self.assertFalse(o.options(self._set_options(output_options=False, output_scores=True)))
+      
+      for file_name, result in CONFIDENCE_SCORES_STANDARD.items():
+        o.result(file_name, result)
+      
+      o.results({})
+    
+    records = self._records(f)
+    
+    # streamed results are in the order they were done in, not sorted
+    self.assertEqual([r['file_name'] for r in records], list(CONFIDENCE_SCORES_STANDARD))
+    
+    self.assertEqual(records[0]['result']['1'], [
+      {'timestamp': 0, 'score': 0.75},
+      {'timestamp': 3, 'score': 0.50}
+    ])
+  
+  def test_output_result_flushed(self):
+    o, f = self._output_file(0)
+    
+    with o:
+      o.options(self._set_options(output_options=False))
+      
+      # each record is in the file as soon as it's done, not only once the next one is
+      for file_name, result in CONFIDENCE_SCORES_STANDARD.items():
+        o.result(file_name, result)
+        
+        with open(f.name) as r:
+          self.assertEqual(self._records(r)[-1]['file_name'], file_name)
+  
+  def test_output_results_tr(self):
+    o, f = self._output_file(1)
+    
+    with o:
+      o.options(self._set_options(output_options=False, sort_by=output.NUMBER_OF_SOUNDS))
+      o.results(self._file_name_keys(TOP_RANKED_TIMESPANS))
+    
+    for record in self._records(f):
+      self.assertEqual(record['result'][0], {'timestamp': [1, 5], 'classes': [0, 1, 2]})
+      self.assertEqual(record['result'][1], {'timestamp': 7, 'classes': [1, 2, 3]})
+  
+  def test_output_results_errors(self):
+    results = self._file_name_keys({})
+    errors = self._file_name_keys('message')
+    o, f = self._output_file()
+    
+    with o:
+      o.results(results)
+      o.errors(errors)
+    
+    records = self._records(f)
+    
+    self.assertEqual(len(records), len(results) + len(errors))
+    
+    for record in records[len(results):]:
+      self.assertEqual(record['error'], 'message')
 
 
 if __name__ == '__main__': unittest.main()
\ No newline at end of file
@@ -0,0 +1,110 @@
+import unittest
+
+import yamosse.resampling as resampling
+
+import numpy as np
+import resampy
+
+SR_NEW = 16000
+
+
+class TestResampling(unittest.TestCase):
+  def _waveform(self, sr, seconds=2.5):
+    return np.random.default_rng(0).normal(
+      0.0, 0.1, int(sr * seconds) + 7).astype(np.float32)
+  
+  def _resample_chunked(self, resampler, waveform, chunks):
+    resampled = [resampler(c) for c in np.array_split(waveform, chunks)]
+    resampled.append(resampler.flush())
+    return np.concatenate(resampled)
+  
+  def _resample_streamed(self, sr, quality=resampling.QUALITY_BEST):
+    waveform = self._waveform(sr)
+    
+    a = self._resample_chunked(resampling.Resampler(np, sr, SR_NEW, quality=quality),
+      waveform, 1)
+    
+    b = self._resample_chunked(resampling.Resampler(np, sr, SR_NEW, quality=quality),
+      waveform, 37)
+    
+    self.assertEqual(a.dtype, np.float32)
+    self.assertEqual(len(a), len(waveform) * SR_NEW // sr)
+    self.assertTrue(np.array_equal(a, b))
+    return a
+  
+  def test_same(self):
+    waveform = self._waveform(SR_NEW)
+    
+    self.assertTrue(np.array_equal(
+      self._resample_chunked(resampling.Resampler(np, SR_NEW, SR_NEW), waveform, 5),
+      waveform
+    ))
+  
+  def test_decimate_32000(self):
+    self._resample_streamed(32000)
+  
+  def test_decimate_48000(self):
+    self._resample_streamed(48000)
+  
+  def test_decimate_48000_fast(self):
+    self._resample_streamed(48000, quality=resampling.QUALITY_FAST)
+  
+  def test_resampy_44100(self):
+    sr = 44100
+    waveform = self._waveform(sr)
+    
+    for quality in (resampling.QUALITY_BEST, resampling.QUALITY_FAST):
+      with self.subTest(quality=quality):
+        filter_ = resampling.Resampler.FILTERS[quality][0]
+        a = resampy.resample(waveform, sr, SR_NEW, filter=filter_)
+        
+        # resampy is given a chunk at a time, so this is only within a rounding error
+        # of resampling it all in one go
+        b = self._resample_chunked(resampling.Resampler(np, sr, SR_NEW,
+          quality=quality, resampy=resampy), waveform, 37)
+        
+        self.assertEqual(b.dtype, np.float32)
+        self.assertEqual(len(b), len(waveform) * SR_NEW // sr)
+        np.testing.assert_allclose(b, a[:len(b)], rtol=0, atol=1e-6)
+  
+  def test_decimate_sine(self):
+    sr = 48000
+    t = np.arange(sr * 2) / sr
+    
+    # a sine below the cutoff passes through, and a sine above it is removed
+    for frequency, expected in ((1000, 1.0), (12000, 0.0)):
+      resampler = resampling.Resampler(np, sr, SR_NEW)
+      
+      waveform = self._resample_chunked(resampler,
+        np.sin(2 * np.pi * frequency * t).astype(np.float32), 3)
+      
+      self.assertAlmostEqual(float(np.abs(waveform[1000:-1000]).max()), expected, places=2)
+  
+  def test_preroll(self):
+    sr = 48000
+    begin = 30000
+    waveform = self._waveform(sr)
+    
+    a = self._resample_chunked(resampling.Resampler(np, sr, SR_NEW), waveform, 1)
+    
+    # a stream that begins partway through is the same as the end of the entire stream
+    resampler = resampling.Resampler(np, sr, SR_NEW)
+    resampler.preroll(waveform[:begin])
+    
+    b = self._resample_chunked(resampler, waveform[begin:], 7)
+    self.assertTrue(np.array_equal(a[begin * SR_NEW // sr:], b))
+  
+  def test_empty(self):
+    resampler = resampling.Resampler(np, 48000, SR_NEW)
+    self.assertEqual(len(resampler.flush()), 0)
+  
+  def test_quality_invalid(self):
+    with self.assertRaises(ValueError):
+      resampling.Resampler(np, 48000, SR_NEW, quality='Invalid')
+  
+  def test_resampy_required(self):
+    with self.assertRaises(ValueError):
+      resampling.Resampler(np, 44100, SR_NEW)
+
+
+if __name__ == '__main__': unittest.main()
\ No newline at end of file
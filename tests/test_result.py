@@ -0,0 +1,43 @@
+import unittest
+import pickle
+
+import yamosse.result as result
+
+
+class TestResult(unittest.TestCase):
+  def _result(self):
+    r = result.Result()
+    r.append(0, 1, 0.75)
+    r.append(0, (3, 7), 0.5)
+    r.append(2, -1, 0.25)
+    return r
+  
+  def test_empty(self):
+    r = result.Result()
+    
+    self.assertEqual(len(r), 0)
+    self.assertEqual(list(r), [])
+  
+  def test_iter(self):
+    self.assertEqual(list(self._result()), [(0, 1, 0.75), (0, (3, 7), 0.5), (2, -1, 0.25)])
+  
+  def test_columns(self):
+    r = result.Result([0, 0, 2], [1, 3, -1], [1, 7, -1], [0.75, 0.5, 0.25])
+    self.assertEqual(r, self._result())
+  
+  def test_columns_length(self):
+    with self.assertRaises(ValueError):
+      result.Result([0, 1], [1], [1], [0.75])
+  
+  def test_bytes(self):
+    r = self._result()
+    
+    self.assertEqual(result.Result(r.classes.tobytes(), r.begins.tobytes(),
+      r.ends.tobytes(), r.scores.tobytes()), r)
+  
+  def test_pickle(self):
+    r = self._result()
+    self.assertEqual(pickle.loads(pickle.dumps(r)), r)
+
+
+if __name__ == '__main__': unittest.main()
\ No newline at end of file
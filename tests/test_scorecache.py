@@ -0,0 +1,111 @@
+import unittest
+import tempfile
+import os
+
+import yamosse.scorecache as scorecache
+
+import numpy as np
+
+CLASSES = 5
+
+
+class TestScoreCache(unittest.TestCase):
+  def setUp(self):
+    self._dir = tempfile.TemporaryDirectory()
+    self.addCleanup(self._dir.cleanup)
+    
+    self._file_name = os.path.join(self._dir.name, 'File Name.wav')
+    
+    with open(self._file_name, 'wb') as f:
+      f.write(b'RIFF' * 64)
+  
+  def _score_cache(self, size=1, **settings):
+    return scorecache.ScoreCache(size, dir_=os.path.join(self._dir.name, 'cache'), **settings)
+  
+  def _write(self, score_cache, key, save=True, predictions=(0, 1, 2)):
+    scores = np.random.default_rng(0).random((len(predictions), CLASSES), dtype=np.float32)
+    
+    with score_cache.writer(np, key, CLASSES) as writer:
+      writer.write(predictions, scores)
+      writer.save = save
+    
+    return scores
+  
+  def test_bool(self):
+    self.assertTrue(self._score_cache(1))
+    self.assertFalse(self._score_cache(0))
+  
+  def test_key(self):
+    key = self._score_cache().key(self._file_name)
+    
+    self.assertEqual(key, self._score_cache().key(self._file_name))
+    self.assertNotEqual(key, self._score_cache(model='Model').key(self._file_name))
+  
+  def test_get(self):
+    score_cache = self._score_cache()
+    key = score_cache.key(self._file_name)
+    
+    self.assertIsNone(score_cache.get(np, key, CLASSES))
+    
+    scores = self._write(score_cache, key)
+    
+    # the scores must be exactly the same as the ones that were written
+    predictions, cached_scores = score_cache.get(np, key, CLASSES)
+    self.assertEqual(predictions.tolist(), [0, 1, 2])
+    self.assertEqual(cached_scores.dtype, np.float32)
+    self.assertTrue(np.array_equal(cached_scores, scores))
+    
+    # a different number of classes is a different model, so mustn't be used
+    self.assertIsNone(score_cache.get(np, key, CLASSES + 1))
+  
+  def test_get_empty(self):
+    score_cache = self._score_cache()
+    key = score_cache.key(self._file_name)
+    
+    # a sound file that was entirely background noise
+    self._write(score_cache, key, predictions=())
+    
+    predictions, scores = score_cache.get(np, key, CLASSES)
+    self.assertEqual(len(predictions), 0)
+    self.assertEqual(scores.shape, (0, CLASSES))
+  
+  def test_unsaved(self):
+    score_cache = self._score_cache()
+    key = score_cache.key(self._file_name)
+    
+    self._write(score_cache, key, save=False)
+    self.assertIsNone(score_cache.get(np, key, CLASSES))
+    self.assertEqual(os.listdir(os.path.dirname(score_cache._path(key))), [])
+  
+  def test_evict(self):
+    score_cache = self._score_cache()
+    key = score_cache.key(self._file_name)
+    
+    self._write(score_cache, key)
+    
+    score_cache.evict()
+    self.assertIsNotNone(score_cache.get(np, key, CLASSES))
+    
+    self._score_cache(0).evict()
+    self.assertIsNone(score_cache.get(np, key, CLASSES))
+  
+  def test_evict_temporary(self):
+    score_cache = self._score_cache(0)
+    key = score_cache.key(self._file_name)
+    
+    # a temporary file that's still being written isn't removed
+    # but one left behind by a crash long ago is
+    with score_cache.writer(np, key, CLASSES) as writer:
+      writer._file.flush()
+      
+      score_cache.evict()
+      self.assertTrue(os.path.exists(writer._file.name))
+      
+      past = 1000000000
+      os.utime(writer._file.name, (past, past))
+      
+      score_cache.evict()
+      self.assertFalse(os.path.exists(writer._file.name))
+
+
+if __name__ == '__main__': unittest.main()
\ No newline at end of file
@@ -0,0 +1,108 @@
+import unittest
+from unittest import mock
+import tempfile
+import types
+import os
+
+import yamosse.walk as walk
+import yamosse.yamscan as yamscan
+
+FILE_NAMES = (
+  'Sound A.wav',
+  'Sound B.FLAC',
+  'Notes.txt',
+  os.path.join('Sub', 'Sound C.wav'),
+  os.path.join('Sub', 'Sub', 'Sound D.ogg'),
+  os.path.join('Skip', 'Sound E.wav')
+)
+
+
+class TestWalk(unittest.TestCase):
+  def setUp(self):
+    self._dir = tempfile.TemporaryDirectory()
+    self.addCleanup(self._dir.cleanup)
+    
+    self._path = path = self._dir.name
+    
+    for size, file_name in enumerate(FILE_NAMES, start=1):
+      file_name = os.path.join(path, file_name)
+      os.makedirs(os.path.dirname(file_name), exist_ok=True)
+      
+      with open(file_name, 'wb') as f:
+        f.write(b'\0' * size)
+  
+  def _walk(self, **kwargs):
+    path = self._path
+    return {os.path.relpath(p, path): s for p, s in walk.walk(path, **kwargs)}
+  
+  def test_walk(self):
+    self.assertEqual(set(self._walk()), {
+      f for f in FILE_NAMES if not f.endswith('.txt')
+    })
+  
+  def test_walk_not_recursive(self):
+    self.assertEqual(set(self._walk(recursive=False)), {'Sound A.wav', 'Sound B.FLAC'})
+  
+  def test_walk_include(self):
+    self.assertEqual(set(self._walk(include=['*.txt', 'Sound A.*'])), {
+      'Notes.txt', 'Sound A.wav'
+    })
+  
+  def test_walk_exclude(self):
+    self.assertEqual(set(self._walk(exclude=['Skip', '*.FLAC'])), {
+      'Sound A.wav',
+      os.path.join('Sub', 'Sound C.wav'),
+      os.path.join('Sub', 'Sub', 'Sound D.ogg')
+    })
+  
+  def test_walk_size(self):
+    self.assertEqual(set(self._walk(min_size=2, max_size=4)), {
+      'Sound B.FLAC',
+      os.path.join('Sub', 'Sound C.wav')
+    })
+  
+  def test_walk_stat(self):
+    for file_name, stat in self._walk().items():
+      stat_result = os.stat(os.path.join(self._path, file_name))
+      
+      self.assertEqual(stat.st_size, stat_result.st_size)
+      self.assertEqual(stat.st_mtime_ns, stat_result.st_mtime_ns)
+      self.assertEqual(stat.st_ino, stat_result.st_ino)
+  
+  def test_walk_deduplicate_no_inode(self):
+    # on Windows, the stats from a directory listing have an inode and device of zero
+    # which mustn't make every file look like a copy of the first
+    def stat(stat_result):
+      return walk.Stat(stat_result.st_size, stat_result.st_mtime_ns, 0, 0)
+    
+    with mock.patch.object(walk, '_stat', stat):
+      stats = dict(walk.walk(self._path))
+    
+    self.assertGreater(len(stats), 1)
+    
+    yamscan_ = yamscan.YAMScan.__new__(yamscan.YAMScan)
+    yamscan_.options = types.SimpleNamespace(deduplicate=True)
+    yamscan_.file_names = stats
+    
+    copies = {}
+    file_names = yamscan_._deduplicate(types.SimpleNamespace(show=lambda *args, **kwargs: None),
+      None, list(stats), copies)
+    
+    self.assertEqual(file_names, list(stats))
+    self.assertFalse(any(copies.values()))
+  
+  def test_stat(self):
+    file_name = os.path.join(self._path, FILE_NAMES[0])
+    self.assertEqual(walk.stat(file_name).st_size, 1)
+    
+    self.assertIsNone(walk.stat(os.path.join(self._path, 'Missing.wav')))
+  
+  def test_extensions(self):
+    extensions = walk.extensions()
+    
+    self.assertIn('wav', extensions)
+    self.assertIn('flac', extensions)
+    self.assertNotIn('txt', extensions)
+
+
+if __name__ == '__main__': unittest.main()
\ No newline at end of file
@@ -0,0 +1,165 @@
+import unittest
+import tempfile
+import types
+import os
+
+import yamosse.worker as worker
+import yamosse.yamscan as yamscan
+import yamosse.options as options
+
+import numpy as np
+import soundfile as sf
+
+from tests.test_inference import yamnet
+
+SAMPLE_RATE = 16000
+
+
+class Progress:
+  def __enter__(self):
+    return self
+  
+  def __exit__(self, exc, val, tb):
+    pass
+  
+  def step(self, value):
+    pass
+
+
+class Identification:
+  # only keeps the timestamps and scores that the worker predicts
+  def __init__(self):
+    self.predictions = []
+    self.scores = []
+  
+  def __enter__(self):
+    return self
+  
+  def __exit__(self, exc, val, tb):
+    pass
+  
+  def predict_batch(self, predictions, scores):
+    self.predictions.append(predictions)
+    self.scores.append(scores)
+  
+  def timestamps(self, shutdown):
+    return np.concatenate(self.predictions), np.concatenate(self.scores)
+  
+  def segment(self):
+    pass
+  
+  def state(self):
+    return self.predictions, self.scores
+
+
+class TestWorker(unittest.TestCase):
+  def setUp(self):
+    self._dir = tempfile.TemporaryDirectory()
+    self.addCleanup(self._dir.cleanup)
+    
+    self._file_name = self._write(SAMPLE_RATE)
+    
+    yamnet_ = worker._yamnet
+    worker._yamnet = yamnet
+    self.addCleanup(setattr, worker, '_yamnet', yamnet_)
+    
+    local = worker._local
+    local.context = types.SimpleNamespace(progress=Progress(), model_yamnet_class_names=['Class'])
+    local.score_cache = None
+    local.cancelled = types.SimpleNamespace(is_set=lambda: False)
+    self.addCleanup(local.__dict__.clear)
+  
+  def _write(self, sr, seconds=20):
+    file_name = os.path.join(self._dir.name, 'File Name %d.wav' % sr)
+    
+    # noise, with some silence in it so that some blocks are skipped as background noise
+    data = np.random.default_rng(0).integers(-10000, 10000, sr * seconds, dtype=np.int16)
+    data[sr * 5:sr * 8] = 0
+    sf.write(file_name, data, sr)
+    return file_name
+  
+  def _worker(self, batch_seconds=60, background_noise_volume=0.01, segment_seconds=600,
+    file_name=None, *args):
+    worker._local.options = types.SimpleNamespace(identification=Identification(),
+      background_noise_volume=background_noise_volume, batch_seconds=batch_seconds,
+      resample_quality='Best', segment_seconds=segment_seconds)
+    
+    return worker.worker(file_name or self._file_name, *args)
+  
+  def _worker_segments(self, file_name, segment_seconds):
+    # the segments are scanned one after another, then put back together
+    predictions = []
+    scores = []
+    
+    info = sf.info(file_name)
+    segments = worker.split_segments(info.samplerate, info.frames, segment_seconds, 2)[2]
+    
+    for segment in range(segments):
+      segment_predictions, segment_scores = self._worker(2, 0.01, segment_seconds,
+        file_name, segment, segments)
+      
+      predictions += segment_predictions
+      scores += segment_scores
+    
+    return np.concatenate(predictions), np.concatenate(scores)
+  
+  def test_worker_batch(self):
+    # batching the blocks must give the same scores as giving them to YAMNet one at a time
+    predictions, scores = self._worker(0)
+    
+    for batch_seconds in (2, 5, 60):
+      with self.subTest(batch_seconds=batch_seconds):
+        batch_predictions, batch_scores = self._worker(batch_seconds)
+        
+        np.testing.assert_array_equal(batch_predictions, predictions)
+        np.testing.assert_array_equal(batch_scores, scores)
+  
+  def test_worker_timestamps(self):
+    # every patch is one patch hop after the last, rounded down to the second
+    # (so, for example, the second patch of block 37 is at 36 seconds)
+    predictions, scores = self._worker(background_noise_volume=0,
+      file_name=self._write(SAMPLE_RATE, 40))
+    
+    self.assertEqual(predictions[37 * 2 + 1], 36)
+    np.testing.assert_array_equal(predictions, np.arange(len(predictions)) * 7680 // SAMPLE_RATE)
+  
+  def test_worker_segments(self):
+    # a whole number ratio gives exactly the same scores as the entire sound file
+    # any other ratio is resampled a chunk at a time, so it's within a rounding error
+    for sr, atol in ((SAMPLE_RATE, 0), (48000, 0), (44100, 1e-6)):
+      with self.subTest(sr=sr):
+        file_name = self._write(sr)
+        predictions, scores = self._worker(2, file_name=file_name)
+        
+        segment_predictions, segment_scores = self._worker_segments(file_name, 6)
+        
+        np.testing.assert_array_equal(segment_predictions, predictions)
+        np.testing.assert_allclose(segment_scores, scores, rtol=0, atol=atol)
+  
+  def test_split(self):
+    # the YAMScan splits sound files into segments rounded up the same as the workers do
+    # so no segment ever begins at or past the end of the sound file
+    for sr in (SAMPLE_RATE, 22050, 44100, 48000):
+      for seconds in (599, 601, 655, 656, 1300, 3600.5):
+        for batch_seconds in (0, 5, 60):
+          frames = int(sr * seconds)
+          
+          o = options.Options(segment_seconds=600, batch_seconds=batch_seconds)
+          scheduled = yamscan.YAMScan._split(types.SimpleNamespace(options=o),
+            [('File Name.wav', (frames, sr))])
+          
+          with self.subTest(sr=sr, seconds=seconds, batch_seconds=batch_seconds):
+            self.assertAlmostEqual(sum(s for s, item in scheduled), frames / sr)
+            
+            if len(scheduled) == 1:
+              continue
+            
+            segment_blocks = worker.split_segments(sr, frames, 600, batch_seconds)[0]
+            
+            for segment_seconds, (file_name, segment, segments) in scheduled:
+              self.assertEqual(segments, len(scheduled))
+              self.assertGreater(segment_seconds, 0)
+              self.assertLess(segment * segment_blocks * 15360 * sr // SAMPLE_RATE, frames)
+
+
+if __name__ == '__main__': unittest.main()
\ No newline at end of file
@@ -14,6 +14,7 @@ import yamosse.subsystem as yamosse_subsystem
 import yamosse.options as yamosse_options
 import yamosse.yamscan as yamosse_yamscan
 import yamosse.worker as yamosse_worker
+import yamosse.manifest as yamosse_manifest
 
 try:
   from . import gui
@@ -29,7 +30,7 @@ TITLE = ' '.join((NAME, VERSION))
 
 class _YAMosse:
   __slots__ = (
-    '_window', '_subsystem', '_options',
+    '_window', '_subsystem', '_options', '_pool',
     '_model_yamnet_class_names', '_tfhub_enabled'
   )
   
@@ -50,6 +51,7 @@ class _YAMosse:
   YAMSCAN_FILETYPES = (
     ('Text Document', '*.txt'),
     ('JSON', '*.json'),
+    ('JSON Lines', '*.jsonl'),
     ('All Files', '*.*')
   )
   
@@ -63,6 +65,7 @@ class _YAMosse:
   MESSAGE_IMPORT_PRESET_INVALID = 'The imported preset is invalid.'
   
   MESSAGE_INPUT_NONE = 'You must select an input folder or files first.'
+  MESSAGE_INPUT_MANIFEST_NONE = 'The input manifest file does not exist.'
   MESSAGE_CLASSES_NONE = 'You must select at least one class first.'
   
   MESSAGE_WEIGHTS_NONE = ('You have not specified the weights file. Would you like to download '
@@ -71,10 +74,14 @@ class _YAMosse:
   
   MESSAGE_ASK_RESTORE_DEFAULTS = 'Are you sure you want to restore the defaults?'
   
-  def __init__(self):
+  def __init__(self, pool=None):
     self._window = None
     self._subsystem = None
     
+    # the workers are kept from one YAMScan to the next, so they don't have to load YAMNet again
+    # (this outlives us, in case we're restarted, like when a preset is imported)
+    self._pool = pool
+    
     # try and load the options file first
     # if failed to load options file, reset to defaults
     try:
@@ -158,7 +165,15 @@ class _YAMosse:
       # because that can also change the options and leave it in an invalid state
       try:
         if kwargs:
-          call(self.yamscan, 'output_file_name')
+          call(
+            lambda o: self.yamscan(
+              o,
+              resume=kwargs.get('resume', False),
+              incremental=kwargs.get('incremental', False)
+            ),
+            
+            'output_file_name'
+          )
           return None
       finally:
         options = self._options
@@ -222,7 +237,7 @@ class _YAMosse:
     self._subsystem.attrs_to_variables(options)
     options.export_preset(file_name)
   
-  def yamscan(self, output_file_name='', exit_=None):
+  def yamscan(self, output_file_name='', exit_=None, resume=False, incremental=False):
     subsystem = self._subsystem
     options = self._options
     subsystem.attrs_to_variables(options)
@@ -233,6 +248,14 @@ class _YAMosse:
       subsystem.error(self.MESSAGE_INPUT_NONE)
       return None
     
+    for input_manifest_path in map(yamosse_manifest.path, input_):
+      if input_manifest_path is None or input_manifest_path == yamosse_manifest.STDIN:
+        continue
+      
+      if not os.path.isfile(input_manifest_path):
+        subsystem.error(self.MESSAGE_INPUT_MANIFEST_NONE)
+        return None
+    
     if not options.classes:
       subsystem.error(self.MESSAGE_CLASSES_NONE)
       return None
@@ -256,7 +279,8 @@ class _YAMosse:
         parent=window,
         filetypes=self.YAMSCAN_FILETYPES,
         initialdir=self.YAMSCAN_INITIALDIR,
-        initialfile=os.path.splitext(os.path.basename(input_[0]))[0],
+        initialfile=os.path.splitext(os.path.basename(
+          yamosse_manifest.path(input_[0]) or input_[0]))[0],
         defaultextension=self.YAMSCAN_DEFAULTEXTENSION
       )
       
@@ -306,7 +330,10 @@ class _YAMosse:
       tfhub_enabled,
       subsystem,
       options,
-      exit_=exit_
+      exit_=exit_,
+      resume=resume,
+      incremental=incremental,
+      pool=self._pool
     )
   
   def restore_defaults(self):
@@ -357,7 +384,14 @@ class _YAMosse:
 
 
 def yamosse(**kwargs):
-  while _YAMosse().mainloop(**kwargs): pass
+  pool = yamosse_yamscan.Pool()
+  
+  try:
+    while _YAMosse(pool).mainloop(**kwargs): pass
+  finally:
+    # waits for any YAMScan that is still using the pool to be done with it first
+    with pool.lock:
+      pool.close()
 
 
 # "All I need, is for someone to catch my smoke signal, and rescue me, from myself."
\ No newline at end of file
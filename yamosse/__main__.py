@@ -27,6 +27,12 @@ parser.add_argument('-ep', '--export-preset',
 parser.add_argument('-y', '--yamscan',
   dest='output_file_name', default=argparse.SUPPRESS)
 
+parser.add_argument('-rs', '--resume',
+  action='store_true', default=argparse.SUPPRESS)
+
+parser.add_argument('-in', '--incremental',
+  action='store_true', default=argparse.SUPPRESS)
+
 parser.add_argument('-o', '--option', nargs=2,
   action='append', dest='options_attrs', metavar=('KEY', 'VALUE'), default=[])
 
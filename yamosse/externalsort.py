@@ -0,0 +1,89 @@
+from tempfile import TemporaryFile
+from heapq import merge
+from operator import itemgetter
+import pickle
+
+_key = itemgetter(0)
+
+
+class ExternalSort:
+  __slots__ = ('key', 'reverse', 'run_size', '_items', '_runs', '_len')
+  
+  RUN_SIZE = 2 ** 16
+  
+  def __init__(self, key=None, reverse=False, run_size=RUN_SIZE):
+    # sorts items without needing all of them in memory at once
+    # they are added to a list, which once it is big enough is sorted and spilled to disk as a run
+    # then the runs are merged together as they are read back in, a little bit of each at a time
+    # the sort is stable, exactly as if everything were sorted in one go with sorted()
+    self.key = key
+    self.reverse = reverse
+    self.run_size = run_size
+    
+    # the key is found once per item, as it's added, and kept alongside it
+    self._items = []
+    self._runs = []
+    self._len = 0
+  
+  def __len__(self):
+    return self._len
+  
+  def __iter__(self):
+    # only one iteration should be done at a time, as each iteration reads the runs from the start
+    reverse = self.reverse
+    
+    items = self._items
+    items.sort(key=_key, reverse=reverse)
+    
+    # when the keys are the same, merge takes from the earlier runs first
+    # so the items stay in the order they were added
+    for key, item in merge(*[self._run(run) for run in self._runs], items,
+      key=_key, reverse=reverse):
+      yield item
+  
+  def add(self, item):
+    key = self.key
+    items = self._items
+    
+    items.append((key(item) if key else item, item))
+    self._len += 1
+    
+    if len(items) >= self.run_size:
+      self._spill()
+  
+  def close(self):
+    runs = self._runs
+    self._runs = []
+    
+    # the items that were spilled are gone now
+    self._len = len(self._items)
+    
+    for run in runs:
+      run.close()
+  
+  def _spill(self):
+    items = self._items
+    items.sort(key=_key, reverse=self.reverse)
+    
+    # temporary files are deleted as soon as they are closed
+    run = TemporaryFile()
+    
+    try:
+      for item in items:
+        pickle.dump(item, run, protocol=pickle.HIGHEST_PROTOCOL)
+    except:
+      run.close()
+      raise
+    
+    self._runs.append(run)
+    items.clear()
+  
+  @staticmethod
+  def _run(run):
+    run.seek(0)
+    
+    while True:
+      try:
+        yield pickle.load(run)
+      except EOFError:
+        return
\ No newline at end of file
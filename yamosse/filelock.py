@@ -0,0 +1,92 @@
+from time import sleep
+import os
+
+if os.name == 'nt':
+  import msvcrt
+else:
+  import fcntl
+
+
+class FileLock:
+  __slots__ = ('name', '_file')
+  
+  INTERVAL = 0.1 # seconds
+  
+  def __init__(self, name):
+    # a lock that works across processes (including ones that aren't ours)
+    # it's held on the file, which is created if it doesn't exist and is never deleted
+    # because deleting it could let two processes each lock a different file of the same name
+    # the lock is released if the process holding it dies, so it can't be left locked
+    self.name = name
+    self._file = None
+  
+  def __enter__(self):
+    self.acquire()
+    return self
+  
+  def __exit__(self, exc, val, tb):
+    self.release()
+  
+  def acquire(self, blocking=True):
+    # returns True if the lock was acquired, or False if it wasn't (only if not blocking)
+    if self._file is not None:
+      raise RuntimeError('the file lock is already acquired')
+    
+    file = open(self.name, 'a+b')
+    
+    try:
+      while not _lock(file):
+        if not blocking:
+          file.close()
+          return False
+        
+        sleep(self.INTERVAL)
+    except:
+      file.close()
+      raise
+    
+    self._file = file
+    return True
+  
+  def release(self):
+    file = self._file
+    
+    if file is None:
+      raise RuntimeError('the file lock is not acquired')
+    
+    self._file = None
+    
+    # closing the file releases the lock, but this makes sure it's released right away
+    try:
+      _unlock(file)
+    finally:
+      file.close()
+
+
+if os.name == 'nt':
+  def _lock(file):
+    # locks the first byte, which doesn't need to exist
+    # (on Windows, there's no way to wait on the lock without giving up after a few seconds)
+    file.seek(0)
+    
+    try:
+      msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+      return False
+    
+    return True
+  
+  def _unlock(file):
+    file.seek(0)
+    msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+  def _lock(file):
+    try:
+      fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+      return False
+    
+    return True
+  
+  def _unlock(file):
+    fcntl.flock(file.fileno(), fcntl.LOCK_UN)
\ No newline at end of file
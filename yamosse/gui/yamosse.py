@@ -61,7 +61,11 @@ TIP_WORKER_OPTIONS_MAX_WORKERS = ('Increasing the max number of workers will mak
   'lowering the memory limit will make them cost less.)')
 
 TIP_WORKER_OPTIONS_HIGH_PRIORITY = ('Mark YAMosse as High Priority to make scans faster, at the '
-  'expense of other programs running slower.')
+  'expense of other programs running slower. This does not apply to the Threads worker mode.')
+
+TIP_WORKER_OPTIONS_BATCH = ('How many seconds of the sound file to give to the YAMNet model at '
+  'once. Larger batches make scans faster, but use more memory. Set this to zero to give the '
+  'model one block (of two patches) at a time.')
 
 URL_ONLINE_HELP = 'https://github.com/tomysshadow/YAMosse/blob/main/README.md'
 
@@ -481,12 +485,6 @@ def make_items(frame, variables):
   return item_delimiter_frame, indent_checkbutton
 
 
-def make_spacer(frame):
-  frame.rowconfigure(0, weight=1) # make label vertically centered
-  
-  ttk.Label(frame).grid()
-
-
 def make_output_file_options(frame, variables):
   frame.columnconfigure(0, weight=1) # one column layout
   
@@ -537,14 +535,15 @@ def make_worker_options(frame, variables):
   
   high_priority_checkbutton.grid(row=2, sticky=tk.W, pady=gui.PADY_QN)
   
-  spacer_frame = ttk.Frame(frame)
-  spacer_frame.grid(row=3, pady=gui.PADY_QN)
-  make_spacer(spacer_frame)
+  batch_frame = ttk.Frame(frame)
+  batch_frame.grid(row=3, sticky=tk.EW, pady=gui.PADY_QN)
+  gui.make_spinbox(batch_frame, name='Batch', textvariable=variables['batch_seconds'],
+    from_=0, to=600, unit=UNIT_SECONDS)
   
   gui.grid_configure_size_widget(frame, 'row', weight=1,
     uniform='output_file_worker_options_row') # make the rows uniform
   
-  return memory_limit_frame, max_workers_frame, high_priority_checkbutton
+  return memory_limit_frame, max_workers_frame, high_priority_checkbutton, batch_frame
 
 
 def _link_tips(text, tips):
@@ -655,7 +654,8 @@ def make_advanced(frame, yamosse, variables):
     
     worker_options_widgets[0]: TIP_WORKER_OPTIONS_MEMORY_LIMIT,
     worker_options_widgets[1]: TIP_WORKER_OPTIONS_MAX_WORKERS,
-    worker_options_widgets[2]: TIP_WORKER_OPTIONS_HIGH_PRIORITY
+    worker_options_widgets[2]: TIP_WORKER_OPTIONS_HIGH_PRIORITY,
+    worker_options_widgets[3]: TIP_WORKER_OPTIONS_BATCH
   })
 
 
@@ -1,9 +1,9 @@
 from abc import ABC, abstractmethod
-from collections import OrderedDict
 from contextlib import suppress, contextmanager
 
 import yamosse.utils as yamosse_utils
 import yamosse.output as yamosse_output
+import yamosse.result as yamosse_result
 
 
 class _Identification(ABC):
@@ -30,18 +30,54 @@ class _Identification(ABC):
   def clear(self):
     pass
   
-  @abstractmethod
   def predict(self, prediction_score=None):
+    if not prediction_score: return
+    
+    prediction, score = prediction_score
+    self.predict_batch(self.np.asarray((prediction,)), score[self.np.newaxis])
+  
+  @abstractmethod
+  def predict_batch(self, predictions, scores):
+    # predicts the scores of many patches at once, with their predictions in order
     pass
   
   @abstractmethod
   def timestamps(self, shutdown):
     pass
   
+  # a long sound file may be split into segments, each predicted on its own
+  # the state of each segment (before it is made into timestamps) is then
+  # merged in order, which must give the same timestamps as if it weren't split
+  # (given the same scores, which they are to within a rounding error, see the worker)
+  def segment(self):
+    pass
+  
+  @abstractmethod
+  def state(self):
+    pass
+  
+  @abstractmethod
+  def merge(self, states):
+    pass
+  
+  @classmethod
+  def segmentable(cls, options):
+    assert options # silence unused argument warning
+    return True
+  
+  @classmethod
+  def result(cls, result):
+    # results are normally made by the workers, but may also be given
+    # as nested dictionaries of classes, timestamps and their scores
+    if isinstance(result, yamosse_result.Result):
+      return result
+    
+    return cls._result_from_dict(result)
+  
   @classmethod
-  def restructure_results_for_output(cls, results, output):
-    assert output # silence unused argument warning
-    return results
+  @abstractmethod
+  def restructure_result_for_output(cls, result, output):
+    raise NotImplementedError
   
   @classmethod
   @abstractmethod
@@ -86,9 +122,28 @@ class _Identification(ABC):
     # that is, classes in Confidence Score mode, or timestamps in Top Ranked mode
     return item[0]
   
-  @staticmethod
-  def _range_timestamp(begin, end, timespan):
-    return (begin, end) if timespan and begin + timespan < end else begin
+  def _result(self, classes, begins, ends, scores):
+    # the columns are given to the result as bytes, in the types that it uses
+    # which converts them from numpy types into ones that can be pickled
+    # into the main process which does not have numpy loaded
+    np = self.np
+    
+    return yamosse_result.Result(*(np.asarray(column, dtype=dtype).tobytes()
+      for column, dtype in zip((classes, begins, ends, scores),
+        (np.intc, np.int64, np.int64, np.float32), strict=True)))
+  
+  def _range_ends(self, begins, ends, timespan):
+    # a range shorter than the timespan is just the timestamp it begins on
+    # which is where its end is the same as its beginning
+    if not timespan:
+      return begins
+    
+    return self.np.where(begins + timespan < ends, ends, begins)
+  
+  @classmethod
+  @abstractmethod
+  def _result_from_dict(cls, result):
+    raise NotImplementedError
   
   @staticmethod
   @contextmanager
@@ -100,103 +155,169 @@ class _Identification(ABC):
 
 
 class _ConfidenceScoreIdentification(_Identification):
-  __slots__ = ('_class_predictions', '_minmax')
+  __slots__ = (
+    '_predictions', '_columns', '_scores',
+    '_order', '_identified', '_calibration', '_minmax'
+  )
   
   def __init__(self, options, np):
     super().__init__(options, np)
     
-    self._class_predictions = {}
+    # rather than a dictionary of predictions per class, which is slow to build one score at a time
+    # we keep arrays of the prediction, column (in the classes array) and score
+    # of every second where a class was identified, which are only turned into timestamps at the end
+    # along with the columns in the order they were first identified, which is the order of the result
+    self._predictions = []
+    self._columns = []
+    self._scores = []
+    
+    self._order = []
+    self._identified = np.zeros(len(options.classes), dtype=bool)
+    
+    self._calibration = np.take(options.calibration, options.classes)
     self._minmax = self._max if options.confidence_score_minmax else self._min
   
   def clear(self):
-    self._class_predictions.clear()
-  
-  def predict(self, prediction_score=None):
-    if not prediction_score: return
+    # these are replaced (instead of cleared) because the state may still be using them
+    self._predictions = []
+    self._columns = []
+    self._scores = []
     
-    class_predictions = self._class_predictions
-    prediction, score = prediction_score
+    self._order = []
+    self._identified[:] = False
+  
+  def predict_batch(self, predictions, scores):
+    if not len(predictions): return
     
+    np = self.np
     options = self.options
-    calibration = options.calibration
-    confidence_score = options.confidence_score
     
     if options.timespan_span_all:
-      prediction = self.TIMESTAMP_ALL
+      predictions = np.full(len(predictions), self.TIMESTAMP_ALL)
     
     # this is pretty self explanatory
-    # check if the score we got is above the confidence score
-    # if it is, take the max score found per one second of the sound
+    # check if the scores we got are above the confidence score
+    # if they are, take the max score found per one second of the sound
     # for display if the Output Scores option is checked
-    for class_ in options.classes:
-      # calibrate the score and ensure it is less than 100%
-      calibrated_score = min(score[class_] * calibration[class_], 1.0)
-      
-      if not self._minmax(calibrated_score, confidence_score):
-        continue
+    # this is all done at once for every patch, instead of one class of one patch at a time
+    # calibrate the scores and ensure they are less than 100%
+    calibrated_scores = np.minimum(scores.take(options.classes, axis=1) * self._calibration,
+      1.0, dtype=np.float32)
+    
+    identified = self._minmax(calibrated_scores, options.confidence_score)
+    
+    # the classes are in the order they were first identified, so for any we haven't seen yet
+    # find the first patch they were identified in (with ties in the order of the classes)
+    new = identified.any(axis=0)
+    new &= ~self._identified
+    
+    if new.any():
+      self._identified |= new
       
-      prediction_scores = class_predictions.setdefault(class_, {})
+      new = np.flatnonzero(new)
+      self._order.extend(new[identified[:, new].argmax(axis=0).argsort(kind='stable')].tolist())
+    
+    # the predictions are in order, so each second begins wherever the prediction changes
+    begins = np.flatnonzero(np.diff(predictions, prepend=predictions[0] - 1))
+    
+    # the scores that weren't identified are left out of the max
+    calibrated_scores[~identified] = -np.inf
+    
+    rows, columns = np.nonzero(np.logical_or.reduceat(identified, begins, axis=0))
+    
+    if not len(rows): return
+    
+    self._predictions.append(predictions[begins][rows])
+    self._columns.append(columns)
+    self._scores.append(np.maximum.reduceat(calibrated_scores, begins, axis=0)[rows, columns])
+  
+  def state(self):
+    return self._order, self._predictions, self._columns, self._scores
+  
+  def merge(self, states):
+    identified = self._identified
+    
+    # the last second of one segment may be the same as the first second of the next
+    # in which case we take the max score when making timestamps, same as for batches
+    for order, predictions, columns, scores in states:
+      for column in order:
+        if identified[column]: continue
+        
+        identified[column] = True
+        self._order.append(column)
       
-      prediction_scores[prediction] = max(
-        prediction_scores.get(prediction, calibrated_score), calibrated_score)
+      self._predictions.extend(predictions)
+      self._columns.extend(columns)
+      self._scores.extend(scores)
   
   def timestamps(self, shutdown):
     # create timestamps from predictions/scores
-    class_timestamps = {}
-    timespan = self.options.timespan
+    if not self._order:
+      return yamosse_result.Result()
     
-    for class_, prediction_scores in self._class_predictions.items():
-      if shutdown.is_set(): return None
-      
-      timestamp_scores = {}
-      
-      begin = 0
-      end = 0
-      
-      score_begin = 0
-      score_end = 0
-      
-      predictions = list(prediction_scores.keys())
-      predictions_len = len(predictions)
-      
-      scores = list(prediction_scores.values())
-      
-      for prediction in range(1, predictions_len + 1):
-        end = predictions[score_end] + 1
-        
-        if prediction == predictions_len or end < predictions[prediction]:
-          begin = predictions[score_begin]
-          
-          # the cast to float here is to convert a potential TensorFlow or Numpy dtype
-          # into a Python native type, because we want to pickle this result
-          # into the main process which does not have those modules loaded
-          timestamp = self._range_timestamp(begin, end, timespan)
-          timestamp_scores[timestamp] = float(max(scores[score_begin:score_end + 1]))
-          
-          score_begin = prediction
-        
-        score_end = prediction
-      
-      # class is cast to int for same reason as above (it might come from a numpy array)
-      class_timestamps[int(class_)] = timestamp_scores
+    np = self.np
+    
+    options = self.options
+    classes = options.classes
+    timespan = options.timespan
+    
+    predictions = np.concatenate(self._predictions)
+    columns = np.concatenate(self._columns)
+    scores = np.concatenate(self._scores)
+    
+    # sort by class, then prediction
+    indices = np.lexsort((predictions, columns))
     
-    return class_timestamps
+    predictions = predictions[indices]
+    columns = columns[indices]
+    scores = scores[indices]
+    
+    # the same second may be in more than one batch (or segment) so take the max of them
+    begins = np.flatnonzero((np.diff(columns, prepend=-1) != 0)
+      | (np.diff(predictions, prepend=predictions[0] - 1) != 0))
+    
+    predictions = predictions[begins]
+    columns = columns[begins]
+    scores = np.maximum.reduceat(scores, begins)
+    
+    # a range of timestamps carries on for as long as the class identified in every second
+    begins = np.flatnonzero((np.diff(columns, prepend=-1) != 0)
+      | (np.diff(predictions, prepend=predictions[0] - 1) != 1))
+    
+    ends = np.append(begins[1:], len(predictions)) - 1
+    
+    range_columns = columns[begins]
+    range_begins = predictions[begins]
+    range_ends = self._range_ends(range_begins, predictions[ends] + 1, timespan)
+    range_scores = np.maximum.reduceat(scores, begins)
+    
+    if shutdown.is_set(): return None
+    
+    # the classes are in the order they were first identified
+    ranks = np.empty(len(classes), dtype=np.intp)
+    ranks[self._order] = np.arange(len(self._order))
+    indices = ranks[range_columns].argsort(kind='stable')
+    
+    return self._result(classes[range_columns[indices]],
+      range_begins[indices], range_ends[indices], range_scores[indices])
   
   @classmethod
-  def restructure_results_for_output(cls, results, output):
-    for file_name_result in results:
-      class_timestamps = file_name_result['result']
-      
-      for class_, timestamps in class_timestamps.items():
-        if not isinstance(timestamps, dict):
-          continue
-        
-        # if Output Scores is checked, timestamps will be a dictionary
-        # for JSON that won't preserve insertion order, so we need to make it a list
-        timestamps = [{'timestamp': ts, 'score': s} for ts, s in timestamps.items()]
-        class_timestamps[class_] = timestamps
+  def restructure_result_for_output(cls, result, output):
+    output_scores = output.output_scores
+    class_timestamps = {}
     
-    return results
+    # if Output Scores is checked, each timestamp is a dictionary with its score
+    # (in a list, as JSON won't preserve the order of a dictionary)
+    # otherwise, we just have a flat list of timestamps
+    # this is needed for the JSON to be structured correct
+    # and when printing these to text, it is also the ideal format
+    # because all the timestamps can be simply joined n' printed
+    for class_, timestamp, score in result:
+      class_timestamps.setdefault(class_, []).append(
+        {'timestamp': timestamp, 'score': score} if output_scores else timestamp)
+    
+    # this sorts the classes so that the output is consistent
+    return dict(sorted(class_timestamps.items(), key=cls.key_result))
   
   @classmethod
   def print_results_to_output(cls, results, output):
@@ -272,7 +393,23 @@ class _ConfidenceScoreIdentification(_Identification):
   @classmethod
   def key_number_of_sounds(cls, item):
     file_name, result = item
-    return super().key_number_of_sounds((file_name, result.values()))
+    class_timestamps = {}
+    
+    for class_, timestamp, score in result:
+      class_timestamps.setdefault(class_, []).append(timestamp)
+    
+    return super().key_number_of_sounds((file_name, class_timestamps.values()))
+  
+  @classmethod
+  def _result_from_dict(cls, result):
+    # a dictionary of classes, each with a dictionary of timestamps and their scores
+    result_ = yamosse_result.Result()
+    
+    for class_, timestamp_scores in result.items():
+      for timestamp, score in timestamp_scores.items():
+        result_.append(class_, timestamp, score)
+    
+    return result_
   
   @staticmethod
   def _min(calibrated_score, confidence_score):
@@ -284,201 +421,328 @@ class _ConfidenceScoreIdentification(_Identification):
 
 
 class _TopRankedIdentification(_Identification):
-  __slots__ = ('_top_scores', '_calibration')
+  __slots__ = (
+    '_keys', '_columns', '_scores', '_means', '_open', '_first',
+    '_calibration', '_segment_first'
+  )
   
   def __init__(self, options, np):
     super().__init__(options, np)
     
-    self._top_scores = {}
+    # the columns (in the classes array) and scores of the top ranked classes
+    # for each timespan, or for each patch if Span All is checked
+    # with the key (the beginning) of each timespan
+    self._keys = []
+    self._columns = []
+    self._scores = []
+    
+    # the average scores of the timespans that have ended, but aren't top ranked yet
+    # (so that they can be ranked all at once)
+    self._means = []
+    
+    # the timespan that we are still getting scores for, as its key and batches of scores
+    self._open = None
+    
+    # the first timespan of a segment, which is left as its scores to be merged
+    self._first = None
+    
     self._calibration = np.take(options.calibration, options.classes)
+    self._segment_first = False
   
   def clear(self):
-    self._top_scores.clear()
+    # these are replaced (instead of cleared) because the state may still be using them
+    self._keys = []
+    self._columns = []
+    self._scores = []
+    self._means = []
+    
+    self._open = None
+    self._first = None
+    
+    self._segment_first = False
   
-  def predict(self, prediction_score=None):
-    TIMESTAMP_ALL = self.TIMESTAMP_ALL
+  def predict_batch(self, predictions, scores):
+    if not len(predictions): return
     
     np = self.np
-    
     options = self.options
-    classes = options.classes
     
-    # top should be zero (not None) by default
-    # this is what ensures the timer starts at zero
-    top = 0
-    scores = []
-    top_scores = self._top_scores
+    # we only take the scores we specifically care about (saves memory)
+    # we will be able to get them back later by indexing into the classes array
+    scores = np.minimum(scores.take(options.classes, axis=1) * self._calibration,
+      1.0, dtype=np.float32)
     
-    # get the last top scores, if any
-    # this is so we can convert them into their final dictionary form later
-    if top_scores:
-      top, scores = yamosse_utils.dict_peekitem(top_scores)
+    # in the span all case, we actually just want to list
+    # every class that is ever in the top ranked as one big summary
+    # so the top ranked of every patch are kept, to find the average score of each class later
+    # we also don't care about timestamps in this case
+    if options.timespan_span_all:
+      columns, scores = self._top_ranked(scores)
+      self._columns.append(columns)
+      self._scores.append(scores)
+      return
     
-    # score and default are both initialized to the same value
-    # later, we will be checking if default is score to determine
-    # if a new item was added to top_scores or not
-    score = None
-    default = score
+    open_ = self._open
     
-    # if we have a new prediction/score
-    # round down predictions to nearest timespan
-    # we also only take the scores we specifically care about (saves memory)
-    # we will be able to get them back later by indexing into the classes array
-    if prediction_score:
-      prediction, score = prediction_score
-      score = np.minimum(score.take(classes) * self._calibration, 1.0, dtype=np.float32)
-      
-      # in the span all case, we actually just want to list
-      # every class that is ever in the top ranked as one big summary
-      # so we don't bother with the whole numpy stacking thing
-      # we also don't care about timestamps in this case
-      # so the TIMESTAMP_ALL key is used exclusively
-      if options.timespan_span_all:
-        class_scores = top_scores.setdefault(TIMESTAMP_ALL, OrderedDict())
-        class_indices = score.argsort()[::-1][:options.top_ranked]
-        
-        # here we need to go back to storing this as a stock Python list
-        # as we need to expand it with new scores, so a numpy array wouldn't cut it
-        # (or at least, wouldn't be efficient with all the copying of arrays)
-        for class_index in class_indices:
-          scores = class_scores.setdefault(int(classes[class_index]), [])
-          scores.append(score[class_index]) # must append so it mutates
-        
-        return
+    if open_:
+      top = open_[0]
+      prediction = int(predictions[0])
       
       if top > prediction:
         raise ValueError('prediction invalid (expected %d or greater, got %d)' % (
           top, prediction))
+    
+    # round down predictions to nearest timespan
+    # when timespan is zero, prediction should always be set to its initial value
+    # this tells the location of the first sound identified, which is useful information
+    timespan = options.timespan
+    
+    if timespan:
+      keys = predictions // timespan * timespan
+    else:
+      keys = np.full(len(predictions), open_[0] if open_ else predictions[0])
+    
+    # the predictions are in order, so each timespan begins wherever the key changes
+    begins = np.flatnonzero(np.diff(keys, prepend=keys[0] - 1))
+    ends = np.append(begins[1:], len(keys))
+    
+    for begin, end in zip(begins.tolist(), ends.tolist(), strict=True):
+      self._add(int(keys[begin]), scores[begin:end])
+    
+    self._rank()
+  
+  def segment(self):
+    self._segment_first = True
+  
+  def state(self):
+    # the first and last timespans have their scores, and the rest have their top ranked
+    first = self._first
+    open_ = self._open
+    
+    if open_:
+      open_ = (open_[0], self.np.concatenate(open_[1]))
       
-      timespan = options.timespan
+      # the first timespan of the segment is still open
+      if self._segment_first:
+        first = open_
+        open_ = None
+    
+    return first, self._keys, self._columns, self._scores, open_
+  
+  def merge(self, states):
+    for first, keys, columns, scores, open_ in states:
+      # the first timespan either carries on from the last one of the segment before
+      # (so their scores are joined) or it begins a new timespan
+      if first:
+        self._add(*first)
       
-      # when timespan is zero, prediction should always be set to its initial value
-      # this tells the location of the first sound identified, which is useful information
-      if timespan:
-        prediction = prediction // timespan * timespan
-      elif top_scores:
-        prediction = top
+      if keys:
+        self._close()
+        self._rank()
+        self._keys.extend(keys)
       
-      score = [score]
-      default = top_scores.setdefault(int(prediction), score)
-    elif options.timespan_span_all:
-      # this only happens on the last call, from the timestamps method
-      # (when prediction_score is None)
-      # we use this opportunity to convert top_scores into its final form
-      # specifically, to find averages for all of the scores for each class
-      class_scores = top_scores[TIMESTAMP_ALL]
+      # for span all, the top ranked of each patch are joined in order
+      self._columns.extend(columns)
+      self._scores.extend(scores)
       
-      for class_, scores in class_scores.items():
-        class_scores[class_] = float(np.mean(scores, axis=0, dtype=np.float32))
+      if open_:
+        self._add(*open_)
+    
+    self._rank()
+  
+  @classmethod
+  def segmentable(cls, options):
+    # when timespan is zero, there is only one timestamp (the first sound identified)
+    # which every segment would need to send in full to be merged
+    return options.timespan_span_all or options.timespan > 0
+  
+  def timestamps(self, shutdown):
+    if self.options.timespan_span_all:
+      return self._timestamps_span_all(shutdown)
+    
+    self._close()
+    self._rank()
+    
+    if not self._keys:
+      return yamosse_result.Result()
+    
+    np = self.np
+    
+    options = self.options
+    classes = options.classes
+    timespan = options.timespan
+    
+    keys = np.array(self._keys)
+    columns = np.concatenate(self._columns)
+    scores = np.concatenate(self._scores)
+    
+    # check if we are still in a contiguous range of timestamps
+    # with the same top ranked classes, though not necessarily in the same order
+    # (the same as comparing the keys of two dictionaries)
+    sorted_columns = np.sort(columns, axis=1)
+    
+    begins = np.ones(len(keys), dtype=bool)
+    begins[1:] = (keys[1:] != keys[:-1] + timespan) | (
+      sorted_columns[1:] != sorted_columns[:-1]).any(axis=1)
+    
+    begins = np.flatnonzero(begins)
+    ends = np.append(begins[1:], len(keys))
+    
+    range_begins = keys[begins]
+    range_ends = self._range_ends(range_begins, keys[ends - 1] + timespan, timespan)
+    range_scores = []
+    
+    for begin, end in zip(begins.tolist(), ends.tolist(), strict=True):
+      if shutdown.is_set(): return None
       
-      # normally numpy's argsort function handles the sorting directly on the arrays
-      # but now we've averaged the scores so it's all outta whack
-      # so we gotta sort it now again
-      # just using the stock Python functions this time, because now this is a dictionary
-      top_scores[TIMESTAMP_ALL] = OrderedDict(sorted(class_scores.items(),
-        key=lambda item: item[1], reverse=True))
+      # the scores are averaged by their position in the top ranked
+      # and then go to the classes in the order of the last timestamp in the range
+      range_scores.append(np.mean(scores[begin:end], axis=0, dtype=np.float32))
+    
+    # one row for each of the top ranked classes of each range
+    top_ranked = columns.shape[1]
+    
+    return self._result(classes[columns[ends - 1]].ravel(),
+      np.repeat(range_begins, top_ranked), np.repeat(range_ends, top_ranked),
+      np.concatenate(range_scores))
+  
+  def _timestamps_span_all(self, shutdown):
+    if not self._columns:
+      return yamosse_result.Result()
+    
+    np = self.np
+    
+    columns = np.concatenate(self._columns).ravel()
+    scores = np.concatenate(self._scores).ravel()
+    
+    # the classes are in the order they were first in the top ranked
+    # which is the order that ties are left in once they're sorted by their average score
+    columns_unique, columns_first = np.unique(columns, return_index=True)
+    
+    # the scores for each class, in the order of the patches they came from
+    indices = columns.argsort(kind='stable')
+    columns_begins = np.searchsorted(columns[indices], columns_unique, side='left').tolist()
+    columns_ends = np.searchsorted(columns[indices], columns_unique, side='right').tolist()
+    
+    class_scores = {}
+    classes = self.options.classes
+    
+    for column in columns_first.argsort().tolist():
+      if shutdown.is_set(): return None
       
+      class_scores[int(classes[columns_unique[column]])] = float(np.mean(
+        scores[indices[columns_begins[column]:columns_ends[column]]], dtype=np.float32))
+    
+    class_scores = dict(sorted(class_scores.items(), key=lambda item: item[1], reverse=True))
+    timestamps = [self.TIMESTAMP_ALL] * len(class_scores)
+    
+    return yamosse_result.Result(class_scores.keys(), timestamps, timestamps,
+      class_scores.values())
+  
+  def _add(self, key, scores):
+    # add the scores for (part of) the timespan beginning at key
+    open_ = self._open
+    
+    if open_ and open_[0] == key:
+      open_[1].append(scores)
       return
     
-    # don't get top ranked classes or add to scores if scores is empty
-    if not scores: return
-    
-    # default will be equal to score if setdefault inserted a new dictionary item
-    # this indicates that scores contains a previous item
-    # that we are now ready to find the top scores in
-    # here, we use "fancy indexing" in order to get the list of top ranked classes
-    if default is score:
-      scores = np.mean(scores, axis=0, dtype=np.float32)
-      class_indices = scores.argsort()[::-1][:options.top_ranked]
-      top_scores[top] = OrderedDict(zip(classes[class_indices].tolist(),
-        scores[class_indices], strict=True))
-      
+    self._close()
+    self._open = (key, [scores])
+  
+  def _close(self):
+    # the timespan has ended, so we are ready to find its top ranked
+    open_ = self._open
+    
+    if not open_:
+      return
+    
+    self._open = None
+    
+    np = self.np
+    key, scores = open_
+    
+    # the first timestamp of a segment may carry on from the end of the segment before it
+    # so its scores are left as they are, to find the top ranked once they're merged
+    if self._segment_first:
+      self._segment_first = False
+      self._first = (key, np.concatenate(scores))
       return
     
-    # otherwise add the new score, we'll find the mean of them all later
-    # (this mutates default)
-    default += score
+    self._keys.append(key)
+    self._means.append(np.mean(np.concatenate(scores), axis=0, dtype=np.float32))
   
-  def timestamps(self, shutdown):
-    self.predict()
+  def _rank(self):
+    # find the top ranked of the timespans that have ended
+    means = self._means
+    
+    if not means:
+      return
     
-    result = {}
-    timespan = self.options.timespan
+    self._means = []
+    
+    columns, scores = self._top_ranked(self.np.stack(means))
+    self._columns.append(columns)
+    self._scores.append(scores)
+  
+  def _top_ranked(self, scores):
+    # the columns and scores of the top ranked classes in each row of scores, highest first
     np = self.np
-    top_scores = self._top_scores
     
-    class_scores_begin = {}
-    class_scores_end = {}
+    top_ranked = self.options.top_ranked
+    classes = scores.shape[1]
     
-    begin = 0
-    end = 0
+    if top_ranked >= classes:
+      columns = scores.argsort(axis=1)[:, ::-1]
+      return columns, np.take_along_axis(scores, columns, axis=1)
     
-    score_begin = 0
-    score_end = 0
+    # we only need to sort the top ranked, not every class
+    # so the row is partitioned around them first
+    # (along with the highest score that didn't make it, to check for ties)
+    top = classes - top_ranked
+    columns = np.argpartition(scores, (top - 1, top), axis=1)
     
-    predictions = list(top_scores)
-    predictions_len = len(predictions)
+    below = np.take_along_axis(scores, columns[:, top - 1:top], axis=1)
+    columns = columns[:, top:]
     
-    scores = []
+    columns = np.take_along_axis(columns,
+      np.take_along_axis(scores, columns, axis=1).argsort(axis=1)[:, ::-1], axis=1)
     
-    for prediction in range(predictions_len + 1):
-      if shutdown.is_set(): return None
-      
-      if prediction != predictions_len:
-        score_end = predictions[prediction]
-        class_scores_end = top_scores[score_end]
-      
-      # the first loop iteration is just to initialize scores
-      try:
-        if scores:
-          class_scores_begin = top_scores[score_begin]
-          score_begin += timespan
-          
-          # check if we are still in a contiguous range of timestamps
-          # this is where it's important that these were created as OrderedDict
-          # as we want to ensure not only that both timestamps have the same classes
-          # but also, that they are in the same order
-          # these should not compare equal if the keys are in a different order
-          if prediction != predictions_len and score_begin == score_end:
-            if class_scores_begin.keys() == class_scores_end.keys():
-              scores.append(np.fromiter(class_scores_end.values(), dtype=np.float32))
-              continue
-          
-          end = score_begin
-          timestamp = self._range_timestamp(begin, end, timespan)
-          
-          # it is not necessary to sort here again, as it would be impossible
-          # for the order to change as the result of averaging here, because
-          # we are only joining timestamps where the keys are in the same order
-          result[timestamp] = dict(zip(class_scores_begin.keys(),
-            np.mean(scores, axis=0, dtype=np.float32).tolist(), strict=True))
-      finally:
-        score_begin = score_end
-      
-      # this bit should only be executed if the continue above is not hit
-      # scores should start with at least one item in it
-      # to work correctly for one-shot sounds not part of a contiguous range
-      if prediction != predictions_len:
-        begin = score_end
-        scores = [np.fromiter(class_scores_end.values(), dtype=np.float32)]
+    top_scores = np.take_along_axis(scores, columns, axis=1)
     
-    return result
+    # when scores are tied, sorting only some of them may put them in a different order
+    # than sorting the entire row would have, so those rows are sorted in full
+    # this way, the results are always the same as they would be without the partition
+    ties = (top_scores[:, :-1] == top_scores[:, 1:]).any(axis=1)
+    ties |= top_scores[:, -1] == below[:, 0]
+    
+    for row in np.flatnonzero(ties).tolist():
+      columns[row] = scores[row].argsort()[::-1][:top_ranked]
+      top_scores[row] = scores[row, columns[row]]
+    
+    return columns, top_scores
   
   @classmethod
-  def restructure_results_for_output(cls, results, output):
-    output_timestamps = output.top_ranked_output_timestamps
+  def restructure_result_for_output(cls, result, output):
+    output_scores = output.output_scores
+    top_scores = {}
     
-    for file_name_result in results:
-      top_scores = file_name_result['result']
-      
-      if output_timestamps:
-        file_name_result['result'] = [{'timestamp': t, 'classes': cs
-          } for t, cs in top_scores.items()]
+    # if Output Scores is checked, the classes are a dictionary of their scores
+    # otherwise, we just have a flat list of classes
+    for class_, timestamp, score in result:
+      if output_scores:
+        top_scores.setdefault(timestamp, {})[class_] = score
       else:
-        file_name_result['result'] = [{'classes': cs
-          } for cs in top_scores.values()]
+        top_scores.setdefault(timestamp, []).append(class_)
+    
+    # this sorts the timestamps so that the output is consistent
+    # they're stored in a list for JSON, where dictionaries don't preserve their order
+    top_scores = sorted(top_scores.items(), key=cls.key_result)
+    
+    if output.top_ranked_output_timestamps:
+      return [{'timestamp': t, 'classes': cs} for t, cs in top_scores]
     
-    return results
+    return [{'classes': cs} for t, cs in top_scores]
   
   @classmethod
   def print_results_to_output(cls, results, output):
@@ -524,7 +788,20 @@ class _TopRankedIdentification(_Identification):
   @classmethod
   def key_number_of_sounds(cls, item):
     file_name, result = item
-    return super().key_number_of_sounds((file_name, (result.keys(),)))
+    
+    return super().key_number_of_sounds((file_name,
+      (dict.fromkeys(timestamp for class_, timestamp, score in result),)))
+  
+  @classmethod
+  def _result_from_dict(cls, result):
+    # a dictionary of timestamps, each with a dictionary of classes and their scores
+    result_ = yamosse_result.Result()
+    
+    for timestamp, class_scores in result.items():
+      for class_, score in class_scores.items():
+        result_.append(class_, timestamp, score)
+    
+    return result_
   
   @classmethod
   def key_result(cls, item):
@@ -0,0 +1,327 @@
+from multiprocessing.shared_memory import SharedMemory
+from queue import Empty
+from time import monotonic
+from struct import calcsize
+from traceback import format_exc
+import multiprocessing
+
+_FLOAT32 = 'f'
+
+
+class Client:
+  __slots__ = (
+    'requests', 'semaphores', 'patches', 'shared_memory', 'params', 'samples', 'max_patches',
+    'shutdown', '_slot', '_waveform', '_scores'
+  )
+  
+  INTERVAL = 0.25 # seconds
+  
+  def __init__(self, requests, semaphores, patches, shared_memory, params, samples, max_patches,
+    shutdown):
+    # this gets sent to every worker when it starts up, so it can send its waveforms to the server
+    # every worker has a slot of its own in shared memory, which only it and the server use
+    # the worker writes its waveform into its slot, then asks the server to predict it
+    # and the server writes the scores back into the same slot, after the waveform
+    self.requests = requests
+    self.semaphores = semaphores
+    self.patches = patches
+    self.shared_memory = shared_memory
+    self.params = params
+    self.samples = samples
+    self.max_patches = max_patches
+    self.shutdown = shutdown
+    
+    self._slot = None
+    self._waveform = None
+    self._scores = None
+  
+  def __call__(self, waveform):
+    # this is called in place of YAMNet, and returns the same thing it would
+    samples = len(waveform)
+    
+    if samples > self.samples:
+      raise ValueError('waveform is too long')
+    
+    slot = self._slot
+    self._waveform[:samples] = waveform
+    self.requests.put((slot, samples))
+    
+    semaphore = self.semaphores[slot]
+    
+    while not semaphore.acquire(timeout=self.INTERVAL):
+      if self.shutdown.is_set():
+        raise RuntimeError('the inference server was shut down')
+    
+    patches = self.patches[slot]
+    
+    if patches < 0:
+      raise RuntimeError('the inference server could not predict the waveform')
+    
+    # copied, because the slot is written over by the next call
+    return (self._scores[:patches].copy(),)
+  
+  def connect(self, np, slot, classes):
+    # called once by each worker, with the number of the slot it claimed
+    self._slot = slot
+    self._waveform, self._scores = _views(np, self.shared_memory, slot,
+      self.samples, self.max_patches, classes)
+
+
+class Server:
+  __slots__ = ('client', '_process', '_connection', '_shared_memory')
+  
+  STOP_TIMEOUT = 5 # seconds
+  
+  def __init__(self):
+    # one process that loads YAMNet, which the workers send their waveforms to
+    # so that YAMNet is called on batches gathered from many sound files at once
+    # instead of every worker calling it on its own, much smaller waveforms
+    # (on a CPU, one big call makes much better use of it than many small ones)
+    # the workers then only read and resample the sound files
+    self.client = None
+    
+    self._process = None
+    self._connection = None
+    self._shared_memory = None
+  
+  def start(self, target, context, slots, show=None):
+    # starts the server process, and waits until it has loaded YAMNet
+    # then sets up the shared memory for the slots, now that we know how big they must be
+    # show is called while we wait, so that the logs are shown and we can exit
+    requests = multiprocessing.Queue()
+    semaphores = [multiprocessing.Semaphore(0) for slot in range(slots)]
+    patches = multiprocessing.Array('q', slots, lock=False)
+    
+    self._connection, connection = multiprocessing.Pipe()
+    
+    try:
+      self._process = process = multiprocessing.Process(
+        target=target,
+        args=(context, requests, semaphores, patches, connection),
+        daemon=True
+      )
+      
+      process.start()
+    finally:
+      connection.close()
+    
+    connection = self._connection
+    
+    while not connection.poll(Client.INTERVAL):
+      if not process.is_alive():
+        raise RuntimeError('the inference server stopped')
+      
+      if show: show()
+    
+    params = connection.recv()
+    
+    # the server couldn't load YAMNet
+    if isinstance(params, str):
+      raise RuntimeError(params)
+    
+    options = context.options
+    samples = batch_samples(params, options.batch_seconds)
+    max_patches = patches_len(params, samples)
+    classes = len(context.model_yamnet_class_names)
+    
+    self._shared_memory = shared_memory = SharedMemory(create=True,
+      size=slots * _slot_size(samples, max_patches, classes))
+    
+    connection.send((shared_memory.name, samples, max_patches, classes))
+    
+    self.client = Client(requests, semaphores, patches, shared_memory, params,
+      samples, max_patches, context.shutdown)
+  
+  def close(self):
+    # the server stops once it gets to the end of the requests
+    # if it's taking too long, it's stopped anyway, as there's nothing left waiting on it
+    process = self._process
+    self._process = None
+    
+    try:
+      if process:
+        client = self.client
+        
+        if client:
+          requests = client.requests
+          requests.put(None)
+          requests.cancel_join_thread()
+        
+        process.join(self.STOP_TIMEOUT)
+        
+        if process.is_alive():
+          process.terminate()
+          process.join()
+    finally:
+      connection = self._connection
+      
+      if connection:
+        connection.close()
+      
+      shared_memory = self._shared_memory
+      self._shared_memory = None
+      
+      if shared_memory:
+        shared_memory.close()
+        shared_memory.unlink()
+
+
+def serve(np, yamnet, shutdown, requests, semaphores, patches, connection, params,
+  max_batch_seconds, max_wait_seconds, log=None):
+  # the server's side: gathers the requests of the workers into batches
+  # a batch is predicted once it has at least the max batch seconds
+  # or the max wait seconds have passed since its first request, whichever is first
+  # so the workers are never left waiting on a batch for long, even if it's small
+  name, slot_samples, max_patches, classes = connection.recv()
+  shared_memory = SharedMemory(name=name)
+  views = None
+  
+  try:
+    views = [_views(np, shared_memory, slot, slot_samples, max_patches, classes)
+      for slot in range(len(semaphores))]
+    
+    max_batch_samples = max(1, int(params[0] * max_batch_seconds))
+    stopping = False
+    
+    while not stopping:
+      try:
+        request = requests.get(timeout=Client.INTERVAL)
+      except Empty:
+        if shutdown.is_set(): return
+        continue
+      
+      if request is None: return
+      
+      batch = [request]
+      gathered = request[1]
+      deadline = monotonic() + max_wait_seconds
+      
+      # (once every worker is waiting on this batch, there is nothing more to wait for)
+      while gathered < max_batch_samples and len(batch) < len(semaphores):
+        timeout = deadline - monotonic()
+        
+        if timeout <= 0:
+          break
+        
+        try:
+          request = requests.get(timeout=timeout)
+        except Empty:
+          break
+        
+        if request is None:
+          stopping = True
+          break
+        
+        batch.append(request)
+        gathered += request[1]
+      
+      try:
+        batch_scores = predict(np, yamnet, params,
+          [views[slot][0][:samples] for slot, samples in batch])
+      except Exception:
+        # the workers waiting on this batch get an error, instead of waiting forever
+        if log: log(format_exc())
+        
+        for slot, samples in batch:
+          patches[slot] = -1
+      else:
+        for (slot, samples), scores in zip(batch, batch_scores):
+          views[slot][1][:len(scores)] = scores
+          patches[slot] = len(scores)
+      finally:
+        for slot, samples in batch:
+          semaphores[slot].release()
+  finally:
+    # the views must be gone before the shared memory can be closed
+    views = None
+    shared_memory.close()
+
+
+def predict(np, yamnet, params, waveforms):
+  # predicts the scores of many waveforms with one call to YAMNet
+  # they're put end to end, each of them padded with silence exactly as YAMNet would pad it
+  # and then with more silence so the next one begins on a patch hop
+  # that way, every patch of a waveform is the same as if YAMNet were called on it alone
+  # and any patches in between (that straddle two of them) are left out
+  hop = _hop_samples(params)
+  
+  parts = []
+  begins = []
+  lens = []
+  samples = 0
+  
+  for waveform in waveforms:
+    waveform_samples = len(waveform)
+    aligned_samples = _aligned_samples(params, waveform_samples)
+    
+    parts.append(waveform)
+    parts.append(np.zeros(aligned_samples - waveform_samples, dtype=np.float32))
+    
+    begins.append(samples // hop)
+    lens.append(patches_len(params, waveform_samples))
+    samples += aligned_samples
+  
+  scores = np.asarray(yamnet(np.concatenate(parts))[0], dtype=np.float32)
+  return [scores[begin:begin + len_] for begin, len_ in zip(begins, lens)]
+
+
+def batch_samples(params, batch_seconds):
+  # the longest waveform that a worker will ever give YAMNet (one batch of blocks)
+  # the worker predicts its blocks with the predict function, so each one is padded on its own
+  # this must be found the same way the worker finds it
+  sample_rate, patch_window_seconds, patch_hop_seconds = params[:3]
+  
+  overlap = int(sample_rate * patch_hop_seconds)
+  step = int(sample_rate * patch_window_seconds)
+  batch_blocks = max(1, int(batch_seconds / patch_window_seconds))
+  return _aligned_samples(params, step + overlap) * batch_blocks
+
+
+def patches_len(params, samples):
+  # the number of patches that YAMNet predicts for a waveform
+  return (_padded_samples(params, samples) - _min_samples(params)) // _hop_samples(params) + 1
+
+
+def _padded_samples(params, samples):
+  # YAMNet pads a waveform with silence to be at least one patch long
+  # and after that, to a whole number of hops
+  # (this must be found exactly the same way that YAMNet finds it)
+  min_samples = _min_samples(params)
+  hop = _hop_samples(params)
+  return min_samples + -(-max(0, samples - min_samples) // hop) * hop
+
+
+def _aligned_samples(params, samples):
+  # padded, then with enough silence after that for the next waveform to begin on a hop
+  hop = _hop_samples(params)
+  return -(-_padded_samples(params, samples) // hop) * hop
+
+
+def _min_samples(params):
+  sample_rate, patch_window_seconds, patch_hop_seconds, stft_window_seconds, stft_hop_seconds = (
+    params)
+  
+  return int((patch_window_seconds + stft_window_seconds - stft_hop_seconds) * sample_rate)
+
+
+def _hop_samples(params):
+  sample_rate, patch_window_seconds, patch_hop_seconds = params[:3]
+  return int(patch_hop_seconds * sample_rate)
+
+
+def _slot_size(samples, max_patches, classes):
+  return (samples + max_patches * classes) * calcsize(_FLOAT32)
+
+
+def _views(np, shared_memory, slot, samples, max_patches, classes):
+  # the waveform and scores of a slot in the shared memory
+  float32 = np.float32
+  buf = shared_memory.buf
+  offset = slot * _slot_size(samples, max_patches, classes)
+  
+  waveform = np.ndarray((samples,), dtype=float32, buffer=buf, offset=offset)
+  
+  scores = np.ndarray((max_patches, classes), dtype=float32, buffer=buf,
+    offset=offset + samples * calcsize(_FLOAT32))
+  
+  return waveform, scores
\ No newline at end of file
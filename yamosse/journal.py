@@ -0,0 +1,171 @@
+from time import monotonic
+from contextlib import suppress
+import pickle
+import os
+
+EXT = '.journal'
+MANIFEST_EXT = '.manifest'
+
+# the options that change the results, which must be the same to resume from a journal
+# (others, like the Sort By setting or the number of workers, only change how they are output
+# or how fast they're done)
+RESULT_OPTIONS = (
+  'version', 'weights', 'classes', 'calibration',
+  'timespan', 'timespan_span_all',
+  'background_noise_volume', 'background_noise_volume_loglinear',
+  'identification', 'confidence_score', 'confidence_score_minmax', 'top_ranked',
+  'resample_quality', 'batch_seconds'
+)
+
+
+class Journal:
+  __slots__ = ('name', 'resumed', '_options', '_file', '_flushed')
+  
+  FLUSH_INTERVAL = 1.0
+  
+  def __init__(self, name, options, resume=False):
+    # an append-only record of every file that is done, with its result or error
+    # so that a YAMScan that was cancelled or crashed can be resumed where it stopped
+    # it begins with the options that change the results
+    # and if those are any different, then it can't be resumed from, so it starts over
+    self.name = name
+    self.resumed = False
+    
+    self._options = _result_options(options)
+    self._flushed = monotonic()
+    
+    # opened without truncating it, in case we are resuming from it
+    self._file = file = open(name, 'a+b')
+    
+    try:
+      if resume:
+        file.seek(0)
+        
+        with suppress(Exception):
+          self.resumed = pickle.load(file) == self._options
+      
+      if not self.resumed:
+        file.truncate(0)
+        self._dump(self._options)
+        self.flush()
+    except:
+      file.close()
+      raise
+  
+  def __enter__(self):
+    return self
+  
+  def __exit__(self, exc, val, tb):
+    self.close()
+  
+  def replay(self):
+    # the file name, stat key, result and error of every file in the journal we are resuming from
+    # the errors are only kept as their messages
+    if not self.resumed:
+      return
+    
+    # the last record may have only been partly written, if we crashed while writing it
+    # so anything from the first record that can't be read is cut off
+    # and the records that come after this are appended in its place
+    self._file.truncate((yield from _records(self._file)))
+  
+  def record(self, file_name, stat, result, exc):
+    self._dump((file_name, stat, result, None if exc is None else str(exc)))
+    
+    # flushed every so often, so a crash only loses the last few files done
+    # without flushing after every single file
+    seconds = monotonic()
+    
+    if seconds - self._flushed >= self.FLUSH_INTERVAL:
+      self.flush()
+      self._flushed = seconds
+  
+  def flush(self):
+    # synced so the journal survives the machine losing power, not just the process dying
+    file = self._file
+    file.flush()
+    os.fsync(file.fileno())
+  
+  def close(self):
+    file = self._file
+    
+    if file.closed:
+      return
+    
+    try:
+      self.flush()
+    finally:
+      file.close()
+  
+  def remove(self):
+    # once the YAMScan is finished, there is nothing left to resume
+    self.close()
+    
+    with suppress(FileNotFoundError):
+      os.unlink(self.name)
+  
+  def keep(self, name):
+    # or it's kept as the manifest, to be replayed by the next YAMScan (see the replay function)
+    self.close()
+    os.replace(self.name, name)
+  
+  def _dump(self, obj):
+    pickle.dump(obj, self._file, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def replay(name, options):
+  # the records of a journal that was kept once its YAMScan was finished
+  # if it was for the same options, otherwise there are none
+  try:
+    file = open(name, 'rb')
+  except FileNotFoundError:
+    return
+  
+  with file:
+    try:
+      if pickle.load(file) != _result_options(options):
+        return
+    except Exception:
+      return
+    
+    yield from _records(file)
+
+
+def stat_key(file_name):
+  try:
+    stat = os.stat(file_name)
+  except OSError:
+    return None
+  
+  return stat_result_key(stat)
+
+
+def stat_result_key(stat):
+  # if any of these are different, the file has changed since its record was made
+  # (so it must be scanned again)
+  if stat is None:
+    return None
+  
+  return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+
+def _result_options(options):
+  result_options = {key: getattr(options, key) for key in RESULT_OPTIONS}
+  
+  # the results don't depend on the size of the score cache, only whether it's used
+  result_options['score_cache'] = options.score_cache_size > 0
+  return result_options
+
+
+def _records(file):
+  # every record up until the first that can't be read
+  # returns where that record begins
+  while True:
+    pos = file.tell()
+    
+    try:
+      record = pickle.load(file)
+    except Exception:
+      return pos
+    
+    yield record
\ No newline at end of file
@@ -0,0 +1,63 @@
+import sys
+import os
+
+# an input that begins with this is not a file, but a manifest: a file listing the files to scan
+# (to scan a file that really does begin with it, put ./ in front of its name)
+PREFIX = '@'
+
+# the name of the manifest that is read from standard input
+STDIN = '-'
+
+CHUNK_SIZE = 2 ** 16
+
+
+def path(input_):
+  # the path of the manifest that an input refers to, or None if it isn't one
+  if not input_.startswith(PREFIX):
+    return None
+  
+  return input_[len(PREFIX):]
+
+
+def file_names(path, hash_=None):
+  # the file names listed in a manifest, read a chunk at a time as they're needed
+  # so that a manifest of many thousands of files is never read in all at once
+  # the hash (if there is one) is updated with everything that is read
+  if path == STDIN:
+    yield from _file_names(sys.stdin.buffer, hash_)
+    return
+  
+  with open(path, 'rb') as file:
+    yield from _file_names(file, hash_)
+
+
+def _file_names(file, hash_):
+  # the file names are on lines of their own, or separated by NULs, like find -print0 writes
+  # (which is the only way to list file names that have newlines in them)
+  # if there are any NULs in the first chunk, it's assumed to be separated by them
+  separator = None
+  rest = b''
+  
+  while chunk := file.read(CHUNK_SIZE):
+    if hash_ is not None:
+      hash_.update(chunk)
+    
+    if separator is None:
+      separator = b'\0' if b'\0' in chunk else b'\n'
+    
+    # the last file name of the chunk may go on into the next one
+    *lines, rest = b''.join((rest, chunk)).split(separator)
+    yield from _decode(lines, separator)
+  
+  yield from _decode((rest,), separator)
+
+
+def _decode(lines, separator):
+  for line in lines:
+    # in case the manifest was written on Windows
+    if separator != b'\0':
+      line = line.removesuffix(b'\r')
+    
+    # blank lines are skipped
+    if line:
+      yield os.fsdecode(line)
\ No newline at end of file
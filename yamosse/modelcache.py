@@ -0,0 +1,153 @@
+from tempfile import mkdtemp
+from hashlib import blake2b
+from contextlib import suppress
+from time import time
+import shutil
+import os
+
+import yamosse.root as yamosse_root
+import yamosse.filelock as yamosse_filelock
+
+DIR = 'model_cache'
+HIDDEN = '~'
+LOCK = '.lock'
+FAILED_EXT = '.failed'
+
+# a model that couldn't be converted is tried again after this long
+# in case it was something that has since gone away, like a full disk
+FAILED_SECONDS = 7 * 24 * 60 * 60
+
+_DIGEST_SIZE = 16
+
+
+class ModelCache:
+  __slots__ = ('size', 'dir', 'key')
+  
+  def __init__(self, size=4, dir_=DIR, **settings):
+    # YAMNet, already converted to a SavedModel with only the one function that we call
+    # which is much faster for every worker to load than building it and loading its weights
+    # (or loading it from TF Hub, which has the functions we don't use too)
+    # size is the number of models that are kept, for different settings
+    # settings are anything that the model depends on
+    # such as its weights, or the version of TensorFlow that it was converted with
+    self.size = size
+    self.dir = yamosse_root.root(dir_)
+    
+    self.key = blake2b(repr(sorted(settings.items())).encode(),
+      digest_size=_DIGEST_SIZE).hexdigest()
+  
+  def load(self, tf, build):
+    # loads the model from the cache, or if it isn't there yet
+    # calls build to get the model, and converts it into the cache first
+    # only the first worker to get here converts it, the rest wait for it under the lock
+    # then they all load it at the same time
+    # if it couldn't be converted, the model is used as it is
+    # (and isn't tried again for a while, see FAILED_SECONDS)
+    # the failure is for these settings only, as it has the same key
+    dir_ = self.dir
+    os.makedirs(dir_, exist_ok=True)
+    
+    path = os.path.join(dir_, self.key)
+    failed_path = ''.join((path, FAILED_EXT))
+    
+    with yamosse_filelock.FileLock(os.path.join(dir_, LOCK)):
+      failed = _failed(failed_path)
+      
+      if not failed:
+        if os.path.isdir(path):
+          # the cache is Least Recently Used, so bump the modification time on every use
+          with suppress(OSError):
+            os.utime(path)
+        else:
+          model = build()
+          
+          try:
+            self._save(tf, model, path)
+          except Exception:
+            with suppress(OSError):
+              open(failed_path, 'wb').close()
+            
+            return model
+          finally:
+            self._evict()
+    
+    # every worker builds its own model at the same time, so not under the lock
+    if failed:
+      return build()
+    
+    return tf.saved_model.load(path)
+  
+  def _save(self, tf, model, path):
+    # the model is saved to a temporary directory first, which is only moved
+    # into place once it's complete, so a half written model is never loaded
+    temp_dir = mkdtemp(prefix=HIDDEN, dir=self.dir)
+    
+    try:
+      tf.saved_model.save(_module(tf, model), temp_dir)
+      os.rename(temp_dir, path)
+    except:
+      shutil.rmtree(temp_dir, ignore_errors=True)
+      raise
+  
+  def _evict(self):
+    # remove the least recently used models until there are only as many as the size
+    # this is only done under the lock, so any temporary directory was left by a crash
+    entries = []
+    
+    with os.scandir(self.dir) as scandir:
+      for s in scandir:
+        name = s.name
+        
+        if name == LOCK:
+          continue
+        
+        if name.startswith(HIDDEN):
+          _remove(s.path)
+          continue
+        
+        try:
+          entries.append((s.stat().st_mtime, s.path))
+        except OSError:
+          pass
+    
+    entries.sort(reverse=True)
+    
+    for mtime, path in entries[max(0, self.size):]:
+      _remove(path)
+
+
+def _failed(path):
+  # whether the model couldn't be converted, not so long ago that it should be tried again
+  try:
+    if time() - os.path.getmtime(path) < FAILED_SECONDS:
+      return True
+  except OSError:
+    return False
+  
+  _remove(path)
+  return False
+
+
+def _remove(path):
+  if os.path.isdir(path):
+    shutil.rmtree(path, ignore_errors=True)
+    return
+  
+  with suppress(OSError):
+    os.unlink(path)
+
+
+def _module(tf, model):
+  class _Module(tf.Module):
+    def __init__(self):
+      super().__init__()
+      
+      # (so its variables are saved along with the function)
+      self.model = model
+    
+    # a waveform of any length, and only the scores (the embeddings aren't used)
+    @tf.function(input_signature=[tf.TensorSpec(shape=(None,), dtype=tf.float32)])
+    def __call__(self, waveform):
+      return (self.model(waveform)[0],)
+  
+  return _Module()
\ No newline at end of file
@@ -8,7 +8,7 @@ import yamosse.identification as yamosse_identification
 
 
 class Options:
-  VERSION = 2
+  VERSION = 12
   
   _pickle_file_name = '.'.join((
     os.path.splitext(__file__)[0],
@@ -25,6 +25,7 @@ class Options:
   def __init__(
     self,
     input='', input_device='', input_recursive=False,
+    input_include='', input_exclude='', input_min_size=0, input_max_size=0,
     weights='',
     classes=None, calibration=None,
     timespan=3, timespan_span_all=False,
@@ -35,7 +36,10 @@ class Options:
     sort_by='Number of Sounds', sort_reverse=False,
     item_delimiter=', ', indent=True,
     output_options=True, output_scores=False,
-    memory_limit=256, max_workers=4, high_priority=True
+    memory_limit=256, max_workers=4, high_priority=True, batch_seconds=60,
+    resample_quality='Best', score_cache_size=1024, schedule='Longest First',
+    segment_seconds=600, deduplicate=True, worker_mode='Processes',
+    inference_batch_seconds=240, inference_wait_seconds=0.005
   ):
     if classes is None: classes = []
     if calibration is None: calibration = []
@@ -45,6 +49,10 @@ class Options:
     self.input = input
     self.input_device = input_device
     self.input_recursive = input_recursive
+    self.input_include = input_include
+    self.input_exclude = input_exclude
+    self.input_min_size = input_min_size
+    self.input_max_size = input_max_size
     
     self.weights = weights
     
@@ -75,6 +83,15 @@ class Options:
     self.memory_limit = memory_limit
     self.max_workers = max_workers
     self.high_priority = high_priority
+    self.batch_seconds = batch_seconds
+    self.resample_quality = resample_quality
+    self.score_cache_size = score_cache_size
+    self.schedule = schedule
+    self.segment_seconds = segment_seconds
+    self.deduplicate = deduplicate
+    self.worker_mode = worker_mode
+    self.inference_batch_seconds = inference_batch_seconds
+    self.inference_wait_seconds = inference_wait_seconds
   
   def print(self, end='\n', file=None):
     #def joined(value):
@@ -95,6 +112,18 @@ class Options:
     option('Input', yamosse_utils.ascii_backslashreplace(self.input))
     option('Input Device', yamosse_utils.ascii_backslashreplace(self.input_device))
     option('Input Recursive', repr(self.input_recursive))
+    option('Input Include', yamosse_utils.ascii_backslashreplace(self.input_include))
+    option('Input Exclude', yamosse_utils.ascii_backslashreplace(self.input_exclude))
+    option('Input Min Size', str(self.input_min_size), end=' bytes\n')
+    option('Input Max Size', str(self.input_max_size), end=' bytes\n')
+    
+    # a YAMScan with any manifests in its input has the hash of them
+    # (on its own copy of the options, which is never saved)
+    input_manifest_hash = vars(self).get('input_manifest_hash')
+    
+    if input_manifest_hash:
+      option('Input Manifest Hash', input_manifest_hash)
+    
     option('Weights', yamosse_utils.ascii_backslashreplace(self.weights))
     option('Classes', repr(self.classes))
     option('Calibration', repr(self.calibration))
@@ -116,6 +145,15 @@ class Options:
     option('Memory Limit', str(self.memory_limit), end=' MB\n')
     option('Max Workers', repr(self.max_workers))
     option('High Priority', repr(self.high_priority))
+    option('Batch Seconds', str(self.batch_seconds), end=' seconds\n')
+    option('Resample Quality', repr(self.resample_quality))
+    option('Score Cache Size', str(self.score_cache_size), end=' MB\n')
+    option('Schedule', repr(self.schedule))
+    option('Segment Seconds', str(self.segment_seconds), end=' seconds\n')
+    option('Deduplicate', repr(self.deduplicate))
+    option('Worker Mode', repr(self.worker_mode))
+    option('Inference Batch Seconds', str(self.inference_batch_seconds), end=' seconds\n')
+    option('Inference Wait Seconds', str(self.inference_wait_seconds), end=' seconds\n')
     
     print('', end=end, file=file)
   
@@ -6,6 +6,7 @@ import json
 
 import yamosse.utils as yamosse_utils
 import yamosse.once as yamosse_once
+import yamosse.externalsort as yamosse_externalsort
 
 LINES = ('\r', '\n')
 
@@ -15,9 +16,14 @@ DEFAULT_ITEM_DELIMITER = ' '
 DEFAULT_INDENT = '\t'
 
 _ext_json = '.'.join(('', json.__name__)).casefold()
+_ext_jsonl = ''.join((_ext_json, 'l'))
 
 
 class _Output(ABC):
+  # an output that streams writes the result of each file as soon as it is done
+  # (with the result method) instead of keeping them all to write at the end
+  stream = False
+  
   def __init__(self, file_name, exit_, model_yamnet_class_names, identification,
     subsystem=None, encoding='utf8'):
     if subsystem:
@@ -68,11 +74,7 @@ class _Output(ABC):
   
   @abstractmethod
   def options(self, options):
-    self.sort_by = ({
-      NUMBER_OF_SOUNDS: self.identification.key_number_of_sounds,
-      FILE_NAME: self.identification.key_file_name
-    })[options.sort_by]
-    
+    self.sort_by = sort_key(self.identification, options.sort_by)
     self.sort_reverse = options.sort_reverse
     
     # this will take any escape characters like \n or \t and make them real characters
@@ -91,31 +93,21 @@ class _Output(ABC):
     # this function makes any changes that are to be applied universally
     # regardless of the identification setting (Confidence Scores or Top Ranked)
     # first, we perform the "Sort By" setting (by Number of Sounds, or File Name)
-    items = yamosse_utils.dict_sorted(
-      results, key=self.sort_by, reverse=self.sort_reverse).items()
-    
-    results = []
-    output_scores = self.output_scores
-    
-    for file_name, result in items:
-      # if not outputting scores, take them out
-      # we take the dictionary (whose values are the scores) and
-      # turn its keys into a flat list
-      # this is needed for the JSON to be structured correct
-      # and when printing these to text, it is also the ideal format
-      # because all the timestamps can be simply joined n' printed
-      if not output_scores:
-        result = {key: list(value) for key, value in result.items()}
-      
-      # this sorts the next column - sorting by class/timestamp
-      # so that the output is consistent
-      results.append({
-        'file_name': file_name,
-        'result': yamosse_utils.dict_sorted(result,
-          key=self.identification.key_result)
-      })
+    # results that were sorted as they were done (in runs spilled to disk) are in order already
+    # so they are only read back and restructured one at a time, as they are written
+    # that way, the results for every file don't need to be in memory at once
+    if isinstance(results, yamosse_externalsort.ExternalSort):
+      return (self._file_name_result(*item) for item in results)
     
-    return self.identification.restructure_results_for_output(results, self)
+    identification = self.identification
+    
+    items = sorted(((file_name, identification.result(result)
+      ) for file_name, result in results.items()), key=self.sort_by, reverse=self.sort_reverse)
+    
+    return [self._file_name_result(*item) for item in items]
+  
+  def result(self, file_name, result):
+    raise NotImplementedError
   
   @abstractmethod
   def errors(self, errors):
@@ -134,6 +126,17 @@ class _Output(ABC):
     file.truncate(0)
     self._file_truncated = True
     return file
+  
+  def _file_name_result(self, file_name, result):
+    # each result is put into the structure it is output in
+    # straight from the result, so we don't make more copies of the results than we need
+    identification = self.identification
+    
+    return {
+      'file_name': file_name,
+      'result': identification.restructure_result_for_output(
+        identification.result(result), self)
+    }
 
 
 class _TextOutput(_Output):
@@ -214,11 +217,9 @@ class _JSONOutput(_Output):
     if file.closed:
       return
     
-    indent = self.indent
-    
     # dump anything that is non-empty
-    json.dump({key: value for key, value in self._d.items() if value},
-      file, indent=indent or None)
+    self._dump({key: value for key, value in self._d.items() if value},
+      file, indent=self.indent or None)
     
     super().close()
   
@@ -230,10 +231,116 @@ class _JSONOutput(_Output):
     return self._d.setdefault('options', options) is options
   
   def results(self, results):
-    return self._d.setdefault('results', super().results(results))
+    # results that were sorted as they were done are only read back once they're dumped
+    return self._d.setdefault('results', super().results(results) if results else [])
   
   def errors(self, errors):
     return self._d.setdefault('errors', super().errors(errors))
+  
+  @staticmethod
+  def _dump(d, file, indent=None):
+    # this writes exactly the same JSON as json.dump would, but a piece at a time
+    # the results may not be a list, but read back one at a time as they are written
+    # so they're dumped one by one, instead of all at once
+    if not d:
+      json.dump(d, file, indent=indent)
+      return
+    
+    item_separator = ', '
+    newline = ''
+    
+    if indent is not None:
+      item_separator = ','
+      newline = '\n'
+    else:
+      indent = ''
+    
+    def dump(obj, level):
+      # JSON strings can't contain a raw newline
+      # so every newline is between values, where the indentation goes
+      file.write(json.dumps(obj, indent=indent or None).replace(
+        '\n', ''.join(('\n', indent * level))))
+    
+    file.write('{')
+    
+    for key_index, (key, value) in enumerate(d.items()):
+      if key_index:
+        file.write(item_separator)
+      
+      file.write(''.join((newline, indent, json.dumps(key), ': ')))
+      
+      if isinstance(value, dict):
+        dump(value, 1)
+        continue
+      
+      file.write('[')
+      
+      for value_index, item in enumerate(value):
+        if value_index:
+          file.write(item_separator)
+        
+        file.write(''.join((newline, indent * 2)))
+        dump(item, 2)
+      
+      file.write(''.join((newline, indent, ']')))
+    
+    file.write(''.join((newline, '}')))
+
+
+class _JSONLinesOutput(_Output):
+  stream = True
+  
+  def __init__(self, *args, **kwargs):
+    # every record is a JSON document on a line of its own
+    # the options come first, then each result (in the order they were done)
+    # and then the errors at the end
+    # so the results don't need to be held on to, and are kept even if the YAMScan fails
+    self._once = yamosse_once.Once()
+    
+    super().__init__(*args, **kwargs)
+  
+  def options(self, options):
+    if not self._once.add('options'):
+      return False
+    
+    if not super().options(options):
+      return False
+    
+    self._record({'options': vars(options)})
+    return True
+  
+  def result(self, file_name, result):
+    self._record(self._file_name_result(file_name, result))
+  
+  def results(self, results):
+    # any results we are given all at once (rather than as they are done) are still sorted
+    results = super().results(results)
+    
+    for file_name_result in results:
+      self._record(file_name_result)
+    
+    return results
+  
+  def errors(self, errors):
+    if not self._once.add('errors'):
+      return None
+    
+    errors = super().errors(errors)
+    
+    for file_name, ex in errors.items():
+      self._record({'file_name': file_name, 'error': str(ex)})
+    
+    return errors
+  
+  def _record(self, record):
+    file = self.file
+    
+    json.dump(record, file)
+    file.write('\n')
+    
+    # flushed after every record, so the file is kept up to date as the YAMScan goes along
+    # (there's one record per sound file, so this isn't often enough to slow it down)
+    file.flush()
 
 
 def print_section(name, file=None):
@@ -247,10 +354,21 @@ def print_file(name, file=None):
   print(yamosse_utils.ascii_backslashreplace(quote(name)), file=file)
 
 
+def sort_key(identification, sort_by):
+  # the key function for the "Sort By" setting
+  return ({
+    NUMBER_OF_SOUNDS: identification.key_number_of_sounds,
+    FILE_NAME: identification.key_file_name
+  })[sort_by]
+
+
 def output(file_name, *args, **kwargs):
-  ext = splitext(file_name)[1]
+  ext = splitext(file_name)[1].casefold()
   
-  if ext.casefold() == _ext_json:
+  if ext == _ext_json:
     return _JSONOutput(file_name, *args, **kwargs)
   
+  if ext == _ext_jsonl:
+    return _JSONLinesOutput(file_name, *args, **kwargs)
+  
   return _TextOutput(file_name, *args, **kwargs)
\ No newline at end of file
@@ -1,4 +1,7 @@
 from enum import Enum
+from multiprocessing.shared_memory import SharedMemory
+from struct import calcsize
+from time import monotonic
 
 try:
   import PyTaskbar
@@ -35,16 +38,31 @@ class Mode(Enum):
 
 
 class Progress:
-  __slots__ = ('_step', '_steps', '_sender', '_current_step')
+  __slots__ = (
+    '_shared_memory', '_slots', '_slot', '_steps', '_begin_step',
+    '_current_step', '_progress', '_sampled'
+  )
   
   MAXIMUM = 100
+  INTERVAL = 0.25 # seconds
   
-  def __init__(self, step, steps, sender):
-    self._step = step
+  _FORMAT = 'q'
+  
+  def __init__(self, steps, slots):
+    # every worker has a counter of its own in shared memory, which only it ever writes to
+    # so the workers never wait on a lock (or on each other) to step the progress
+    # instead the main process adds up all of the counters, at a fixed rate
+    slots = max(1, slots)
+    
+    self._shared_memory = SharedMemory(create=True, size=slots * calcsize(self._FORMAT))
+    self._slots = slots
+    self._slot = 0
     self._steps = self.MAXIMUM * steps
-    self._sender = sender
+    self._begin_step = 0
     
     self._current_step = 0
+    self._progress = 0
+    self._sampled = 0.0
   
   def __enter__(self):
     self._current_step = 0
@@ -53,40 +71,71 @@ class Progress:
   def __exit__(self, exc, val, tb):
     self.step()
   
-  def step(self, current_step=1.0):
-    MAXIMUM = self.MAXIMUM
+  def close(self):
+    # only the main process should call this, once the workers are done with it
+    shared_memory = self._shared_memory
+    shared_memory.close()
+    shared_memory.unlink()
+  
+  def reset(self, steps):
+    # the same counters are used again for the next YAMScan, by the same workers
+    # they're never cleared, because only the workers write to them
+    # instead the next YAMScan begins from whatever they add up to now
+    with self._shared_memory.buf.cast(self._FORMAT) as counters:
+      self._begin_step = sum(counters[:self._slots])
     
-    current_step = int(MAXIMUM * current_step) - self._current_step
+    self._steps = self.MAXIMUM * steps
+    self._progress = 0
+    self._sampled = 0.0
+  
+  def worker(self, number):
+    # called once by each worker to claim its counter
+    self._slot = number % self._slots
+  
+  def step(self, current_step=1.0):
+    current_step = int(self.MAXIMUM * current_step) - self._current_step
     
     if current_step <= 0:
       return
     
-    previous_step = 0
     self._current_step += current_step
-    next_step = 0
     
-    step = self._step
+    with self._shared_memory.buf.cast(self._FORMAT) as counters:
+      counters[self._slot] += current_step
+  
+  def sample(self, force=False):
+    # returns the values to show, or None if there is nothing new to show yet
+    sampled = monotonic()
+    
+    if not force and sampled - self._sampled < self.INTERVAL:
+      return None
+    
+    self._sampled = sampled
+    
+    steps = self._steps
+    
+    if not steps:
+      return None
     
-    with step.get_lock():
-      previous_step = step.value
-      step.value += current_step
-      next_step = step.value
+    with self._shared_memory.buf.cast(self._FORMAT) as counters:
+      step = sum(counters[:self._slots]) - self._begin_step
     
-    steps = MAXIMUM / self._steps
+    previous_progress = self._progress
+    next_progress = min(int(step * self.MAXIMUM / steps), self.MAXIMUM)
     
-    previous_progress = int(previous_step * steps) + 1
-    next_progress = int(next_step * steps) + 1
+    if next_progress <= previous_progress:
+      return None
     
-    sender = self._sender
+    self._progress = next_progress
     
-    for current_progress in range(previous_progress, next_progress):
-      sender.send({
-        'progressbar': {
-          'set': {'args': (current_progress,)}
-        },
-        
-        'log': '%d%% complete' % current_progress
-      })
+    return {
+      'progressbar': {
+        'set': {'args': (next_progress,)}
+      },
+      
+      'log': '\n'.join('%d%% complete' % current_progress
+        for current_progress in range(previous_progress + 1, next_progress + 1))
+    }
 
 
 def hwnd(window):
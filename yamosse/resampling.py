@@ -0,0 +1,196 @@
+from math import gcd
+
+QUALITY_BEST = 'Best'
+QUALITY_FAST = 'Fast'
+
+
+class Resampler:
+  __slots__ = (
+    'np', '_resampy', '_filter', '_convert',
+    '_sr_orig', '_sr_new', '_up', '_down',
+    '_taps', '_half', '_context',
+    '_waveform', '_frames', '_resampled_frames'
+  )
+  
+  # for each quality: the resampy filter, then the number of zero crossings,
+  # Kaiser window beta and rolloff of the filter we use for integer ratios
+  # the integer ratio filter is much shorter than resampy's, and therefore much faster
+  # but it is still well below the noise floor of int16 sound
+  FILTERS = {
+    QUALITY_BEST: ('kaiser_best', 32, 14.0, 0.9173),
+    QUALITY_FAST: ('kaiser_fast', 8, 5.0, 0.8682)
+  }
+  
+  def __init__(self, np, sr_orig, sr_new, quality=QUALITY_BEST, resampy=None):
+    # this class converts a stream of mono samples from one sample rate to another
+    # without edge effects between chunks
+    # that means the samples at the end of each chunk we are given are held on to
+    # until we know what comes after them
+    # for a whole number ratio, the stream is resampled exactly as if it were all
+    # resampled in one go, no matter how it's chunked
+    # any other ratio is resampled by resampy, a chunk at a time, so the result
+    # can differ from resampling it all in one go by a rounding error
+    # (about 1e-8, far below the noise floor of int16 sound)
+    try:
+      filter_, zeros, beta, rolloff = self.FILTERS[quality]
+    except KeyError:
+      raise ValueError('quality must be %r or %r' % (QUALITY_BEST, QUALITY_FAST)) from None
+    
+    if sr_orig <= 0 or sr_new <= 0:
+      raise ValueError('sample rates must be greater than zero')
+    
+    self.np = np
+    self._resampy = resampy
+    self._filter = filter_
+    
+    self._sr_orig = sr_orig
+    self._sr_new = sr_new
+    
+    # the smallest number of input samples that is a whole number of output samples
+    # everything we resample is a multiple of this, so each chunk lines up with the last
+    sr_gcd = gcd(sr_orig, sr_new)
+    self._up = up = sr_new // sr_gcd
+    self._down = down = sr_orig // sr_gcd
+    
+    self._taps = None
+    self._half = 0
+    
+    context = 0
+    
+    if up == down:
+      self._convert = self._convert_same
+    elif up == 1:
+      # integer ratio, such as 32 kHz or 48 kHz to 16 kHz
+      # this is a low pass filter, after which we keep every nth sample
+      # so we only calculate the samples that we keep
+      self._convert = self._convert_decimate
+      self._half = context = int(zeros * down / rolloff) + 1
+      
+      taps = np.arange(-context, context + 1, dtype=np.float64)
+      taps = np.sinc(taps * (rolloff / down)) * np.kaiser(taps.size, beta)
+      taps /= taps.sum()
+      
+      # lay the filter out in one column per phase
+      # padded with zeros to a whole number of rows
+      rows = -(-taps.size // down)
+      
+      self._taps = np.concatenate((taps, np.zeros(rows * down - taps.size))).astype(
+        np.float32).reshape(rows, down)
+    else:
+      # any other ratio, such as 44.1 kHz to 16 kHz
+      if not resampy:
+        raise ValueError('resampy is required for a non-integer ratio')
+      
+      self._convert = self._convert_resampy
+      
+      # the number of input samples on either side that resampy's filter can reach
+      interp_win, precision, _ = resampy.filters.get_filter(filter_)
+      context = int((interp_win.size - 1) / precision / min(1.0, up / down)) + 2
+    
+    # round the context up to a whole number of chunks
+    self._context = context = -(-context // down) * down
+    
+    # the beginning of the stream is preceded by silence
+    self._waveform = np.zeros(context, dtype=np.float32)
+    self._frames = 0
+    self._resampled_frames = 0
+  
+  @property
+  def context(self):
+    # the number of samples on either side of a sample that it depends on
+    return self._context
+  
+  def preroll(self, waveform):
+    # for a stream that begins partway through a sound, instead of at its beginning
+    # this gives it the samples that come before it (instead of silence)
+    # so that it is resampled the same as if the entire sound were resampled
+    # (exactly the same for a whole number ratio, see above)
+    # it must be called before anything else is resampled
+    context = self._context
+    
+    if not context:
+      return
+    
+    waveform = waveform[max(0, len(waveform) - context):]
+    self._waveform[context - len(waveform):] = waveform
+  
+  def __call__(self, waveform):
+    self._frames += len(waveform)
+    self._waveform = waveform = self.np.concatenate((self._waveform, waveform))
+    
+    # keep enough samples at the end to use as context for the next chunk
+    return self._resample(len(waveform) - self._context * 2)
+  
+  def flush(self):
+    np = self.np
+    
+    # the end of the stream is followed by silence
+    context = self._context
+    waveform = self._waveform
+    
+    down = self._down
+    
+    frames = len(waveform) - context
+    rounded_frames = -(-frames // down) * down
+    
+    self._waveform = np.concatenate((waveform,
+      np.zeros(rounded_frames + context - frames, dtype=np.float32)))
+    
+    waveform = self._resample(rounded_frames)
+    
+    # give the same number of samples that resampling the entire stream at once would
+    # (any past that are just the silence we padded the stream with)
+    resampled_frames = self._frames * self._up // down
+    waveform = waveform[:len(waveform) - (self._resampled_frames - resampled_frames)]
+    self._resampled_frames = resampled_frames
+    return waveform
+  
+  def _resample(self, frames):
+    down = self._down
+    frames = frames // down * down
+    
+    if frames <= 0:
+      return self.np.empty(0, dtype=self.np.float32)
+    
+    waveform = self._waveform
+    
+    resampled = self._convert(waveform[:frames + self._context * 2], frames)
+    self._resampled_frames += len(resampled)
+    
+    # hang on to the samples we need as context for the next chunk
+    self._waveform = waveform[frames:]
+    return resampled
+  
+  def _convert_same(self, waveform, frames):
+    return waveform[:frames]
+  
+  def _convert_decimate(self, waveform, frames):
+    np = self.np
+    
+    taps = self._taps
+    rows, down = taps.shape
+    
+    # each output sample is the dot product of the filter with the input samples around it
+    # if we lay out the input in rows as long as the ratio, then each phase of the filter
+    # only ever sees one column, so it's just one correlation per phase
+    resampled_frames = frames // down
+    
+    waveform = waveform[self._context - self._half:]
+    waveform = waveform[:(resampled_frames + rows - 1) * down].reshape(-1, down)
+    
+    resampled = np.correlate(waveform[:, 0], taps[:, 0], mode='valid')
+    
+    for phase in range(1, down):
+      resampled += np.correlate(waveform[:, phase], taps[:, phase], mode='valid')
+    
+    return resampled
+  
+  def _convert_resampy(self, waveform, frames):
+    up = self._up
+    down = self._down
+    
+    resampled = self._resampy.resample(waveform, self._sr_orig, self._sr_new,
+      filter=self._filter)
+    
+    begin = self._context * up // down
+    return resampled[begin:begin + frames * up // down]
\ No newline at end of file
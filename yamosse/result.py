@@ -0,0 +1,60 @@
+from array import array
+
+
+class Result:
+  __slots__ = ('classes', 'begins', 'ends', 'scores')
+  
+  # the type of each column, which are the same size as the numpy types the workers have
+  # (intc, int64 and float32) so they can be given the bytes of the arrays as they are
+  TYPECODES = ('i', 'q', 'q', 'f')
+  
+  def __init__(self, classes=b'', begins=b'', ends=b'', scores=b''):
+    # the result for one sound file, as columns with one row per timestamp of each class
+    # this is much smaller than the dictionaries it would otherwise take
+    # which matters when we are holding the results for many sound files at once
+    # each column may be the bytes of the column, or an iterable of its values
+    # for a timestamp that isn't a timespan, the end is the same as the beginning
+    self.classes, self.begins, self.ends, self.scores = (
+      array(typecode, column) for typecode, column in zip(
+        self.TYPECODES, (classes, begins, ends, scores), strict=True))
+    
+    if not len(self.classes) == len(self.begins) == len(self.ends) == len(self.scores):
+      raise ValueError('columns must be the same length')
+  
+  def __reduce__(self):
+    # pickled as the raw bytes of each column, for sending from the workers
+    return type(self), tuple(column.tobytes() for column in self._columns())
+  
+  def __len__(self):
+    return len(self.classes)
+  
+  def __iter__(self):
+    # the class, timestamp and score of each row, in order
+    timestamp = self.timestamp
+    
+    for class_, begin, end, score in zip(*self._columns(), strict=True):
+      yield class_, timestamp(begin, end), score
+  
+  def __eq__(self, other):
+    if not isinstance(other, Result):
+      return NotImplemented
+    
+    return self._columns() == other._columns()
+  
+  def append(self, class_, timestamp, score):
+    try:
+      begin, end = timestamp
+    except TypeError:
+      begin = end = timestamp
+    
+    self.classes.append(class_)
+    self.begins.append(begin)
+    self.ends.append(end)
+    self.scores.append(score)
+  
+  @staticmethod
+  def timestamp(begin, end):
+    return begin if begin == end else (begin, end)
+  
+  def _columns(self):
+    return self.classes, self.begins, self.ends, self.scores
\ No newline at end of file
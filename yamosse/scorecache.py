@@ -0,0 +1,196 @@
+from tempfile import NamedTemporaryFile
+from hashlib import blake2b
+from time import time
+import os
+
+import yamosse.root as yamosse_root
+
+DIR = 'score_cache'
+HIDDEN = '~'
+
+_MAGIC = b'YAMSCORE'
+_VERSION = 3
+_HEADER_SIZE = 16
+
+# a temporary file older than this was left behind by a crash, not a worker still writing it
+_STALE_SECONDS = 24 * 60 * 60
+
+_DIGEST_SIZE = 16
+_READ_SIZE = 2 ** 20
+
+
+class ScoreCache:
+  __slots__ = ('size', 'dir', '_settings')
+  
+  def __init__(self, size, dir_=DIR, **settings):
+    # size is in megabytes, and a size of zero means the cache is disabled
+    # settings are anything (other than the sound file itself) that the scores depend on
+    # such as which model we are using, or the background noise volume
+    # they are only needed by the workers, to find the key for a sound file
+    self.size = size
+    self.dir = yamosse_root.root(dir_)
+    
+    self._settings = repr(sorted(settings.items())).encode()
+  
+  def __bool__(self):
+    return self.size > 0
+  
+  def key(self, file_name):
+    # the key is a hash of the contents of the sound file (not its name)
+    # so renamed or copied sound files still use the cache
+    # and a sound file that was changed doesn't use stale scores
+    digest = blake2b(self._settings, digest_size=_DIGEST_SIZE)
+    
+    with open(file_name, 'rb') as f:
+      while data := f.read(_READ_SIZE):
+        digest.update(data)
+    
+    return digest.hexdigest()
+  
+  def get(self, np, key, classes):
+    # returns the predictions and scores, or None if the key is not in the cache
+    # the scores are memory mapped, so they are only read in as they're used
+    path = self._path(key)
+    dtype = _dtype(np, classes)
+    
+    try:
+      with open(path, 'rb') as f:
+        if f.read(_HEADER_SIZE) != _header(np, classes):
+          return None
+        
+        # a sound file that was entirely background noise has no scores
+        # and an empty file can't be memory mapped, so there's nothing more to read
+        empty = not f.read(1)
+      
+      records = np.empty(0, dtype=dtype) if empty else np.memmap(path,
+        dtype=dtype, mode='r', offset=_HEADER_SIZE)
+    except (OSError, ValueError):
+      return None
+    
+    # the cache is Least Recently Used, so bump the modification time on every use
+    try:
+      os.utime(path)
+    except OSError:
+      pass
+    
+    return records['prediction'], records['scores']
+  
+  def writer(self, np, key, classes):
+    return _ScoreCacheWriter(np, self._path(key), classes)
+  
+  def evict(self):
+    # remove the least recently used entries until the cache fits within its size
+    # (or everything, if the cache is disabled)
+    # temporary files are left alone, as other workers may still be writing them
+    # unless they're so old that they must have been left behind by a crash
+    entries = []
+    stale = time() - _STALE_SECONDS
+    
+    try:
+      with os.scandir(self.dir) as scandir:
+        for s in scandir:
+          if not s.is_dir(): continue
+          
+          with os.scandir(s.path) as entry_scandir:
+            for e in entry_scandir:
+              stat = e.stat()
+              
+              if e.name.startswith(HIDDEN) and stat.st_mtime >= stale:
+                continue
+              
+              entries.append((stat.st_mtime, stat.st_size, e.path))
+    except FileNotFoundError:
+      return
+    
+    entries.sort(reverse=True)
+    
+    size = max(0, self.size) * 1024 * 1024
+    
+    for mtime, entry_size, path in entries:
+      size -= entry_size
+      
+      if size >= 0: continue
+      
+      try:
+        os.unlink(path)
+      except OSError:
+        pass
+  
+  def _path(self, key):
+    # the entries are spread out across subdirectories by the first two characters
+    # so that no single directory ends up with too many files in it
+    return os.path.join(self.dir, key[:2], key)
+
+
+class _ScoreCacheWriter:
+  __slots__ = ('np', 'save', '_path', '_dtype', '_file')
+  
+  def __init__(self, np, path, classes):
+    self.np = np
+    self.save = False
+    
+    self._path = path
+    self._dtype = _dtype(np, classes)
+    
+    # the scores are written to a temporary file first, which is only moved
+    # into place once every score for the sound file has been written
+    # so other workers never see a half written entry
+    head, tail = os.path.split(path)
+    os.makedirs(head, exist_ok=True)
+    
+    self._file = NamedTemporaryFile(mode='wb', delete=False,
+      prefix=HIDDEN, suffix=tail, dir=head)
+    
+    self._file.write(_header(np, classes))
+  
+  def __enter__(self):
+    return self
+  
+  def __exit__(self, exc, val, tb):
+    self.close()
+  
+  def close(self):
+    file = self._file
+    
+    if file.closed:
+      return
+    
+    file.close()
+    
+    try:
+      if self.save:
+        os.replace(file.name, self._path)
+        return
+    except OSError:
+      pass
+    
+    # (it may have already been evicted, if it was left so long that it looked stale)
+    try:
+      os.unlink(file.name)
+    except OSError:
+      pass
+  
+  def write(self, predictions, scores):
+    # scores are stored as float32, exactly as YAMNet gave them
+    # so the results are exactly the same, whether or not they came from the cache
+    records = self.np.empty(len(predictions), dtype=self._dtype)
+    records['prediction'] = predictions
+    records['scores'] = scores
+    records.tofile(self._file)
+
+
+def _dtype(np, classes):
+  return np.dtype([
+    ('prediction', '<i4'),
+    ('scores', '<f4', (classes,))
+  ])
+
+
+def _header(np, classes):
+  header = b''.join((
+    _MAGIC,
+    np.array((_VERSION, classes), dtype='<u4').tobytes()
+  ))
+  
+  assert len(header) == _HEADER_SIZE, 'header must be %d bytes' % _HEADER_SIZE
+  return header
\ No newline at end of file
@@ -1,3 +1,6 @@
+from itertools import islice
+
+
 def try_int(value, *args, **kwargs):
   try:
     return int(value, *args, **kwargs)
@@ -54,5 +57,8 @@ def dict_enumerate(d, *args, **kwargs):
   return dict(enumerate(d, *args, **kwargs))
 
 
-def batched(seq, size):
-  return (seq[pos:pos+size] for pos in range(0, len(seq), size))
\ No newline at end of file
+def batched(iterable, size):
+  # like itertools.batched (only in Python 3.12 and up) but gives lists
+  # this works for generators too, so only one batch of them needs to be in memory
+  iterator = iter(iterable)
+  return iter(lambda: list(islice(iterator, size)), [])
\ No newline at end of file
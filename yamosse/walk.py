@@ -0,0 +1,143 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from collections import namedtuple
+from fnmatch import fnmatch
+from functools import cache
+import os
+
+import soundfile as sf
+
+# the extensions of sound files that aren't the same as the name of their format
+# (the names of the formats are already extensions, like WAV or FLAC)
+EXTENSION_ALIASES = {
+  'AIFF': ('aif', 'aifc'),
+  'MAT4': ('mat',),
+  'MAT5': ('mat',),
+  'NIST': ('sph',),
+  'OGG': ('oga', 'ogx', 'opus'),
+  'SVX': ('8svx', 'iff'),
+  'WAV': ('wave',)
+}
+
+# only the parts of a stat that we use, so that there's less to hold on to for every file
+# these have the same names as they do in os.stat_result, so either can be used
+Stat = namedtuple('Stat', ('st_size', 'st_mtime_ns', 'st_ino', 'st_dev'))
+
+
+class _Filter:
+  __slots__ = ('include', 'exclude', 'min_size', 'max_size')
+  
+  def __init__(self, include=None, exclude=None, min_size=0, max_size=0):
+    self.include = include
+    self.exclude = exclude or ()
+    self.min_size = min_size
+    self.max_size = max_size
+  
+  def excluded(self, name):
+    return any(fnmatch(name, pattern) for pattern in self.exclude)
+  
+  def included(self, name):
+    include = self.include
+    
+    # with nothing to include, any file that is a sound file (going by its extension) is
+    if not include:
+      return os.path.splitext(name)[1][1:].casefold() in extensions()
+    
+    return any(fnmatch(name, pattern) for pattern in include)
+  
+  def sized(self, size):
+    if size < self.min_size:
+      return False
+    
+    max_size = self.max_size
+    return not max_size or size <= max_size
+
+
+def walk(path, recursive=True, include=None, exclude=None, min_size=0, max_size=0,
+  max_workers=None):
+  # gives the path and stat of every file in a directory (and its subdirectories if recursive)
+  # that isn't excluded, is included, and is within the size limits
+  # the patterns match the names of the files, and the exclude patterns also
+  # match the names of directories, which aren't walked at all
+  # each directory is scanned on a thread of its own, as soon as it is found
+  # because on a network drive, most of the time is spent waiting on the listings
+  # the stats come straight from the listings, so they never need to be done again
+  # (on Windows, they're free. Elsewhere, they're only done for the files we keep)
+  # though on Windows, the inode and device of those stats are always zero
+  filter_ = _Filter(include=include, exclude=exclude, min_size=min_size, max_size=max_size)
+  
+  with ThreadPoolExecutor(max_workers=max_workers) as thread_pool_executor:
+    pending = {thread_pool_executor.submit(_scan, path, recursive, filter_)}
+    
+    while pending:
+      done, pending = wait(pending, return_when=FIRST_COMPLETED)
+      
+      for future in done:
+        files, dir_paths = future.result()
+        
+        for dir_path in dir_paths:
+          pending.add(thread_pool_executor.submit(_scan, dir_path, recursive, filter_))
+        
+        yield from files
+
+
+def stat(path):
+  # for the files that we are given directly, rather than walking to them
+  try:
+    return _stat(os.stat(path))
+  except OSError:
+    return None
+
+
+@cache
+def extensions():
+  available_extensions = set()
+  
+  for format_ in sf.available_formats():
+    available_extensions.add(format_.casefold())
+    available_extensions.update(EXTENSION_ALIASES.get(format_, ()))
+  
+  return frozenset(available_extensions)
+
+
+def _scan(path, recursive, filter_):
+  files = []
+  dir_paths = []
+  
+  # same as os.walk, a directory that can't be listed is skipped
+  try:
+    scandir = os.scandir(path)
+  except OSError:
+    return files, dir_paths
+  
+  with scandir:
+    for entry in scandir:
+      name = entry.name
+      
+      if filter_.excluded(name):
+        continue
+      
+      # anything that can't be stat'd (like a broken symlink) is skipped
+      # same as os.walk, symlinks to directories aren't walked
+      try:
+        if entry.is_dir():
+          if recursive and not entry.is_symlink():
+            dir_paths.append(entry.path)
+          
+          continue
+        
+        if not entry.is_file() or not filter_.included(name):
+          continue
+        
+        entry_stat = entry.stat()
+      except OSError:
+        continue
+      
+      if filter_.sized(entry_stat.st_size):
+        files.append((entry.path, _stat(entry_stat)))
+  
+  return files, dir_paths
+
+
+def _stat(stat_result):
+  return Stat(stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ino,
+    stat_result.st_dev)
\ No newline at end of file
@@ -2,11 +2,24 @@ import sys
 import atexit
 import os
 import csv
+import threading
+from copy import copy
+from itertools import chain
 from functools import lru_cache
+from contextlib import nullcontext, suppress
+from hashlib import blake2b
+from traceback import format_exc
+from math import gcd, lcm
+from time import monotonic
 
 import soundfile as sf
 
 import yamosse.root as yamosse_root
+import yamosse.filelock as yamosse_filelock
+import yamosse.modelcache as yamosse_modelcache
+import yamosse.resampling as yamosse_resampling
+import yamosse.scorecache as yamosse_scorecache
+import yamosse.inference as yamosse_inference
 
 MODEL_YAMNET_DIR = os.path.join('models', 'research', 'audioset', 'yamnet')
 MODEL_YAMNET_CLASS_MAP_CSV = 'yamnet_class_map.csv'
@@ -14,26 +27,103 @@ MODEL_YAMNET_WEIGHTS_URL = 'https://storage.googleapis.com/audioset/yamnet.h5'
 MODEL_YAMNET_WEIGHTS_PATH = 'yamnet.h5'
 
 TFHUB_YAMNET_MODEL_URL = 'https://www.kaggle.com/models/google/yamnet/TensorFlow2/yamnet/1'
+TFHUB_CACHE_LOCK = '.lock'
 
 SAMPLE_RATE = 16000
 MONO = 1
 
-_initializer_ex = None
-
-_yamscan = None
-
 _sample_rate = float(SAMPLE_RATE)
 _patch_window_seconds = 0.96
 _patch_hop_seconds = 0.48
+_stft_window_seconds = 0.025
+_stft_hop_seconds = 0.010
 
 _yamnet = None
+_model = None
+_gpus = None
+
+# YAMNet is only loaded once for the worker threads of a pool, which share its context
+# this is True once it's loaded, or the exception if it couldn't be
+_loaded_context = None
+_loaded = None
+_loaded_lock = threading.Lock()
+
+_CACHE_BATCH_SIZE = 4096
 
 _root_model_yamnet_dir = yamosse_root.root(MODEL_YAMNET_DIR)
 _tfhub_enabled = not os.path.isdir(_root_model_yamnet_dir)
 
 
-def _high_priority(psutil=None):
-  if psutil:
+class _Local(threading.local):
+  # everything that every worker has of its own
+  # (in a worker process, that's the one thread that it scans on)
+  initializer_ex = None
+  context = None
+  
+  # the YAMScan that the options and score cache are for
+  scan = None
+  options = None
+  score_cache = None
+  cancelled = None
+
+
+_local = _Local()
+
+
+class Context:
+  __slots__ = (
+    'model_yamnet_class_names', 'tfhub_enabled',
+    'number', 'progress', 'receiver', 'sender', 'shutdown', 'scan', 'options', 'server'
+  )
+  
+  def __init__(self, pool):
+    # this gets pickled and sent to every worker when it starts up
+    # so it only has what the workers actually use, and not the whole pool
+    # the options are the ones that YAMNet is loaded with
+    # (the options of each YAMScan are sent along with its tasks instead, see Scan)
+    self.model_yamnet_class_names = pool.model_yamnet_class_names
+    self.tfhub_enabled = pool.tfhub_enabled
+    
+    self.number = pool.number
+    self.progress = pool.progress
+    self.receiver = pool.receiver
+    self.sender = pool.sender
+    self.shutdown = pool.shutdown
+    self.scan = pool.scan
+    self.options = pool.options
+    
+    # the client of the inference server, if there is one
+    self.server = None
+
+
+class Scan:
+  __slots__ = ('id', 'options')
+  
+  def __init__(self, id_, options):
+    # this gets sent along with every task, because the workers outlive the YAMScan
+    # (they're kept for the next one, so long as YAMNet doesn't need to be loaded again)
+    # the id is how a worker tells that a task is from the next YAMScan, with different options
+    self.id = id_
+    self.options = options
+
+
+class _Cancelled:
+  __slots__ = ('_shutdown', '_scan', '_id')
+  
+  def __init__(self, context, id_):
+    self._shutdown = context.shutdown
+    self._scan = context.scan
+    self._id = id_
+  
+  def is_set(self):
+    # a YAMScan is cancelled once the workers aren't for it anymore
+    # or they're being shut down altogether
+    return self._scan.value != self._id or self._shutdown.is_set()
+
+
+def _high_priority():
+  if os.name != 'posix':
+    import psutil
     psutil.Process().nice(psutil.HIGH_PRIORITY_CLASS)
     return
   
@@ -86,188 +176,418 @@ def tfhub_cache(dir_='tfhub_modules'):
   return root_tfhub_cache_dir
 
 
-def initializer(yamscan):
-  global _initializer_ex
+def initializer(context):
+  # for a process pool, every worker process loads its own YAMNet
+  started = monotonic()
+  
+  try:
+    # for Linux, child process inherits receiver pipe from parent
+    # so the receiver instance must be closed explicitly here
+    # as for the sender... supposedly it would get garbage collected
+    # (somehow I don't trust it, would rather just do it explicitly)
+    atexit.register(context.sender.close)
+    context.receiver.close()
+    
+    if context.shutdown.is_set(): return
+    
+    _load(context, started)
+    _local.context = context
+  except:
+    _local.initializer_ex = sys.exc_info()
+
+
+def thread_initializer(context):
+  # for a thread pool, YAMNet is only loaded once, by the first thread, and shared by the rest
+  # TensorFlow releases the GIL while YAMNet is predicting, so the threads still run at once
+  # but with only one copy of TensorFlow and YAMNet in memory, instead of one for every worker
+  # each thread has its own copy of the progress (and options, see _begin)
+  # because they hold the state of the sound file that the thread is scanning
+  # the worker threads are never marked High Priority, because that would raise
+  # the priority of the entire process (the GUI too) and leave it raised after the YAMScan
+  global _loaded_context
+  global _loaded
   
-  global _yamscan
+  started = monotonic()
   
+  try:
+    if context.shutdown.is_set(): return
+    
+    with _loaded_lock:
+      # (the worker threads of another pool load it again, for their options)
+      if _loaded_context is not context:
+        _loaded_context = context
+        
+        try:
+          _load(context, started, high_priority=False)
+        except:
+          _loaded = sys.exc_info()
+          raise
+        
+        _loaded = True
+        _local.context = context
+        return
+    
+    if _loaded is not True:
+      exc, val, tb = _loaded
+      raise val
+    
+    context = copy(context)
+    context.progress = copy(context.progress)
+    
+    with context.number.get_lock():
+      _claim(context, started, high_priority=False)
+    
+    _local.context = context
+  except:
+    _local.initializer_ex = sys.exc_info()
+
+
+def inference_initializer(context):
+  # for the inference server, the worker processes only read and resample the sound files
+  # and send the waveforms to the server, so they never load YAMNet (or import TensorFlow)
   global _sample_rate
   global _patch_window_seconds
   global _patch_hop_seconds
+  global _stft_window_seconds
+  global _stft_hop_seconds
   
   global _yamnet
+  global _model
+  
+  started = monotonic()
   
   try:
-    # for Linux, child process inherits receiver pipe from parent
-    # so the receiver instance must be closed explicitly here
-    # as for the sender... supposedly it would get garbage collected
-    # (somehow I don't trust it, would rather just do it explicitly)
-    atexit.register(yamscan.sender.close)
-    yamscan.receiver.close()
+    atexit.register(context.sender.close)
+    context.receiver.close()
     
-    if yamscan.shutdown.is_set(): return
+    if context.shutdown.is_set(): return
     
-    if _tfhub_enabled != yamscan.tfhub_enabled:
-      raise ValueError('tfhub_enabled mismatch')
+    import numpy as np
+    
+    server = context.server
+    
+    (_sample_rate, _patch_window_seconds, _patch_hop_seconds,
+      _stft_window_seconds, _stft_hop_seconds) = server.params
+    _model = _model_digest(context)
     
-    # this used to be done in the main process
-    # but is now done here so that we don't pollute environment variables
-    # if YAMosse is being used as a module
-    tfhub_cache()
+    with context.number.get_lock():
+      server.connect(np, _claim(context, started), len(context.model_yamnet_class_names))
+    
+    _yamnet = server
+    _local.context = context
+  except:
+    _local.initializer_ex = sys.exc_info()
+
+
+def inference_server(context, requests, semaphores, patches, connection):
+  # the inference server process, which loads YAMNet the same way a worker does
+  # then tells the main process what the workers need to know about it
+  # (or why it couldn't be loaded)
+  started = monotonic()
+  
+  try:
+    atexit.register(context.sender.close)
+    context.receiver.close()
     
-    # seperated out because loading the worker dependencies (mainly TensorFlow) in
-    # the main process consumes a non-trivial amount of memory for no benefit
-    # and causes startup to take significantly longer
     try:
-      import tf_keras
-    except ImportError:
-      # for Windows, where we can't use tf_keras with GPU Acceleration
-      from tensorflow import keras
-      sys.modules['tf_keras'] = keras
+      _load(context, started, claim=False)
+    except:
+      connection.send(format_exc())
+      return
     
     import numpy as np
-    import tensorflow as tf
     
-    # Python's built in modules are fine for setting priority on Linux
-    # otherwise we require psutil
-    # we require this even if we are not setting the process priority to high
-    # because it should be highlighted to you that you're missing the module early on
-    # in case you ever do decide to check the box to do it
-    psutil = None
+    options = context.options
     
-    # this is used instead of platform.system() here because this is what truly determines
-    # the availability of setpriority on the os module
-    if os.name != 'posix':
-      import psutil
+    if options.high_priority:
+      _high_priority()
     
-    options = yamscan.options
-    options.worker(np, yamscan.model_yamnet_class_names)
+    sender = context.sender
     
-    if options.high_priority:
-      _high_priority(psutil)
+    sender.send({
+      'log': 'Inference Server: GPU Acceleration %s, started in %s' % (
+        'Enabled' if _gpus else 'Disabled', _seconds(started))
+    })
     
-    # currently, setting a per-CPU memory limit isn't supported by TensorFlow
-    # however in future the 'GPU' argument could be removed if it does ever become supported
-    # (then error handling/logging would need to be added here for compatibility with old versions)
-    gpus = tf.config.list_physical_devices('GPU')
+    params = _params()
+    connection.send(params)
     
-    if gpus:
-      logical_device_configuration = [
-        tf.config.LogicalDeviceConfiguration(memory_limit=options.memory_limit)
-      ]
-      
+    yamosse_inference.serve(np, _yamnet, context.shutdown,
+      requests, semaphores, patches, connection, params,
+      options.inference_batch_seconds, options.inference_wait_seconds,
+      log=lambda log: sender.send({'log': log}))
+  finally:
+    connection.close()
+
+
+def _load(context, started, claim=True, high_priority=True):
+  global _sample_rate
+  global _patch_window_seconds
+  global _patch_hop_seconds
+  global _stft_window_seconds
+  global _stft_hop_seconds
+  
+  global _yamnet
+  global _model
+  global _gpus
+  
+  if _tfhub_enabled != context.tfhub_enabled:
+    raise ValueError('tfhub_enabled mismatch')
+  
+  # this used to be done in the main process
+  # but is now done here so that we don't pollute environment variables
+  # if YAMosse is being used as a module
+  tfhub_cache()
+  
+  # seperated out because loading the worker dependencies (mainly TensorFlow) in
+  # the main process consumes a non-trivial amount of memory for no benefit
+  # and causes startup to take significantly longer
+  try:
+    import tf_keras
+  except ImportError:
+    # for Windows, where we can't use tf_keras with GPU Acceleration
+    from tensorflow import keras
+    sys.modules['tf_keras'] = keras
+  
+  import numpy as np
+  import tensorflow as tf
+  
+  # Python's built in modules are fine for setting priority on Linux
+  # otherwise we require psutil
+  # we require this even if we are not setting the process priority to high
+  # because it should be highlighted to you that you're missing the module early on
+  # in case you ever do decide to check the box to do it
+  # this is used instead of platform.system() here because this is what truly determines
+  # the availability of setpriority on the os module
+  if os.name != 'posix':
+    import psutil
+  
+  options = context.options
+  
+  # currently, setting a per-CPU memory limit isn't supported by TensorFlow
+  # however in future the 'GPU' argument could be removed if it does ever become supported
+  # (then error handling/logging would need to be added here for compatibility with old versions)
+  _gpus = gpus = tf.config.list_physical_devices('GPU')
+  
+  if gpus:
+    logical_device_configuration = [
+      tf.config.LogicalDeviceConfiguration(memory_limit=options.memory_limit)
+    ]
+    
+    # worker threads may load YAMNet again in the same process, for a later YAMScan
+    # but by then, the devices have been initialized and can't be configured anymore
+    with suppress(RuntimeError):
       for gpu in gpus:
         tf.config.set_logical_device_configuration(
           gpu,
           logical_device_configuration
         )
-    
-    if yamscan.tfhub_enabled:
-      import tensorflow_hub as tfhub
-    else:
-      # this sucks but I can't do anything about it
-      # the repo version doesn't include an __init__.py, so I can't just relative import it
-      # but I still want it linked as a git submodule so it'll get updates
-      # so it needs to be on sys.path, there's no way around it
+  
+  if context.tfhub_enabled:
+    import tensorflow_hub as tfhub
+  else:
+    # this sucks but I can't do anything about it
+    # the repo version doesn't include an __init__.py, so I can't just relative import it
+    # but I still want it linked as a git submodule so it'll get updates
+    # so it needs to be on sys.path, there's no way around it
+    if _root_model_yamnet_dir not in sys.path:
       sys.path.append(_root_model_yamnet_dir)
+    
+    import params as yamnet_params
+    import yamnet as yamnet_model
+  
+  model = _model_digest(context)
+  
+  if context.tfhub_enabled:
+    model_params = None
+    
+    def build():
+      # the docs don't clarify if downloading the model is safe to do
+      # from multiple processes at the same time
+      # from a cursory look at the source code, it looks like there are
+      # attempts to safeguard for that, but only for downloading and not extracting
+      # i.e. two processes won't download at the same time, but if one
+      # begins extracting it's possible to get the half extracted result
+      # either way docs don't mention any of this, so I'm slapping my own lock on it
+      # it's a file in the cache, so it holds off other YAMosse processes too
+      # but only the download is done under it, once that's done
+      # every worker loads the model from the cache at the same time
+      root_tfhub_cache_dir = tfhub_cache()
+      os.makedirs(root_tfhub_cache_dir, exist_ok=True)
       
-      import params as yamnet_params
-      import yamnet as yamnet_model
-    
-    number = yamscan.number
-    sender = yamscan.sender
-    
-    yamnet = None
-    
-    with number.get_lock():
-      if yamscan.tfhub_enabled:
-        if not number.value:
-          # the first time YAMNet is downloaded it may have to download and extract
-          # so print a message then so the user knows what's going on
-          # consequent loads should be faster
-          sender.send({
-            'log': 'Loading YAMNet, please wait...'
-          })
-        
-        # this is done under the number lock because
-        # the docs don't clarify if this is safe to call
-        # from multiple processes at the same time
-        # from a cursory look at the source code, it looks like there are
-        # attempts to safeguard for that, but only for downloading and not extracting
-        # i.e. two processes won't download at the same time, but if one
-        # begins extracting it's possible to get the half extracted result
-        # either way docs don't mention any of this, so I'm slapping my own lock on it
-        yamnet = tfhub.load(TFHUB_YAMNET_MODEL_URL)
+      with yamosse_filelock.FileLock(os.path.join(root_tfhub_cache_dir, TFHUB_CACHE_LOCK)):
+        path = tfhub.resolve(TFHUB_YAMNET_MODEL_URL)
       
-      number.value += 1
+      yamnet = tfhub.load(path)
       
-      sender.send({
-        'log': 'Worker #%d: GPU Acceleration %s' % (number.value,
-          'Enabled' if gpus else 'Disabled')
-      })
-    
-    if yamscan.tfhub_enabled:
       # confirm that the model has the same classes we expect
-      if class_names(yamnet.class_map_path().numpy()) != yamscan.model_yamnet_class_names:
+      if class_names(yamnet.class_map_path().numpy()) != context.model_yamnet_class_names:
         raise ValueError('model_yamnet_class_names mismatch')
-    else:
-      params = yamnet_params.Params()
-      _sample_rate = params.sample_rate
-      
-      patch_window_seconds = params.patch_window_seconds
-      
-      assert patch_window_seconds > 0.0, 'patch_window_seconds must be greater than zero'
-      assert patch_window_seconds <= 1.0, 'patch_window_seconds must be less than or equal to one'
-      
-      patch_hop_seconds = params.patch_hop_seconds
-      
-      assert patch_hop_seconds > 0.0, 'patch_hop_seconds must be greater than zero'
-      assert patch_hop_seconds <= patch_window_seconds, ('patch_hop_seconds must be less than or '
-        'equal to patch_window_seconds')
-      
-      _patch_window_seconds = patch_window_seconds
-      _patch_hop_seconds = patch_hop_seconds
       
+      return yamnet
+  else:
+    params = yamnet_params.Params()
+    _sample_rate = params.sample_rate
+    
+    patch_window_seconds = params.patch_window_seconds
+    
+    assert patch_window_seconds > 0.0, 'patch_window_seconds must be greater than zero'
+    assert patch_window_seconds <= 1.0, 'patch_window_seconds must be less than or equal to one'
+    
+    patch_hop_seconds = params.patch_hop_seconds
+    
+    assert patch_hop_seconds > 0.0, 'patch_hop_seconds must be greater than zero'
+    assert patch_hop_seconds <= patch_window_seconds, ('patch_hop_seconds must be less than or '
+      'equal to patch_window_seconds')
+    
+    _patch_window_seconds = patch_window_seconds
+    _patch_hop_seconds = patch_hop_seconds
+    _stft_window_seconds = params.stft_window_seconds
+    _stft_hop_seconds = params.stft_hop_seconds
+    
+    model_params = repr(params)
+    
+    def build():
       yamnet = yamnet_model.yamnet_frames_model(params)
       
       weights = options.weights
       assert weights, 'weights must not be empty'
       
       yamnet.load_weights(weights)
-    
-    _yamscan = yamscan
-    _yamnet = yamnet
-  except:
-    _initializer_ex = sys.exc_info()
+      return yamnet
+  
+  # the model is only built (or loaded from TF Hub) once, and converted into the model cache
+  # after that, the workers load it from there instead
+  # it's converted again for other weights, or another version of TensorFlow
+  model_cache = yamosse_modelcache.ModelCache(
+    model=model,
+    params=model_params,
+    class_names=tuple(context.model_yamnet_class_names),
+    tensorflow=tf.__version__
+  )
+  
+  _model = model
+  _yamnet = model_cache.load(tf, build)
+  
+  # (the inference server isn't a worker, so it doesn't claim a number)
+  if claim:
+    with context.number.get_lock():
+      _claim(context, started, high_priority=high_priority)
 
 
-def worker(file_name):
+def _begin(scan):
   # the main process can only see exception tracebacks from the worker, not initializer
   # so we raise it here to make it visible to the main process
-  if _initializer_ex:
-    exc, val, tb = _initializer_ex
+  if _local.initializer_ex:
+    exc, val, tb = _local.initializer_ex
     raise val
   
-  yamscan = _yamscan
+  # the first task of every YAMScan readies its options, and the score cache for them
+  # (they're copied, because the worker threads of a thread pool all get the same ones)
+  if _local.scan == scan.id:
+    return
+  
+  import numpy as np
+  
+  context = _local.context
+  
+  options = copy(scan.options)
+  options.worker(np, context.model_yamnet_class_names)
+  
+  _local.options = options
+  _local.score_cache = _load_score_cache(options)
+  _local.cancelled = _Cancelled(context, scan.id)
+  _local.scan = scan.id
+
+
+def _load_score_cache(options):
+  score_cache_size = options.score_cache_size
+  
+  if score_cache_size <= 0:
+    return None
+  
+  # anything that changes the scores must be a part of the key
+  # so if the model or these options change, the cached scores aren't used
+  return yamosse_scorecache.ScoreCache(score_cache_size,
+    model=_model,
+    sample_rate=_sample_rate,
+    patch_window_seconds=_patch_window_seconds,
+    patch_hop_seconds=_patch_hop_seconds,
+    background_noise_volume=float(options.background_noise_volume),
+    resample_quality=options.resample_quality,
+    batch_seconds=options.batch_seconds
+  )
+
+
+def _claim(context, started, high_priority=True):
+  # claims the next worker number, and the progress counter that goes with it
+  # this must be called under the number lock, once the worker has started
+  # (which it did at the started time, so we can say how long that took)
+  # the worker process is marked High Priority, if the options say to and it's allowed to
+  # returns the index of the worker (starting from zero)
+  if high_priority and context.options.high_priority:
+    _high_priority()
+  
+  number = context.number
+  number.value += 1
+  index = number.value - 1
+  context.progress.worker(index)
+  
+  context.sender.send({
+    'log': 'Worker #%d: GPU Acceleration %s, started in %s' % (number.value,
+      'Enabled' if _gpus else 'Disabled', _seconds(started))
+  })
+  
+  return index
+
+
+def _params():
+  # what the predict function (of the inference module) needs to know about YAMNet
+  return (_sample_rate, _patch_window_seconds, _patch_hop_seconds,
+    _stft_window_seconds, _stft_hop_seconds)
+
+
+def _seconds(started):
+  return '%.2f seconds' % (monotonic() - started)
+
+
+def _model_digest(context):
+  if context.tfhub_enabled:
+    return TFHUB_YAMNET_MODEL_URL
+  
+  return _weights_digest(context.options.weights)
+
+
+def _weights_digest(weights):
+  digest = blake2b()
+  
+  with open(weights, 'rb') as f:
+    while data := f.read(2 ** 20):
+      digest.update(data)
+  
+  return digest.hexdigest()
+
+
+def worker(file_name, segment=None, segments=1):
+  # (this is only called after _begin, for the YAMScan that the file is from)
+  context = _local.context
   
-  shutdown = yamscan.shutdown
+  shutdown = _local.cancelled
   if shutdown.is_set(): return None
   
-  options = yamscan.options
+  options = _local.options
   
   with (
-    yamscan.progress as progress,
+    context.progress as progress,
     options.identification as identification,
     sf.SoundFile(file_name) as f
   ):
     # the main offenders for startup time
     # (thankfully doing these imports here doesn't seem to slow down worker performance much)
+    # TensorFlow isn't one of them, so the workers of an inference server never import it
     import numpy as np
-    import tensorflow as tf
     import resampy
     
-    # Decode the WAV file.
-    seconds = 0.0
     background_noise_volume = options.background_noise_volume
     
     sample_rate = _sample_rate
@@ -275,57 +595,295 @@ def worker(file_name):
     patch_hop_seconds = _patch_hop_seconds
     
     yamnet = _yamnet
+    params = _params()
     
-    # blocks() expects number of samples
-    # so convert the seconds values into the equivalent number of samples
+    # convert the seconds values into the equivalent number of samples
     # this should truncate to int, don't round the number
     # otherwise YAMNet may get confused and think it's two patches when it's meant to be one
+    # the blocks are one patch window apart, and overlap the next block by one patch hop
+    # so that every block is two patches
+    overlap = int(sample_rate * patch_hop_seconds)
+    step = int(sample_rate * patch_window_seconds)
+    blocksize = step + overlap
+    sample_rate_int = int(sample_rate)
+    
     sr = f.samplerate
-    seconds_steps = f.frames / sr
-    overlap = int(sr * patch_hop_seconds)
-    blocksize = int(sr * patch_window_seconds) + overlap
     
-    # dtypes
-    int16_tf = tf.int16
-    int16 = int16_tf.as_numpy_dtype
-    float32 = np.float32
-    float32_int16_max = float32(int16_tf.max)
+    # calling YAMNet has a significant fixed cost, and each block is only two patches
+    # so we take many blocks at once, and then give every contiguous run of blocks
+    # that isn't background noise to YAMNet in a single call
+    # the blocks are still exactly the same as if we took them one at a time
+    # and each is padded as it would be on its own (see below)
+    # so this gives us the same scores, timestamps and background noise volume
+    batch_blocks = _batch_blocks(options.batch_seconds)
+    
+    # the entire sound file is resampled once, as one continuous stream
+    # instead of resampling every block (and the overlap between them) on its own
+    resampler = yamosse_resampling.Resampler(np, sr, int(sample_rate),
+      quality=options.resample_quality, resampy=resampy)
     
     # reading the entire sound file at once can cause an out of memory error
-    # so instead we read it in blocks that match YAMNet's patch size
-    # we request int16 so the sound is normalized
-    # (because we want it to be, and it won't be if float64/float32 are requested)
-    # then we convert it back to float via division
-    for waveform in f.blocks(overlap=overlap, blocksize=blocksize, dtype=int16):
-      # should I check this every loop? Would a variable to keep track actually save time...?
-      if shutdown.is_set(): return None
+    # so instead we read it in blocks of about one batch
+    read_blocksize = max(1, int(sr * patch_window_seconds * batch_blocks))
+    
+    float32 = np.float32
+    
+    # the first block (of the entire sound file) that we begin on
+    # and the number of blocks to scan, or None to scan until the end of the sound file
+    first_block = 0
+    first_frame = 0
+    blocks_limit = None
+    seconds_steps = f.frames / sr
+    
+    score_cache = _local.score_cache
+    key = None
+    classes = len(context.model_yamnet_class_names)
+    
+    if segment is not None:
+      # long sound files are split into segments, so that many workers can scan one at once
+      # the segments must begin on a batch, and on a sample of the sound file
+      # that is resampled exactly on a sample at our sample rate
+      # so that every block is the same as if the sound file were scanned in one go
+      # for a whole number ratio (such as 48 kHz) the scores are exactly the same too
+      # but any other ratio (such as 44.1 kHz) is resampled by resampy a chunk at a time
+      # so its scores can differ from scanning it in one go by a rounding error
+      # the last segment always carries on until the end of the sound file
+      # (the YAMScan split it with this same function, so no segment begins past the end)
+      segment_blocks = split_segments(sr, f.frames,
+        options.segment_seconds, options.batch_seconds)[0]
       
-      progress.step(seconds / seconds_steps)
+      first_block = segment * segment_blocks
       
-      assert waveform.dtype == int16, 'Bad sample type: %r' % waveform.dtype
+      if segment != segments - 1:
+        blocks_limit = segment_blocks
       
-      # Convert to mono and the sample rate expected by YAMNet.
-      if waveform.ndim == MONO:
-        waveform = np.divide(waveform, float32_int16_max, dtype=float32)
-      else:
-        waveform = waveform.mean(axis=MONO, dtype=float32)
-        np.divide(waveform, float32_int16_max, out=waveform)
+      first_frame = first_block * step * sr // int(sample_rate)
       
-      if sr != sample_rate:
-        waveform = resampy.resample(waveform, sr, sample_rate)
+      seconds_steps = min(seconds_steps - first_frame / sr,
+        segment_blocks * patch_window_seconds)
       
-      # skip background noise
-      # this isn't strictly necessary but dramatically boosts performance
-      # this must be done here in this function, because this is a super hot path
-      # (calling another function here, even an inner function, causes significant overhead)
-      if background_noise_volume and not np.greater_equal(
-        np.abs(waveform), background_noise_volume).any():
-        seconds += patch_window_seconds
-        continue
+      identification.segment()
       
-      # Predict YAMNet classes.
-      for score in yamnet(waveform)[0]:
-        identification.predict((int(seconds), np.array(score, dtype=float32)))
-        seconds += patch_hop_seconds
+      # past the end of the sound file, there is nothing to scan
+      # (which only happens if the sound file was changed since it was probed)
+      if first_frame >= f.frames:
+        return identification.state()
+    else:
+      # if we've seen this sound file before, with the same settings
+      # then we can skip resampling it and calling YAMNet entirely
+      # (segments don't use the cache, as each of them would need to read the entire sound file)
+      if score_cache:
+        key = score_cache.key(file_name)
+        cached = score_cache.get(np, key, classes)
+        
+        if cached is not None:
+          predictions, scores = cached
+          
+          # the scores are predicted a batch at a time, so they aren't all read in at once
+          for begin in range(0, len(predictions), _CACHE_BATCH_SIZE):
+            end = begin + _CACHE_BATCH_SIZE
+            identification.predict_batch(predictions[begin:end], scores[begin:end].astype(float32))
+          
+          return identification.timestamps(shutdown)
     
-    return identification.timestamps(shutdown)
\ No newline at end of file
+    block_begin = first_block
+    
+    with score_cache.writer(np, key, classes) if key else nullcontext() as writer:
+      for waveform, blocks in _batches(np, f, resampler, read_blocksize,
+        step, overlap, batch_blocks, first_frame, blocks_limit):
+        # should I check this every loop? Would a variable to keep track actually save time...?
+        if shutdown.is_set(): return None
+        
+        progress.step((block_begin - first_block) * patch_window_seconds / seconds_steps)
+        
+        run_block = None
+        
+        for block in range(blocks + 1):
+          if block != blocks:
+            begin = block * step
+            
+            # skip background noise
+            # this isn't strictly necessary but dramatically boosts performance
+            # this must be done here in this function, because this is a super hot path
+            # (calling another function here, even an inner function, causes significant overhead)
+            if not background_noise_volume or np.greater_equal(
+              np.abs(waveform[begin:begin + blocksize]), background_noise_volume).any():
+              if run_block is None:
+                run_block = block
+              
+              continue
+          
+          if run_block is not None:
+            # Predict YAMNet classes.
+            # YAMNet pads what it's given with silence, so if the blocks were simply
+            # given to it end to end, the second patch of every block would see
+            # the beginning of the next block where it should see that silence
+            # so instead, every block is padded exactly as YAMNet would pad it alone
+            # (the same way that the inference server puts the waveforms of many workers together)
+            run_scores = yamosse_inference.predict(np, yamnet, params,
+              [waveform[b * step:b * step + blocksize] for b in range(run_block, block)])
+            
+            scores = np.concatenate(run_scores)
+            
+            # the timestamps are found from the position of the patch in the sound file
+            # (rather than by adding up seconds as we go)
+            # so a segment gets exactly the same timestamps as the entire sound file would
+            # this is done in samples, because adding up seconds in floating point
+            # can fall just short of a whole second, which then rounds down
+            predictions = np.array([((block_begin + b) * step + patch * overlap) // sample_rate_int
+              for b, block_scores in enumerate(run_scores, start=run_block)
+              for patch in range(len(block_scores))])
+            
+            if writer:
+              writer.write(predictions, scores)
+            
+            identification.predict_batch(predictions, scores)
+            
+            run_block = None
+        
+        block_begin += blocks
+      
+      if writer:
+        writer.save = True
+    
+    if segment is not None:
+      return identification.state()
+    
+    return identification.timestamps(shutdown)
+
+
+def worker_chunk(scan, items):
+  # the results for a chunk of items, in the same order as the items
+  # each item is either a file name, or the file name and arguments of a segment
+  # each one is a tuple of the result and the error, one of which is None
+  # errors reading a sound file are returned (not raised) so the rest of the chunk still runs
+  _begin(scan)
+  
+  results = []
+  
+  for item in items:
+    try:
+      results.append((worker(item) if isinstance(item, str) else worker(*item), None))
+    except sf.LibsndfileError as exc:
+      results.append((None, exc))
+  
+  return results
+
+
+def worker_merge(scan, states):
+  # merges the results of every segment of a sound file, in order
+  # into the same result as if the sound file had been scanned in one go
+  _begin(scan)
+  
+  shutdown = _local.cancelled
+  if shutdown.is_set(): return None
+  
+  with _local.options.identification as identification:
+    identification.merge(states)
+    return identification.timestamps(shutdown)
+
+
+def split_segments(sr, frames, segment_seconds, batch_seconds):
+  # the number of blocks (and seconds) in each segment of a sound file, and the number of segments
+  # the YAMScan splits sound files with this, and the workers scan the segments with it
+  # so they always agree on where each segment begins
+  # (the YAMScan only has the defaults for YAMNet, but those are what YAMNet is loaded with)
+  sample_rate = int(_sample_rate)
+  step = int(_sample_rate * _patch_window_seconds)
+  overlap = int(_sample_rate * _patch_hop_seconds)
+  
+  segment_blocks = _segment_blocks(sr, sample_rate, step, _batch_blocks(batch_seconds),
+    int(segment_seconds / _patch_window_seconds))
+  
+  # the number of blocks that the entire sound file is scanned in (see _batches)
+  # so there are only as many segments as it takes to cover them
+  # and every segment begins on a block, before the end of the sound file
+  resampled_frames = frames * sample_rate // sr
+  blocks = max(1, -(-(resampled_frames - overlap) // step))
+  return segment_blocks, segment_blocks * _patch_window_seconds, -(-blocks // segment_blocks)
+
+
+def _batch_blocks(batch_seconds):
+  return max(1, int(batch_seconds / _patch_window_seconds))
+
+
+def _segment_blocks(sr, sample_rate, step, batch_blocks, blocks):
+  # the number of blocks in a segment, rounded up so that every segment begins
+  # on a batch, and on a sample that lines up exactly with a sample at our sample rate
+  up = sample_rate // gcd(sr, sample_rate)
+  blocks_multiple = lcm(up // gcd(up, step), batch_blocks)
+  return max(1, -(-blocks // blocks_multiple)) * blocks_multiple
+
+
+def _batches(np, f, resampler, read_blocksize, step, overlap, batch_blocks,
+  first_frame=0, blocks=None):
+  # dtypes
+  int16 = np.int16
+  float32 = np.float32
+  float32_int16_max = float32(np.iinfo(int16).max)
+  
+  def mono(block):
+    assert block.dtype == int16, 'Bad sample type: %r' % block.dtype
+    
+    # Convert to mono and the sample rate expected by YAMNet.
+    if block.ndim == MONO:
+      return np.divide(block, float32_int16_max, dtype=float32)
+    
+    block = block.mean(axis=MONO, dtype=float32)
+    np.divide(block, float32_int16_max, out=block)
+    return block
+  
+  # a segment that begins partway through the sound file is not the start of the stream
+  # so the resampler is given the samples before it, instead of silence
+  started = bool(first_frame)
+  
+  if started:
+    preroll_frames = min(first_frame, resampler.context)
+    f.seek(first_frame - preroll_frames)
+    resampler.preroll(mono(f.read(preroll_frames, dtype=int16)))
+  
+  waveform = np.empty(0, dtype=float32)
+  
+  # Decode the WAV file.
+  # we request int16 so the sound is normalized
+  # (because we want it to be, and it won't be if float64/float32 are requested)
+  # then we convert it back to float via division
+  # the None at the end is so we get one more loop to flush the resampler
+  for block in chain(f.blocks(blocksize=read_blocksize, dtype=int16), (None,)):
+    if block is None:
+      block = resampler.flush()
+    else:
+      block = resampler(mono(block))
+    
+    waveform = np.concatenate((waveform, block))
+    
+    while True:
+      # a segment that ends before the end of the sound file stops at its last block
+      # (it is always a whole number of batches, so this is only ever the last batch)
+      batch = batch_blocks if blocks is None else min(batch_blocks, blocks)
+      
+      if not batch:
+        return
+      
+      batch_frames = step * batch
+      
+      if len(waveform) < batch_frames + overlap:
+        break
+      
+      yield waveform[:batch_frames + overlap], batch
+      
+      # keep the overlap, it's the beginning of the next block
+      waveform = waveform[batch_frames:]
+      started = True
+      
+      if blocks is not None:
+        blocks -= batch
+  
+  # every block must begin before the overlap of the block before it ends
+  # so the number of blocks is how many times we can step over the new samples
+  # (there is always at least one block, even if the sound file is shorter than the overlap)
+  frames = len(waveform)
+  
+  if frames > overlap or (frames and not started):
+    batch = max(1, -(-(frames - overlap) // step))
+    yield waveform, batch if blocks is None else min(batch, blocks)
\ No newline at end of file
@@ -1,11 +1,18 @@
 import os
-from shlex import quote
-from concurrent.futures import ProcessPoolExecutor
+import signal
+from shlex import quote, split
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
 import multiprocessing
+import multiprocessing.connection
 import threading
 from sys import exc_info
 from traceback import format_exception
-from contextlib import suppress, nullcontext
+from contextlib import contextmanager, suppress, nullcontext, closing
+from collections import deque
+from operator import itemgetter
+from itertools import repeat, count
+import hashlib
+from copy import copy
 
 import soundfile as sf
 
@@ -15,78 +22,144 @@ import yamosse.worker as yamosse_worker
 import yamosse.hiddenfile as yamosse_hiddenfile
 import yamosse.download as yamosse_download
 import yamosse.output as yamosse_output
+import yamosse.externalsort as yamosse_externalsort
+import yamosse.journal as yamosse_journal
+import yamosse.walk as yamosse_walk
+import yamosse.manifest as yamosse_manifest
+import yamosse.inference as yamosse_inference
 import yamosse.identification as yamosse_identification
 import yamosse.subsystem as yamosse_subsystem
+import yamosse.scorecache as yamosse_scorecache
+
+SCHEDULE_LONGEST_FIRST = 'Longest First'
+SCHEDULE_SHORTEST_FIRST = 'Shortest First'
+
+WORKER_MODE_PROCESSES = 'Processes'
+WORKER_MODE_THREADS = 'Threads'
+WORKER_MODE_INFERENCE_SERVER = 'Inference Server'
 
 
 class _Done:
   __slots__ = (
-    '_d', '_lock',
-    '_file_names_batched',
-    'yamscan', 'results', 'errors',
+    '_completed', '_wake_receiver', '_wake_sender', '_woken',
+    '_scheduled', '_segments', '_merges',
+    'yamscan', 'pool', 'output', 'results', 'errors', 'journal', 'copies',
     'subsystem', 'exit_',
-    'next_', 'batch',
+    'running',
     'clear'
   )
   
-  NEXT_SUBMITTING = -1
-  NEXT_SUBMITTED = -2
-  
-  BATCH_SIZE = 2 ** 10 # must be a power of two
-  BATCH_MASK = BATCH_SIZE - 1
+  WINDOW_SIZE = 2 ** 10
+  CHUNK_SECONDS = 60
   
-  def __init__(self, yamscan, results, errors, subsystem, exit_):
-    self._d = {}
-    self._lock = threading.Lock()
+  def __init__(self, yamscan, pool, scheduled, output, results, errors, journal, copies,
+    subsystem, exit_, wake_receiver, wake_sender):
+    # futures are done on another thread, which appends them to this queue
+    # then wakes up the YAMScan thread (if it hasn't already) with the wake pipe
+    self._completed = deque()
+    self._wake_receiver = wake_receiver
+    self._wake_sender = wake_sender
+    self._woken = False
     
-    self._file_names_batched = yamosse_utils.batched(
-      yamscan.file_names,
-      self.BATCH_SIZE
-    )
+    # the probed files, in the order they should be submitted
+    self._scheduled = deque(scheduled)
+    
+    # the results of the segments of each file, until every one of them is done
+    # and then the files whose segments are ready to be merged
+    self._segments = {}
+    self._merges = []
     
     self.yamscan = yamscan
+    self.pool = pool
+    self.output = output
     self.results = results
     self.errors = errors
+    self.journal = journal
+    self.copies = copies
     
     self.subsystem = subsystem
     self.exit_ = exit_
     
-    self.next_ = self.NEXT_SUBMITTING
-    self.batch = 0
+    self.running = 0
     
     self.clear = self._clear_loading
   
-  def next_batch(self):
-    try:
-      return sorted(next(self._file_names_batched),
-        key=self._key_getsize, reverse=True)
-    except StopIteration:
-      return None
+  def next_chunks(self):
+    # tops up the running futures, so there is always a full window of them
+    # as soon as any one future is done, the next chunk is ready to take its place
+    # so the workers never sit idle waiting on the last file of a batch
+    scheduled = self._scheduled
+    
+    # every file submitted has a fixed cost, which for very short sound files
+    # can be about as long as actually scanning them
+    # so small files are grouped together into chunks that are submitted as one
+    # but there should still be enough chunks to go around to all of the workers
+    # so near the end, the chunks get smaller until they are one file each
+    max_workers = self.yamscan.options.max_workers
+    
+    chunks = []
+    
+    while scheduled and self.running < self.WINDOW_SIZE:
+      chunk_len = max(1, len(scheduled) // max_workers)
+      chunk_seconds, file_name = scheduled.popleft()
+      chunk = [file_name]
+      
+      while scheduled and len(chunk) < chunk_len:
+        chunk_seconds += scheduled[0][0]
+        
+        if chunk_seconds > self.CHUNK_SECONDS:
+          break
+        
+        chunk.append(scheduled.popleft()[-1])
+      
+      chunks.append(tuple(chunk))
+      self.running += 1
+    
+    return chunks
+  
+  def next_merges(self):
+    merges = self._merges
+    self._merges = []
+    self.running += len(merges)
+    return merges
   
-  # the done dictionary is keyed by future, not file name
-  # it doesn't really matter which is the key since we loop through everything
-  # but this way, we guarantee there are no duplicate or dropped futures
   # we don't get the future's results here because
   # if an exception occurs, we want it to occur in the YAMScan thread
-  def insert(self, future, file_name):
-    with self._lock:
-      self._d[future] = file_name
+  # a deque's append and popleft are thread safe, so this doesn't need a lock
+  # the wake pipe is only written to once until the YAMScan thread has woken up
+  # so that thousands of files completing a second doesn't mean thousands of writes
+  def insert(self, future, chunk):
+    self._completed.append((future, chunk))
+    
+    if not self._woken:
+      self._woken = True
+      
+      # futures cancelled on shutdown are done after the wake pipe is closed
+      with suppress(OSError):
+        self._wake_sender.send_bytes(b'')
+  
+  # waits for incoming values so they'll be instantly shown when they arrive
+  # or for a future to be done, so it is instantly cleared
+  # we still wake up at the progress interval so that the progress is sampled
+  # (which also lets us notice if we've been asked to exit)
+  def wait(self):
+    multiprocessing.connection.wait(
+      (self.pool.receiver, self._wake_receiver),
+      timeout=yamosse_progress.Progress.INTERVAL
+    )
   
   # if we are in the loading state
   # set the progress bar to normal if the worker has started
   # or if there is a future that is done
   # then change into the normal state so we don't have to continually check this
   def _clear_loading(self):
-    yamscan = self.yamscan
+    pool = self.pool
     subsystem = self.subsystem
     exit_ = self.exit_
     
     # we're just reading an int here, not writing it so we don't need to lock this (I think?)
-    normal = yamscan.number.value
-    
-    if not normal:
-      with self._lock:
-        normal = self._d
+    # (if the workers were kept from the last YAMScan, they've already started)
+    normal = pool.number.value or self._completed
     
     if normal:
       subsystem.show(exit_, values={
@@ -99,45 +172,61 @@ class _Done:
       clear()
       return
     
-    yamscan.show_received(subsystem, exit_)
+    pool.show_received(subsystem, exit_)
   
   # show any value received by the receiver
   # then show progress and logs for the futures that are done
   def _clear_normal(self):
     log = ''
     
-    if self.next_ == self.NEXT_SUBMITTING:
-      self.next_ = self.NEXT_SUBMITTED
-      self.batch += 1
-      
-      log = '\nBatch #%d\n' % self.batch
+    pool = self.pool
     
-    yamscan = self.yamscan
+    # this must be reset before the queue is emptied
+    # otherwise a future that is done in between would never wake us up
+    wake_receiver = self._wake_receiver
     
-    # just copy it out first so we aren't holding the lock
-    # during all the nonsense we have to do below
-    with self._lock:
-      d = self._d
-      d_copy = d.copy()
-      d.clear()
+    while wake_receiver.poll():
+      wake_receiver.recv_bytes()
     
-    for future, file_name in d_copy.items():
-      try:
-        self.results[file_name] = future.result()
-        status = 'Done'
-      except sf.LibsndfileError as exc:
-        self.errors[file_name] = exc
-        status = 'Done (with errors)'
-      
-      yamscan.file_names_pos += 1
-      
-      file_names_pos = yamscan.file_names_pos
-      file_names_len = yamscan.file_names_len
+    self._woken = False
+    
+    completed = self._completed
+    
+    while completed:
+      future, chunk = completed.popleft()
+      self.running -= 1
       
-      self.next_ = file_names_pos & self.BATCH_MASK
+      # the segments of a file that were merged (rather than a chunk)
+      if isinstance(chunk, str):
+        log = self._done(log, chunk, future.result(), None)
+        continue
       
-      # quote function is used here to match file name format used in output files
-      log = f'{log}{status} {file_names_pos}/{file_names_len}: {quote(file_name)}\n'
+      # each file in the chunk has its own result or error
+      # so that one bad file doesn't take the rest of its chunk down with it
+      for item, (result, exc) in zip(chunk, future.result()):
+        if isinstance(item, str):
+          log = self._done(log, item, result, exc)
+          continue
+        
+        file_name, segment, segments = item
+        
+        segment_results = self._segments.setdefault(file_name, {})
+        segment_results[segment] = result, exc
+        
+        if len(segment_results) != segments:
+          continue
+        
+        del self._segments[file_name]
+        
+        # if any segment had an error, then so does the file
+        exc = next((e for r, e in segment_results.values() if e is not None), None)
+        
+        if exc is not None:
+          log = self._done(log, file_name, None, exc)
+          continue
+        
+        self._merges.append((file_name,
+          [segment_results[s][0] for s in range(segments)]))
     
     subsystem = self.subsystem
     exit_ = self.exit_
@@ -147,57 +236,239 @@ class _Done:
         'log': log
       })
     
-    yamscan.show_received(subsystem, exit_, force=not log)
+    if values := pool.progress.sample():
+      subsystem.show(exit_, values=values)
+      log = values['log']
+    
+    pool.show_received(subsystem, exit_, force=not log)
   
   @staticmethod
-  def _key_getsize(file_name):
-    try:
-      size = os.path.getsize(file_name)
-    except OSError:
-      size = 0
+  def store(output, results, errors, file_name, result, exc):
+    if exc is not None:
+      errors[file_name] = exc
+      return
+    
+    # an output that streams writes the result now, instead of it being kept until the end
+    # otherwise, it's sorted in with the rest of the results
+    if output.stream:
+      output.result(file_name, result)
+    else:
+      results.add((file_name, result))
+  
+  def _done(self, log, file_name, result, exc):
+    status = 'Done' if exc is None else 'Done (with errors)'
+    
+    yamscan = self.yamscan
+    file_names = yamscan.file_names
+    file_names_len = yamscan.file_names_len
+    
+    # the result of a file is the result of every copy of it too (which weren't scanned)
+    # but an error may be particular to the name the file was opened with
+    # so the copies of a file with an error are scanned themselves instead
+    copies = self.copies.pop(file_name, ())
     
-    return size, file_name
+    if exc is not None:
+      self._scheduled.extend((0.0, copy) for copy in copies)
+      copies = ()
+    
+    for file_name in (file_name, *copies):
+      self.store(self.output, self.results, self.errors, file_name, result, exc)
+      self.journal.record(file_name,
+        yamosse_journal.stat_result_key(file_names[file_name]), result, exc)
+      
+      yamscan.file_names_pos += 1
+      file_names_pos = yamscan.file_names_pos
+      
+      # quote function is used here to match file name format used in output files
+      log = f'{log}{status} {file_names_pos}/{file_names_len}: {quote(file_name)}\n'
+    
+    return log
 
 
-class YAMScan:
+class Pool:
   __slots__ = (
-    'file_names', 'file_names_pos', 'file_names_len',
     'model_yamnet_class_names', 'tfhub_enabled',
-    'number', 'progress', 'receiver', 'sender', 'shutdown', 'options'
+    'number', 'progress', 'receiver', 'sender', 'shutdown', 'scan', 'options',
+    'executor', 'futures', 'lock',
+    '_key', '_scans', '_inference_server'
   )
   
-  def __init__(self, output_file_name, input_,
-    model_yamnet_class_names, tfhub_enabled,
-    subsystem, options, exit_=None):
-    self.file_names = file_names = list(
-      self._input_file_names(
-        input_,
-        recursive=options.input_recursive
-      )
-    )
+  # the options that the workers load YAMNet with
+  # if any of these are different, the workers must be started again for the next YAMScan
+  # (the rest are sent along with every task, so they can be different every time)
+  POOL_OPTIONS = ('worker_mode', 'weights', 'memory_limit', 'high_priority', 'max_workers')
+  
+  # the inference server also sizes its shared memory by these
+  INFERENCE_SERVER_OPTIONS = ('batch_seconds', 'inference_batch_seconds',
+    'inference_wait_seconds')
+  
+  def __init__(self):
+    # the workers, which are kept from one YAMScan to the next
+    # so the next YAMScan doesn't have to wait for all of them to load YAMNet again
+    # (which takes far longer than scanning a few sound files does)
+    # only one YAMScan can use the pool at a time, the one that has its lock
+    self.model_yamnet_class_names = None
+    self.tfhub_enabled = None
     
-    self.file_names_pos = 0
-    self.file_names_len = len(file_names)
+    self.number = None
+    self.progress = None
+    self.receiver = None
+    self.sender = None
+    self.shutdown = None
+    self.scan = None
+    self.options = None
+    
+    self.executor = None
+    self.futures = set()
+    self.lock = threading.Lock()
+    
+    self._key = None
+    self._scans = count(1)
+    self._inference_server = None
+  
+  def start(self, model_yamnet_class_names, tfhub_enabled, options, show=None):
+    # starts the workers, unless the ones we have already loaded YAMNet the same way
+    # returns True if they were started, or False if they were kept
+    if not self.stale(model_yamnet_class_names, tfhub_enabled, options):
+      return False
+    
+    self.close()
     
     self.model_yamnet_class_names = model_yamnet_class_names
     self.tfhub_enabled = tfhub_enabled
     
-    self.number = multiprocessing.Value('i', 0)
+    try:
+      self.number = multiprocessing.Value('i', 0)
+      self.progress = yamosse_progress.Progress(0, options.max_workers)
+      self.receiver, self.sender = multiprocessing.Pipe(duplex=False)
+      self.shutdown = multiprocessing.Event()
+      self.scan = multiprocessing.Value('q', 0)
+      self.options = options
+      
+      context = yamosse_worker.Context(self)
+      worker_mode = options.worker_mode
+      
+      # the workers are either processes, which each load YAMNet for themselves
+      # or threads, which share one YAMNet between them (and so use far less memory)
+      # or processes that send their waveforms to the inference server, which has the only YAMNet
+      # (so it's loaded before any of the workers are started)
+      if worker_mode == WORKER_MODE_INFERENCE_SERVER:
+        self._inference_server = inference_server = yamosse_inference.Server()
+        inference_server.start(yamosse_worker.inference_server, context,
+          options.max_workers, show=show)
+        
+        context.server = inference_server.client
+      
+      executor_type, initializer = {
+        WORKER_MODE_PROCESSES: (ProcessPoolExecutor, yamosse_worker.initializer),
+        WORKER_MODE_THREADS: (ThreadPoolExecutor, yamosse_worker.thread_initializer),
+        WORKER_MODE_INFERENCE_SERVER: (ProcessPoolExecutor, yamosse_worker.inference_initializer)
+      }[worker_mode]
+      
+      self.executor = executor_type(
+        max_workers=options.max_workers,
+        initializer=initializer,
+        initargs=(context,)
+      )
+    except:
+      self.close()
+      raise
+    
+    self._key = self._options_key(model_yamnet_class_names, tfhub_enabled, options)
+    return True
+  
+  def stale(self, model_yamnet_class_names, tfhub_enabled, options):
+    # whether the workers must be started (again) for these options
+    return not self.executor or self._key != self._options_key(
+      model_yamnet_class_names, tfhub_enabled, options)
+  
+  def begin(self, options, steps, show=None):
+    # readies the workers for the next YAMScan, and returns what they need to know about it
+    # anything they were still doing for the last YAMScan (if it was cancelled)
+    # is waited on first, so none of it gets mixed in with this one
+    while futures := set(self.futures):
+      wait(futures, timeout=yamosse_progress.Progress.INTERVAL)
+      if show: show()
+    
+    receiver = self.receiver
+    
+    while receiver.poll():
+      receiver.recv()
+    
+    self.progress.reset(steps)
+    
+    scan = self.scan
+    scan.value = next(self._scans)
+    return yamosse_worker.Scan(scan.value, options)
+  
+  def submit(self, fn, *args):
+    futures = self.futures
+    
+    future = self.executor.submit(fn, *args)
+    futures.add(future)
+    future.add_done_callback(futures.discard)
+    return future
+  
+  def stop(self):
+    # cancels everything the workers are doing for the YAMScan
+    # but they're kept around, for the next one
+    scan = self.scan
+    
+    if scan:
+      scan.value = 0
+    
+    for future in set(self.futures):
+      future.cancel()
+  
+  def close(self):
+    # stops the workers for good
+    executor = self.executor
+    inference_server = self._inference_server
+    progress = self.progress
+    receiver = self.receiver
+    sender = self.sender
+    
+    self.executor = None
+    self._inference_server = None
     self.progress = None
     self.receiver = None
     self.sender = None
-    self.shutdown = multiprocessing.Event()
-    self.options = options
+    self._key = None
     
-    subsystem.start(
-      self._thread,
+    with (
+      receiver or nullcontext(),
+      sender or nullcontext(),
+      closing(progress) if progress else nullcontext(),
+      closing(inference_server) if inference_server else nullcontext()
+    ):
+      if not executor:
+        return
       
-      args=(
-        output_file_name,
-        subsystem,
-        threading.Event() if exit_ is None else exit_
-      )
-    )
+      # the executor must be shut down first
+      # so that no exception can prevent it from getting shut down
+      # we want to shut it down with wait=False which is not the default
+      # so we can't just put it in a with statement
+      # sender must be closed before connection flush or else we'll hang indefinitely
+      # but we can't just close sender immediately after creating it
+      # because it needs to be alive when the workers are started
+      # so we close it here instead
+      # but it and receiver are still handled by the with block
+      # in case an exception occurs here
+      # (that would cause a further BrokenPipeError, but at that point that's expected)
+      # connection flush must obviously happen last
+      # that just leaves shutdown.set, which can happen before or after sender.close
+      # but if we put it after and it causes an exception for some reason
+      # that'll just mean sender gets closed twice, redundantly
+      # so it goes before sender.close
+      executor.shutdown(wait=False, cancel_futures=True)
+      self.shutdown.set()
+      sender.close()
+      
+      # prevents BrokenPipeError exceptions in workers
+      # (they expect that sent messages WILL be delivered, else cause an exception)
+      with suppress(EOFError):
+        while True:
+          receiver.recv()
   
   def show_received(self, subsystem, exit_, force=True):
     receiver = self.receiver
@@ -212,24 +483,112 @@ class YAMScan:
       subsystem.show(exit_, values=receiver.recv())
       shown = receiver.poll()
   
-  def flush_received(self):
-    # prevents BrokenPipeError exceptions in workers
-    # (they expect that sent messages WILL be delivered, else cause an exception)
-    receiver = self.receiver
+  @classmethod
+  def _options_key(cls, model_yamnet_class_names, tfhub_enabled, options):
+    keys = cls.POOL_OPTIONS
+    
+    if options.worker_mode == WORKER_MODE_INFERENCE_SERVER:
+      keys += cls.INFERENCE_SERVER_OPTIONS
+    
+    return (model_yamnet_class_names, tfhub_enabled,
+      *(getattr(options, key) for key in keys))
+
+
+@contextmanager
+def _lease(pool):
+  # a YAMScan uses the pool that it's given, unless another YAMScan is using it right now
+  # in which case (or if it wasn't given one) it has a pool of its own, for as long as it runs
+  if pool and pool.lock.acquire(blocking=False):
+    try:
+      yield pool
+    finally:
+      pool.lock.release()
     
-    with suppress(EOFError):
-      while True:
-        receiver.recv()
+    return
+  
+  with closing(Pool()) as pool:
+    yield pool
+
+
+class YAMScan:
+  __slots__ = (
+    'file_names', 'file_names_pos', 'file_names_len',
+    'model_yamnet_class_names', 'tfhub_enabled',
+    'pool', 'options'
+  )
   
-  def _thread(self, output_file_name, subsystem, exit_):
+  PROBE_BATCH_SIZE = 2 ** 10
+  HASH_HEAD_SIZE = 2 ** 16
+  HASH_CHUNK_SIZE = 2 ** 20
+  
+  def __init__(self, output_file_name, input_,
+    model_yamnet_class_names, tfhub_enabled,
+    subsystem, options, exit_=None, resume=False, incremental=False, pool=None):
+    # the stat of each file is kept from when it was found
+    # so that nothing after this needs to stat it again
+    # the output has the hash of the manifests in the input, instead of every file in them
+    # (it isn't one of the options, so it's only set on a copy of them, that is never saved)
+    if isinstance(input_, str):
+      input_ = (input_,)
+    
+    manifest_hash = hashlib.blake2b()
+    self.file_names = file_names = self._input_file_names(input_, options, manifest_hash)
+    
+    if any(yamosse_manifest.path(i) is not None for i in input_):
+      options = copy(options)
+      options.input_manifest_hash = manifest_hash.hexdigest()
+    
+    self.file_names_pos = 0
+    self.file_names_len = len(file_names)
+    
+    self.model_yamnet_class_names = model_yamnet_class_names
+    self.tfhub_enabled = tfhub_enabled
+    
+    self.pool = pool
+    self.options = options
+    
+    subsystem.start(
+      self._thread,
+      
+      args=(
+        output_file_name,
+        subsystem,
+        threading.Event() if exit_ is None else exit_,
+        resume,
+        incremental
+      )
+    )
+  
+  def _thread(self, output_file_name, subsystem, exit_, resume, incremental):
+    sigterm = None
+    
     try:
+      # being terminated is treated the same as being cancelled
+      # so the journal is flushed and closed, and the YAMScan can be resumed later
+      # (signal handlers can only be set from the main thread, which is the case for the console)
+      if threading.current_thread() is threading.main_thread():
+        sigterm = signal.signal(signal.SIGTERM, lambda signum, frame: exit_.set())
+      
       options = self.options
       
+      identification = yamosse_identification.identification(
+        option=options.identification
+      )
+      
       # we open the output file well in advance of actually using it
       # this is because it would suck to do all the work and
       # then fail because the output file is locked or whatever
       # we also hold open the weights file
       # so it can't be deleted in the time between now and the workers using it
+      # the results are sorted as they are done, in runs that are spilled to disk
+      # so that we don't need to hold the results for every file in memory at once
+      # (they must be closed after the output, which reads them back as it's written)
+      # the journal records every file as it's done, so we can resume if we don't finish
+      # for an incremental YAMScan, it is kept as the manifest once we do finish
+      # so the next one only needs to scan the files that are new or changed since
+      manifest_file_name = ''.join((output_file_name,
+        yamosse_journal.MANIFEST_EXT)) if incremental else ''
+      
       with (
         self._download_weights_file_unique(
           yamosse_worker.MODEL_YAMNET_WEIGHTS_URL,
@@ -239,19 +598,34 @@ class YAMScan:
           options=options
         ) if not self.tfhub_enabled else nullcontext(),
         
+        closing(yamosse_externalsort.ExternalSort(
+          key=yamosse_output.sort_key(identification, options.sort_by),
+          reverse=options.sort_reverse
+        )) as results,
+        
+        yamosse_journal.Journal(
+          ''.join((output_file_name, yamosse_journal.EXT)),
+          options,
+          resume=resume
+        ) as journal,
+        
         yamosse_output.output(
           output_file_name,
           exit_,
           self.model_yamnet_class_names,
-          
-          yamosse_identification.identification(
-            option=options.identification
-          ),
-          
+          identification,
           subsystem=subsystem
         ) as output
       ):
-        results, errors = self._files(subsystem, exit_)
+        # an output that streams needs its options before any of the results
+        if output.stream:
+          output.options(options)
+        
+        errors = self._files(subsystem, exit_, output, results, journal, manifest_file_name)
+        
+        # the workers only ever add to the score cache
+        # so this is where it is kept within its size
+        yamosse_scorecache.ScoreCache(options.score_cache_size).evict()
         
         subsystem.show(exit_, values={
           'progressbar': {
@@ -264,11 +638,19 @@ class YAMScan:
         output.options(options)
         output.results(results)
         output.errors(errors)
+      
+      if manifest_file_name:
+        journal.keep(manifest_file_name)
+      else:
+        journal.remove()
     except yamosse_subsystem.SubsystemExit:
       pass
     except Exception:
       self._report_thread_exception(subsystem, exit_, *exc_info())
     finally:
+      if sigterm is not None:
+        signal.signal(signal.SIGTERM, sigterm)
+      
       try:
         subsystem.show(exit_, values={
           'done': 'OK'
@@ -276,93 +658,342 @@ class YAMScan:
       except yamosse_subsystem.SubsystemExit:
         pass
   
-  def _files(self, subsystem, exit_):
-    # the ideal way to sort the files is from largest to smallest
-    # this way, we start processing the largest file right at the start
-    # and it hopefully finishes early, leaving only small files to process
+  def _files(self, subsystem, exit_, output, results, journal, manifest_file_name):
+    # the ideal way to sort the files is from longest to shortest
+    # this way, we start processing the longest file right at the start
+    # and it hopefully finishes early, leaving only short files to process
     # and allowing us to exit sooner
     # that is, they only take a couple seconds each so we don't spend
-    # a lot of time just waiting on one large file to finish in one worker
-    # however, if many files were queued, finding the file size for all of them
-    # may itself take a while, so we do it in batches
-    # and simultaneously submit the work
-    results = {}
+    # a lot of time just waiting on one long file to finish in one worker
+    # alternatively, shortest first gets the first results out as soon as possible
     errors = {}
+    copies = {}
     
-    shutdown = self.shutdown
-    receiver, sender = multiprocessing.Pipe(duplex=False)
+    file_names = self._reuse(subsystem, exit_, output, results, errors, journal,
+      manifest_file_name)
     
-    # this is done immediately after opening the pipe to ensure it closes
-    with (receiver, sender):
-      self.progress = yamosse_progress.Progress(
-        multiprocessing.Value('i', 0),
-        self.file_names_len,
-        sender
-      )
+    file_names = self._deduplicate(subsystem, exit_, file_names, copies)
+    probed = self._probe(subsystem, exit_, file_names, errors, journal, copies)
+    
+    scheduled = sorted(self._split(probed),
+      key=itemgetter(0), reverse={
+        SCHEDULE_LONGEST_FIRST: True,
+        SCHEDULE_SHORTEST_FIRST: False
+      }[self.options.schedule])
+    
+    options = self.options
+    
+    wake_receiver, wake_sender = multiprocessing.Pipe(duplex=False)
+    
+    # this is done immediately after opening the pipes to ensure they close
+    with (
+      wake_receiver, wake_sender,
+      _lease(self.pool) as pool
+    ):
+      model_yamnet_class_names = self.model_yamnet_class_names
+      tfhub_enabled = self.tfhub_enabled
+      
+      # the workers load YAMNet as soon as they're started, which can take a while
+      # (especially the first time, when it may need to be downloaded)
+      # so print a message then so the user knows what's going on
+      if pool.stale(model_yamnet_class_names, tfhub_enabled, options):
+        subsystem.show(exit_, values={
+          'log': 'Loading YAMNet, please wait...'
+        })
       
-      self.receiver = receiver
-      self.sender = sender
+      started = pool.start(model_yamnet_class_names, tfhub_enabled, options,
+        show=lambda: pool.show_received(subsystem, exit_))
       
-      process_pool_executor = ProcessPoolExecutor(
-        max_workers=self.options.max_workers,
-        initializer=yamosse_worker.initializer,
-        initargs=(self,)
-      )
+      scan = pool.begin(options, len(scheduled), show=lambda: subsystem.show(exit_))
       
       try:
         subsystem.show(exit_, values={
-          'log': 'Created Process Pool Executor'
+          'log': '%s %s' % ('Created' if started else 'Reused', {
+            ProcessPoolExecutor: 'Process Pool Executor',
+            ThreadPoolExecutor: 'Thread Pool Executor'
+          }[type(pool.executor)])
         })
         
-        done = _Done(self, results, errors, subsystem, exit_)
-        next_batch = done.next_batch()
+        done = _Done(self, pool, scheduled, output, results, errors, journal, copies,
+          subsystem, exit_, wake_receiver, wake_sender)
         
-        while next_batch:
-          for file_name in next_batch:
-            process_pool_executor.submit(
-              yamosse_worker.worker,
-              file_name
+        while True:
+          for chunk in done.next_chunks():
+            pool.submit(
+              yamosse_worker.worker_chunk,
+              scan,
+              chunk
             ).add_done_callback(
-              lambda future, file_name=file_name: done.insert(future, file_name)
+              lambda future, chunk=chunk: done.insert(future, chunk)
             )
           
-          # while the workers are booting up, sort the next batch
-          # this allows both tasks to be done at once
-          # although any individual batch should not take longer
-          # than a few seconds to sort
-          next_batch = done.next_batch()
+          for file_name, states in done.next_merges():
+            pool.submit(
+              yamosse_worker.worker_merge,
+              scan,
+              states
+            ).add_done_callback(
+              lambda future, file_name=file_name: done.insert(future, file_name)
+            )
           
-          while done.next_ and self.file_names_pos < self.file_names_len:
-            # waits for incoming values so they'll be instantly shown when they arrive
-            # we wait for up to a second so we aren't busy waiting
-            # if we didn't get any values, we still want to clear the done futures
-            receiver.poll(timeout=1)
-            done.clear()
+          if not done.running:
+            break
           
-          done.next_ = done.NEXT_SUBMITTING
+          done.wait()
+          done.clear()
+        
+        # the last of the progress may have come in since it was last sampled
+        if values := pool.progress.sample(force=True):
+          subsystem.show(exit_, values=values)
+      except yamosse_subsystem.SubsystemExit:
+        raise
+      except BaseException:
+        # if anything went wrong, the workers may not be in any state to be kept
+        # (this isn't the case if we were only cancelled)
+        pool.close()
+        raise
       finally:
-        # process pool executor must be shut down first
-        # so that no exception can prevent it from getting shut down
-        # we want to shut it down with wait=False which is not the default
-        # so we can't just put it in a with statement
-        # sender must be closed before connection flush or else we'll hang indefinitely
-        # but we can't just close sender immediately after creating it
-        # because it needs to be alive when the workers are submitted
-        # so we close it here instead
-        # but it and receiver are still handled by the with block
-        # in case an exception occurs here
-        # (that would cause a further BrokenPipeError, but at that point that's expected)
-        # connection flush must obviously happen last
-        # that just leaves shutdown.set, which can happen before or after sender.close
-        # but if we put it after and it causes an exception for some reason
-        # that'll just mean sender gets closed twice, redundantly
-        # so it goes before sender.close
-        process_pool_executor.shutdown(wait=False, cancel_futures=True)
-        shutdown.set()
-        sender.close()
-        self.flush_received()
-      
-      return results, errors
+        pool.stop()
+      
+      return errors
+  
+  def _reuse(self, subsystem, exit_, output, results, errors, journal, manifest_file_name):
+    # the files that were done before the last YAMScan stopped aren't scanned again
+    # and neither are the files that haven't changed since the last incremental YAMScan
+    # instead their results are taken from the journal, or the manifest
+    # files that aren't in the input anymore are dropped
+    file_names = self.file_names
+    
+    if not journal.resumed and not manifest_file_name:
+      return list(file_names)
+    
+    remaining = set(file_names)
+    
+    def reuse(records, name, record=False):
+      file_names_pos = self.file_names_pos
+      
+      # the stats of the files are the ones from when they were found, so none are done here
+      for batch in yamosse_utils.batched(records, self.PROBE_BATCH_SIZE):
+        for file_name, stat, result, exc in batch:
+          # (a file could be in the journal more than once, if it changed while resuming)
+          if file_name not in remaining or stat is None or stat != (
+            yamosse_journal.stat_result_key(file_names[file_name])):
+            continue
+          
+          remaining.remove(file_name)
+          _Done.store(output, results, errors, file_name, result, exc)
+          
+          # records from the manifest go into the journal too, so it's complete
+          if record:
+            journal.record(file_name, stat, result, exc)
+          
+          self.file_names_pos += 1
+        
+        subsystem.show(exit_)
+      
+      subsystem.show(exit_, values={
+        'log': 'Reused %d file(s) from the %s' % (self.file_names_pos - file_names_pos, name)
+      })
+    
+    if journal.resumed:
+      reuse(journal.replay(), 'journal')
+    
+    if manifest_file_name:
+      reuse(yamosse_journal.replay(manifest_file_name, self.options), 'manifest', record=True)
+    
+    return [f for f in file_names if f in remaining]
+  
+  def _deduplicate(self, subsystem, exit_, file_names, copies):
+    # hard links, symlinks and copies of the same file are only scanned once
+    # then its result is given to every one of them
+    # first, files on the same device and inode are the same file
+    # then files of the same size are compared by a hash of their beginning
+    # and any that are still the same are compared by a hash of the entire file
+    # so most files are only compared by the stats they were found with, and not read at all
+    # this returns the file names to scan, and fills in the copies of each of them
+    if not self.options.deduplicate:
+      return file_names
+    
+    subsystem.show(exit_, values={
+      'log': 'Finding duplicates of %d file(s), please wait...' % len(file_names)
+    })
+    
+    stats = self.file_names
+    inodes = {}
+    sizes = {}
+    
+    for file_name in file_names:
+      stat = stats[file_name]
+      
+      # a file that can't be stat'd is left to fail on its own when it's probed
+      if stat is None:
+        continue
+      
+      # on Windows, the stats from a directory listing always have an inode of zero
+      # so those files are only compared by their size and hash
+      # (otherwise, every file in a folder would be taken for a copy of the first)
+      if stat.st_ino:
+        original = inodes.setdefault((stat.st_dev, stat.st_ino), file_name)
+        
+        if original != file_name:
+          copies.setdefault(original, []).append(file_name)
+          continue
+      
+      sizes.setdefault(stat.st_size, []).append(file_name)
+    
+    with ThreadPoolExecutor() as thread_pool_executor:
+      groups = [group for group in sizes.values() if len(group) > 1]
+      
+      for size in (self.HASH_HEAD_SIZE, None):
+        groups = self._group_by_hash(subsystem, exit_, thread_pool_executor, groups, size)
+    
+    # the first file of each group (in the order of the input) is the one that gets scanned
+    for original, *group in groups:
+      original_copies = copies.setdefault(original, [])
+      
+      for file_name in group:
+        original_copies.append(file_name)
+        original_copies.extend(copies.pop(file_name, ()))
+    
+    duplicates = {f for original_copies in copies.values() for f in original_copies}
+    
+    subsystem.show(exit_, values={
+      'log': 'Found %d duplicate(s)' % len(duplicates)
+    })
+    
+    return [f for f in file_names if f not in duplicates]
+  
+  def _group_by_hash(self, subsystem, exit_, thread_pool_executor, groups, size=None):
+    # splits each group of files up into groups of the files with the same hash
+    # only groups of more than one file are kept, and files that can't be read are left out
+    items = [(index, item) for index, group in enumerate(groups) for item in group]
+    hashes = {}
+    
+    for batch in yamosse_utils.batched(items, self.PROBE_BATCH_SIZE):
+      for (index, item), digest in zip(batch,
+        thread_pool_executor.map(self._hash_file, [item for index, item in batch],
+        repeat(size))):
+        if digest is not None:
+          hashes.setdefault((index, digest), []).append(item)
+      
+      subsystem.show(exit_)
+    
+    return [group for group in hashes.values() if len(group) > 1]
+  
+  def _probe(self, subsystem, exit_, file_names, errors, journal, copies):
+    # reads the header of every sound file, to find out how long they are
+    # this is a much better guess of how long a file will take to scan than its size
+    # (a FLAC and an MP3 of the same size can differ several times over in length)
+    # any file we can't read is rejected here, before it is ever sent to a worker
+    # this is mostly spent waiting on the disk, so it's done on many threads at once
+    subsystem.show(exit_, values={
+      'log': 'Probing %d file(s), please wait...' % len(file_names)
+    })
+    
+    scheduled = []
+    
+    # copied, because files may be added to it as we go
+    file_names = list(file_names)
+    pos = 0
+    
+    with ThreadPoolExecutor() as thread_pool_executor:
+      while pos < len(file_names):
+        batch = file_names[pos:pos + self.PROBE_BATCH_SIZE]
+        pos += len(batch)
+        
+        log = ''
+        
+        for file_name, info in zip(batch,
+          thread_pool_executor.map(self._probe_file, batch)):
+          if not isinstance(info, sf.LibsndfileError):
+            scheduled.append((file_name, info))
+            continue
+          
+          errors[file_name] = info
+          journal.record(file_name,
+            yamosse_journal.stat_result_key(self.file_names[file_name]), None, info)
+          
+          # the error may be particular to the name the file was opened with
+          # so the copies of the file are probed themselves
+          file_names.extend(copies.pop(file_name, ()))
+          
+          self.file_names_pos += 1
+          
+          log = (f'{log}Done (with errors) {self.file_names_pos}/{self.file_names_len}: '
+            f'{quote(file_name)}\n')
+        
+        # also gives us the chance to exit in between batches
+        subsystem.show(exit_, values={
+          'log': log.removesuffix('\n')
+        } if log else None)
+    
+    return scheduled
+  
+  def _split(self, probed):
+    # long sound files are split into segments, so that many workers can scan one at once
+    # instead of one worker scanning it while the others sit idle
+    # each segment is scheduled as though it were a file of its own
+    # with how long it is, in seconds (to sort them by)
+    options = self.options
+    segment_seconds = options.segment_seconds
+    
+    split = segment_seconds > 0 and yamosse_identification.identification(
+      option=options.identification).segmentable(options)
+    
+    scheduled = []
+    
+    for file_name, (frames, samplerate) in probed:
+      seconds = frames / samplerate if samplerate else 0.0
+      
+      if split and samplerate:
+        # the segments are split up the same way that the workers will scan them
+        # which is rounded up to a whole number of batches (among other things)
+        segment_seconds_, segments = yamosse_worker.split_segments(samplerate,
+          frames, segment_seconds, options.batch_seconds)[1:]
+        
+        if segments > 1:
+          for segment in range(segments):
+            scheduled.append((min(segment_seconds_, seconds - segment * segment_seconds_),
+              (file_name, segment, segments)))
+          
+          continue
+      
+      scheduled.append((seconds, file_name))
+    
+    return scheduled
+  
+  @classmethod
+  def _hash_file(cls, file_name, size=None):
+    # the hash of the file, or only its first bytes if a size is given
+    # hashlib releases the GIL while it hashes, so many files can be hashed at once
+    chunk_size = cls.HASH_CHUNK_SIZE
+    hash_ = hashlib.blake2b()
+    
+    try:
+      with open(file_name, 'rb') as f:
+        while size is None or size > 0:
+          chunk = f.read(chunk_size if size is None else min(size, chunk_size))
+          
+          if not chunk:
+            break
+          
+          hash_.update(chunk)
+          
+          if size is not None:
+            size -= len(chunk)
+    except OSError:
+      return None
+    
+    return hash_.digest()
+  
+  @staticmethod
+  def _probe_file(file_name):
+    try:
+      info = sf.info(file_name)
+    except sf.LibsndfileError as exc:
+      return exc
+    
+    return info.frames, info.samplerate
   
   @staticmethod
   def _real_relpath(path, start=os.curdir):
@@ -380,43 +1011,59 @@ class YAMScan:
     return os.path.relpath(real_path, start=real_start)
   
   @classmethod
-  def _input_file_names(cls, input_, recursive=True):
+  def _input_file_names(cls, input_, options, manifest_hash=None):
+    # a dictionary of every file name to its stat (or None, if it couldn't be stat'd)
     if not input_:
       raise ValueError('input must not be empty')
     
-    if not isinstance(input_, str):
-      try:
-        input_, = input_
-      except ValueError:
-        return set(input_)
+    if isinstance(input_, str):
+      input_ = (input_,)
     
-    path = cls._real_relpath(input_)
+    manifest_paths = [yamosse_manifest.path(i) for i in input_]
     
-    # assume path is a directory path
-    # and if it turns out it isn't, then assume it is a file path
     try:
-      if recursive:
-        file_names = set()
-        
-        # get a flat listing of every file in the directory and its subdirectories
-        for walk_root_dir_name, walk_dir_names, walk_file_names in os.walk(path):
-          file_names.update({os.path.join(walk_root_dir_name, w
-            ) for w in walk_file_names})
+      (path,) = input_
+      (manifest_path,) = manifest_paths
+    except ValueError:
+      pass
+    else:
+      if manifest_path is None:
+        path = cls._real_relpath(path)
         
-        # walk does not error if path is not a directory
-        if not file_names and not os.path.isdir(path):
-          raise NotADirectoryError
+        if not os.path.isdir(path):
+          # not a directory, just a regular file
+          return {path: yamosse_walk.stat(path)}
         
-        return file_names
-      else:
-        # get a flat listing of every file in the directory but not its subdirectories
-        with os.scandir(path) as scandir:
-          return {s.path for s in scandir if s.is_file()}
-    except NotADirectoryError:
-      # not a directory, just a regular file
-      pass
+        # only the sound files that pass the filters are kept
+        # and their stats come from the directory listings
+        return dict(yamosse_walk.walk(
+          path,
+          recursive=options.input_recursive,
+          include=split(options.input_include),
+          exclude=split(options.input_exclude),
+          min_size=options.input_min_size,
+          max_size=options.input_max_size
+        ))
+    
+    def paths():
+      for path, manifest_path in zip(input_, manifest_paths):
+        if manifest_path is None:
+          yield path
+        else:
+          yield from yamosse_manifest.file_names(manifest_path, hash_=manifest_hash)
+    
+    # files that are given directly (or listed in a manifest) aren't filtered
+    # as they were asked for by name
+    # they are stat'd on many threads at once, in case they are on a network drive
+    # as they are read from the manifests, so those are never read in all at once
+    file_names = {}
+    
+    with ThreadPoolExecutor() as thread_pool_executor:
+      for batch in yamosse_utils.batched(paths(), cls.PROBE_BATCH_SIZE):
+        batch = [p for p in dict.fromkeys(batch) if p not in file_names]
+        file_names.update(zip(batch, thread_pool_executor.map(yamosse_walk.stat, batch)))
     
-    return {path}
+    return file_names
   
   @staticmethod
   def _download_weights_file_unique(url, path, exit_, subsystem=None, options=None):